@@ -7,6 +7,10 @@ import re
 import logging
 from notifications import get_notifier
 from cloud_storage import get_storage_manager
+from fixture_matching import match_fixtures, BLOCK_COLUMNS
+from kickoff_index import KickoffIndex
+from alias_registry import get_alias_registry, save_alias_registry
+from pair_cache import get_pair_cache, save_pair_caches
 from dotenv import load_dotenv
 pd.options.mode.chained_assignment = None  # Suppress SettingWithCopyWarning
 
@@ -21,7 +25,9 @@ logging.basicConfig(
 
 def get_latest_data():
     """
-    Fetch the latest data from Google Cloud Storage for both Toto and Unibet.
+    Fetch the latest football data from Google Cloud Storage for both Toto and Unibet.
+    
+    Only the football partitions of each snapshot are downloaded.
     
     Returns:
         tuple: (toto_df, kambi_df) containing the latest data from both sources
@@ -30,10 +36,10 @@ def get_latest_data():
         storage_mgr = get_storage_manager()
         
         logging.info("Fetching latest Toto data from cloud storage...")
-        toto_df = storage_mgr.get_latest_file('toto')
+        toto_df = storage_mgr.read_snapshot('toto', sports=['Voetbal'])
         
         logging.info("Fetching latest Unibet data from cloud storage...")
-        kambi_df = storage_mgr.get_latest_file('unibet')
+        kambi_df = storage_mgr.read_snapshot('unibet', sports=['FOOTBALL'])
         
         return toto_df, kambi_df
         
@@ -58,20 +64,34 @@ def get_latest_file(directory: str, file_extension: str = "*.csv") -> str:
     latest_file = max(files, key=os.path.getmtime)
     return latest_file
 
-def preprocess_football_data(toto_file_path: str, kambi_file_path: str):
+def load_raw_data(data) -> pd.DataFrame:
+    """
+    Load raw scraper output from a CSV path, or take an in-memory DataFrame as is.
+
+    Args:
+    data (str | pd.DataFrame): Path to a raw CSV file written by a scraper, or its DataFrame.
+
+    Returns:
+    pd.DataFrame: Raw data without duplicate rows.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data.drop_duplicates()
+    return pd.read_csv(data, index_col=0).drop_duplicates()
+
+def preprocess_football_data(toto_file_path, kambi_file_path):
     """
     Preprocess and filter raw Toto and Kambi data for football betting opportunities.
 
     Args:
-    toto_file_path (str): Path to the Toto raw CSV file.
-    kambi_file_path (str): Path to the Kambi raw CSV file.
+    toto_file_path (str | pd.DataFrame): Path to the Toto raw CSV file, or the Toto DataFrame.
+    kambi_file_path (str | pd.DataFrame): Path to the Kambi raw CSV file, or the Kambi DataFrame.
 
     Returns:
     tuple: Filtered Toto and Kambi DataFrames for football betting opportunities.
     """
     # Load and drop duplicates
-    toto_raw = pd.read_csv(toto_file_path, index_col=0).drop_duplicates()
-    kambi_raw = pd.read_csv(kambi_file_path, index_col=0).drop_duplicates()
+    toto_raw = load_raw_data(toto_file_path)
+    kambi_raw = load_raw_data(kambi_file_path)
     
     # Filter for football data
     toto_raw_football = toto_raw[toto_raw['sport'] == 'Voetbal']
@@ -160,6 +180,10 @@ def create_merged_df_winnaar(toto_filtered_football: pd.DataFrame, kambi_filtere
         toto_filtered_football['Market Name'].str.contains('Draw No Bet', na=False)
     ]
 
+    # Nothing to match, e.g. when detecting on a single fixture without Draw No Bet markets
+    if filtered_kambi_winnaar.empty or filtered_toto_winnaar.empty:
+        return pd.DataFrame(), pd.DataFrame(columns=['Event Name', 'matched_event', 'fuzzy_score'])
+
     # Preprocess strings: Replace '-' with spaces and remove accents
     def preprocess_text(text):
         return ''.join(
@@ -175,48 +199,9 @@ def create_merged_df_winnaar(toto_filtered_football: pd.DataFrame, kambi_filtere
     filtered_kambi_winnaar[['Team1', 'Team2']] = filtered_kambi_winnaar['event_name'].str.split(' vs ', expand=True)
     filtered_toto_winnaar[['Team1', 'Team2']] = filtered_toto_winnaar['Event Name'].str.split(' vs ', expand=True)
 
-    # Create a list of Kambi event names
-    kambi_events = filtered_kambi_winnaar['event_name'].tolist()
-
-    # Function to find the best match based on Team1 and Team2 fuzzy matching
-    def find_best_match(event_name):
-        # Extract Team1 and Team2 from the event_name
-        parts = event_name.split(' vs ')
-        if len(parts) == 2:
-            # Remove parts that otherwise result in 100% score in fuzzymatching
-            team1 = parts[0].strip()
-            team2 = parts[1].strip()
-
-            # Perform fuzzy matching for Team1 and Team2 with all kambi events
-            def match_teams(team, kambi_team):
-                return fuzz.token_set_ratio(team, kambi_team)
-
-            # Perform fuzzy matching for both Team1 and Team2
-            kambi_matches = filtered_kambi_winnaar[
-                (filtered_kambi_winnaar['Team1'].apply(lambda x: match_teams(team1, x) >= 80)) &
-                (filtered_kambi_winnaar['Team2'].apply(lambda x: match_teams(team2, x) >= 80))
-            ]
-            
-            # If there is a match, return the matched event_name and fuzzy match score
-            if not kambi_matches.empty:
-                # Get the best match score
-                best_score_team1 = kambi_matches['Team1'].apply(lambda x: match_teams(team1, x)).max()
-                best_score_team2 = kambi_matches['Team2'].apply(lambda x: match_teams(team2, x)).max()
-
-                # Calculate the average score (or you can choose to return another metric)
-                average_score = (best_score_team1 + best_score_team2) / 2
-
-                # Get the matched event name
-                matched_event_name = kambi_matches['event_name'].iloc[0]
-
-                return matched_event_name, average_score  # Return the matched event and score
-
-        return None, None  # Return None if no match found
-
-    # Apply matching function to toto_filtered_football
-    filtered_toto_winnaar[['matched_event', 'fuzzy_score']] = filtered_toto_winnaar['Event Name'].apply(
-        lambda x: pd.Series(find_best_match(x))
-    )
+    # Match every Toto event once, on both team names, against the Kambi events of the same kickoff and sex
+    event_matches = match_fixtures(filtered_toto_winnaar, filtered_kambi_winnaar, registry=get_alias_registry())
+    filtered_toto_winnaar = filtered_toto_winnaar.merge(event_matches, on=['Event Name'] + BLOCK_COLUMNS, how='left')
 
     # Get unique records from 'Event Name' and 'matched_event'
     matched_events = filtered_toto_winnaar[['Event Name', 'matched_event', 'fuzzy_score']].drop_duplicates()
@@ -491,19 +476,13 @@ def create_merged_df_winnaar(toto_filtered_football: pd.DataFrame, kambi_filtere
 #     return merged_football_overunder
 
 
-def create_merged_football_overunder(kambi_filtered_football, toto_filtered_football, matched_events):
+def filter_football_overunder(kambi_filtered_football, toto_filtered_football):
     """
-    Merge football betting Over/Under data from Toto and Kambi with comprehensive filtering and matching.
-    
-    Args:
-    kambi_filtered_football (pd.DataFrame): Kambi football betting data
-    toto_filtered_football (pd.DataFrame): Toto football betting data
-    matched_events (pd.DataFrame): Matched events data
-    
+    Select the Over/Under outcomes of both bookmakers.
+
     Returns:
-    pd.DataFrame: Merged and filtered Over/Under betting data
+    tuple: The Kambi and Toto Over/Under rows.
     """
-    # Filter Over/Under events
     kambi_filtered_football_overunder = kambi_filtered_football[
         (kambi_filtered_football['outcome_english_label'].str.contains('Over')) |
         (kambi_filtered_football['outcome_english_label'].str.contains('Under'))
@@ -518,6 +497,29 @@ def create_merged_football_overunder(kambi_filtered_football, toto_filtered_foot
         ~(toto_filtered_football['Outcome Name'].str.contains('&'))
     ]
 
+    return kambi_filtered_football_overunder, toto_filtered_football_overunder
+
+
+def create_merged_football_overunder(kambi_filtered_football, toto_filtered_football, matched_events):
+    """
+    Merge football betting Over/Under data from Toto and Kambi with comprehensive filtering and matching.
+    
+    Args:
+    kambi_filtered_football (pd.DataFrame): Kambi football betting data
+    toto_filtered_football (pd.DataFrame): Toto football betting data
+    matched_events (pd.DataFrame): Matched events data
+    
+    Returns:
+    pd.DataFrame: Merged and filtered Over/Under betting data
+    """
+    # Filter Over/Under events
+    kambi_filtered_football_overunder, toto_filtered_football_overunder = filter_football_overunder(
+        kambi_filtered_football, toto_filtered_football
+    )
+
+    if kambi_filtered_football_overunder.empty or toto_filtered_football_overunder.empty:
+        return pd.DataFrame()
+
     # Normalize text function
     def normalize_text(x):
         return ''.join(
@@ -656,13 +658,19 @@ def create_merged_football_overunder(kambi_filtered_football, toto_filtered_foot
         lambda outcome_name: 'Over' if re.search(r'\d+(\.\d+)?\+', outcome_name) else outcome_name
     )
 
-    def find_best_fuzzy_match(row, kambi_df):
+    def find_best_fuzzy_match(row, kickoff_index):
         overunder_type2 = row['OverUnderType2']
         start_time = row['start_time']
         
-        # First subset based on matching start_time
-        time_matched_events = kambi_df[kambi_df['start_time'] == start_time]
+        # Only the Kambi records starting at the same time are candidates
+        time_matched_events = kickoff_index.candidates(start_time)
         
+        # Players matched before are looked up instead of scored
+        if registry is not None and not time_matched_events.empty:
+            alias = registry.resolve('player', str(overunder_type2), time_matched_events['OverUnderType2'].astype(str).unique())
+            if alias is not None:
+                return alias, 100
+
         if not time_matched_events.empty:
             # Perform fuzzy matching with time-matched Kambi OverUnderType2 values
             match_scores = time_matched_events['OverUnderType2'].apply(
@@ -675,7 +683,10 @@ def create_merged_football_overunder(kambi_filtered_football, toto_filtered_foot
                 best_score = match_scores.max()
                 
                 if best_score >= 90:  # Threshold for fuzzy matching
-                    return time_matched_events.loc[best_match_idx, 'OverUnderType2'], best_score
+                    best_match = time_matched_events.loc[best_match_idx, 'OverUnderType2']
+                    if registry is not None:
+                        registry.learn('player', {'toto': str(overunder_type2), 'kambi': str(best_match)}, best_score)
+                    return best_match, best_score
         return None, None  # No match found
 
     # Filter records
@@ -688,8 +699,10 @@ def create_merged_football_overunder(kambi_filtered_football, toto_filtered_foot
     ].copy()
 
     # Apply fuzzy matching function - now passing both OverUnderType2 and start_time
+    registry = get_alias_registry()
+    kickoff_index = KickoffIndex(filtered_kambi)
     fuzzy_matches = filtered_toto.apply(
-        lambda row: find_best_fuzzy_match(row, filtered_kambi),
+        lambda row: find_best_fuzzy_match(row, kickoff_index),
         axis=1
     )
 
@@ -734,7 +747,12 @@ def create_merged_football_overunder(kambi_filtered_football, toto_filtered_foot
 
 
 def process_football_betting_data(toto_filtered_football, kambi_filtered_football):
-    """Process football betting data and find arbitrage opportunities."""
+    """
+    Process football betting data and find arbitrage opportunities.
+
+    Returns:
+    tuple: The merged Draw No Bet and Over/Under DataFrames that were evaluated.
+    """
     try:
         # Initialize SMS notifier
         notifier = get_notifier()
@@ -759,8 +777,16 @@ def process_football_betting_data(toto_filtered_football, kambi_filtered_footbal
                     kambi_odds=kambi_odds
                 )
         
-        # Process over/under bets
-        merged_df_overunder = create_merged_football_overunder(kambi_filtered_football, toto_filtered_football, matched_events)
+        # Process over/under bets, only matching the Toto outcomes without a pair from earlier cycles
+        pair_cache = get_pair_cache('football_overunder')
+        if pair_cache is not None:
+            kambi_overunder, toto_overunder = filter_football_overunder(kambi_filtered_football, toto_filtered_football)
+            merged_df_overunder = pair_cache.merge(
+                toto_overunder, kambi_overunder,
+                lambda toto, kambi: create_merged_football_overunder(kambi, toto, matched_events)
+            )
+        else:
+            merged_df_overunder = create_merged_football_overunder(kambi_filtered_football, toto_filtered_football, matched_events)
         
         # Calculate arbitrage opportunities for over/under bets
         for _, row in merged_df_overunder.iterrows():
@@ -778,62 +804,42 @@ def process_football_betting_data(toto_filtered_football, kambi_filtered_footbal
                     toto_odds=toto_odds,
                     kambi_odds=kambi_odds
                 )
+
+        return merged_df_winnaar, merged_df_overunder
                 
     except Exception as e:
         logging.error(f"Error processing football betting data: {str(e)}")
         raise
 
-# toto_file = 'Data/scrapers/Toto/totoAllSports2025-01-26T14:23:09Z.csv'
-# kambi_file = 'Data/scrapers/unibet/unibetAllSports2025-01-26T14:23:30Z.csv'
+def main(toto_df: pd.DataFrame = None, kambi_df: pd.DataFrame = None):
+    """
+    Run football arbitrage detection.
 
-toto_directory = "Data/scrapers/Toto/"
-kambi_directory = "Data/scrapers/unibet/"
-start_time = datetime.utcnow()
+    Args:
+    toto_df (pd.DataFrame): Raw Toto scrape, e.g. handed over in-process by the orchestrator.
+    kambi_df (pd.DataFrame): Raw Kambi scrape. When either frame is missing, the latest
+        snapshots are fetched from cloud storage.
 
-toto_file_path = get_latest_file(toto_directory)
-kambi_file_path = get_latest_file(kambi_directory)
+    Returns:
+    tuple: The merged Draw No Bet and Over/Under DataFrames that were evaluated.
+    """
+    if toto_df is None or kambi_df is None:
+        # Get latest data from cloud storage
+        toto_df, kambi_df = get_latest_data()
 
-print(f"Latest Toto file Football: {toto_file_path}")
-print(f"Latest Kambi file Football: {kambi_file_path}")
+    # Process the data
+    toto_filtered_football, kambi_filtered_football = preprocess_football_data(toto_df, kambi_df)
 
-# Process the files
-toto_filtered, kambi_filtered = preprocess_football_data(toto_file_path, kambi_file_path)
-toto_filtered_football, kambi_filtered_football = preprocess_football_data(toto_file_path, kambi_file_path)
+    # Process betting data and find arbitrage opportunities
+    return process_football_betting_data(toto_filtered_football, kambi_filtered_football)
 
-# Perform the stacked union
-total_football_results, merged_df_winnaar, merged_football_overunder= process_football_betting_data(toto_filtered_football, kambi_filtered_football)
-total_football_results.to_csv(f'test_total_merge_Football_{start_time}.csv')
-
-# Check if latest output file contains Arbitrage opportunities
-try:
-    arbitrage_found = False
-    arbitrage_messages = []
-    
-    if total_football_results["Is Arbitrage"].any():
-        arbitrage_messages.append(f"Arbitrage opportunity found in Football: test_total_merge_Football_{start_time}.csv")
-        arbitrage_found = True
-        
-    if arbitrage_found:
-        print("\n".join(arbitrage_messages))
-    else:
-        print("Football: No arbitrage opportunities found.")
-        
-except Exception as e:
-    print(f"Football: Error checking for arbitrage opportunities: {str(e)}")
 
 if __name__ == "__main__":
-    start_time = datetime.utcnow()
-    
     try:
-        # Get latest data from cloud storage
-        toto_filtered, kambi_filtered = get_latest_data()
-        
-        # Process the data
-        toto_filtered_football, kambi_filtered_football = preprocess_football_data(toto_filtered, kambi_filtered)
-        
-        # Process betting data and find arbitrage opportunities
-        process_football_betting_data(toto_filtered_football, kambi_filtered_football)
-        
+        main()
+        # Keep the team and player names and the outcome pairs matched this run for the next ones
+        save_alias_registry()
+        save_pair_caches()
     except Exception as e:
         logging.error(f"Error in main process: {str(e)}")
-        raise
\ No newline at end of file
+        raise
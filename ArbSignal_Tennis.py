@@ -3,8 +3,30 @@ from fuzzywuzzy import process, fuzz
 from datetime import datetime
 import pandas as pd
 import os
+import logging
+from cloud_storage import get_storage_manager
+from fixture_matching import resolve_fixtures, select_fixture_matches
 pd.options.mode.chained_assignment = None  # Suppress SettingWithCopyWarning
 
+def get_latest_data():
+    """
+    Fetch the latest tennis data from Google Cloud Storage for both Toto and Unibet.
+
+    Only the tennis partitions of each snapshot are downloaded.
+
+    Returns:
+        tuple: (toto_df, kambi_df) containing the latest data from both sources
+    """
+    storage_mgr = get_storage_manager()
+
+    logging.info("Fetching latest Toto tennis data from cloud storage...")
+    toto_df = storage_mgr.read_snapshot('toto', sports=['Tennis'])
+
+    logging.info("Fetching latest Unibet tennis data from cloud storage...")
+    kambi_df = storage_mgr.read_snapshot('unibet', sports=['TENNIS'])
+
+    return toto_df, kambi_df
+
 def get_latest_file(directory: str, file_extension: str = "*.csv") -> str:
     """
     Get the latest file in a directory based on the modification time.
@@ -22,20 +44,34 @@ def get_latest_file(directory: str, file_extension: str = "*.csv") -> str:
     latest_file = max(files, key=os.path.getmtime)
     return latest_file
 
-def preprocess_tennis_data(toto_file_path: str, kambi_file_path: str):
+def load_raw_data(data) -> pd.DataFrame:
+    """
+    Load raw scraper output from a CSV path, or take an in-memory DataFrame as is.
+
+    Args:
+    data (str | pd.DataFrame): Path to a raw CSV file written by a scraper, or its DataFrame.
+
+    Returns:
+    pd.DataFrame: Raw data without duplicate rows.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data.drop_duplicates()
+    return pd.read_csv(data, index_col=0).drop_duplicates()
+
+def preprocess_tennis_data(toto_file_path, kambi_file_path):
     """
     Preprocess and filter raw Toto and Kambi data for tennis betting opportunities.
 
     Args:
-    toto_file_path (str): Path to the Toto raw CSV file.
-    kambi_file_path (str): Path to the Kambi raw CSV file.
+    toto_file_path (str | pd.DataFrame): Path to the Toto raw CSV file, or the Toto DataFrame.
+    kambi_file_path (str | pd.DataFrame): Path to the Kambi raw CSV file, or the Kambi DataFrame.
 
     Returns:
     tuple: Filtered Toto and Kambi DataFrames for tennis betting opportunities.
     """
     # Load and drop duplicates
-    toto_raw = pd.read_csv(toto_file_path, index_col=0).drop_duplicates()
-    kambi_raw = pd.read_csv(kambi_file_path, index_col=0).drop_duplicates()
+    toto_raw = load_raw_data(toto_file_path)
+    kambi_raw = load_raw_data(kambi_file_path)
     
     # Filter for tennis data
     toto_raw_tennis = toto_raw[toto_raw['sport'] == 'Tennis']
@@ -74,17 +110,18 @@ def preprocess_tennis_data(toto_file_path: str, kambi_file_path: str):
     return toto_filtered_tennis, kambi_filtered_tennis
 
 
-from rapidfuzz import process, fuzz
 import pandas as pd
 import unicodedata
 
-def create_merged_df_winnaar(toto_filtered_tennis: pd.DataFrame, kambi_filtered_tennis: pd.DataFrame) -> pd.DataFrame:
+def create_merged_df_winnaar(toto_filtered_tennis: pd.DataFrame, kambi_filtered_tennis: pd.DataFrame,
+                             fixture_matches: pd.DataFrame = None) -> pd.DataFrame:
     """
     Preprocess, match, and merge tennis betting data from Toto and Kambi for "winnaar" events.
 
     Args:
     toto_filtered_tennis (pd.DataFrame): Filtered Toto tennis DataFrame.
     kambi_filtered_tennis (pd.DataFrame): Filtered Kambi tennis DataFrame.
+    fixture_matches (pd.DataFrame): Table of resolve_fixtures, computed from both frames when not given.
 
     Returns:
     pd.DataFrame: Merged DataFrame with matched events and filtered conditions.
@@ -99,6 +136,10 @@ def create_merged_df_winnaar(toto_filtered_tennis: pd.DataFrame, kambi_filtered_
         toto_filtered_tennis['Market Name'].str.contains('Wedstrijd', na=False)
     ]
 
+    # Nothing to match, e.g. when detecting on a single fixture without this market
+    if filtered_kambi_winnaar.empty or filtered_toto_winnaar.empty:
+        return pd.DataFrame()
+
     # Preprocess strings: Replace '-' with spaces and remove accents
     def preprocess_text(text):
         return ''.join(
@@ -110,19 +151,12 @@ def create_merged_df_winnaar(toto_filtered_tennis: pd.DataFrame, kambi_filtered_
     filtered_kambi_winnaar['event_name'] = filtered_kambi_winnaar['event_name'].apply(preprocess_text)
     filtered_toto_winnaar['Event Name'] = filtered_toto_winnaar['Event Name'].apply(preprocess_text)
 
-    # Create a list of Kambi event names
-    kambi_events = filtered_kambi_winnaar['event_name'].tolist()
-
-    # Function to find the best match for an event name
-    def find_best_match(event_name):
-        result = process.extractOne(event_name, kambi_events, scorer=fuzz.token_set_ratio, score_cutoff=90)
-        if result is None:
-            return None
-        match, score, _ = result
-        return match
-
-    # Apply matching function to Toto data
-    filtered_toto_winnaar['matched_event'] = filtered_toto_winnaar['Event Name'].apply(find_best_match)
+    # Pick the Kambi event of every Toto event among this market's candidates in the shared match table
+    if fixture_matches is None:
+        fixture_matches = resolve_fixtures(toto_filtered_tennis, kambi_filtered_tennis)
+    filtered_toto_winnaar = filtered_toto_winnaar.merge(
+        select_fixture_matches(fixture_matches, filtered_kambi_winnaar), on=['Event Name', 'start_time'], how='left'
+    )
 
     # Merge the DataFrames using the matched event column
     merged_df_winnaar = pd.merge(
@@ -142,13 +176,14 @@ def create_merged_df_winnaar(toto_filtered_tennis: pd.DataFrame, kambi_filtered_
     return merged_df_winnaar
 
 
-def create_merged_tennis_overunder(kambi_filtered_tennis, toto_filtered_tennis):
+def create_merged_tennis_overunder(kambi_filtered_tennis, toto_filtered_tennis, fixture_matches=None):
     """
     Preprocess, match, and merge tennis betting data from Toto and Kambi for "Over/Under" events.
 
     Args:
     toto_filtered_tennis (pd.DataFrame): Filtered Toto tennis DataFrame.
     kambi_filtered_tennis (pd.DataFrame): Filtered Kambi tennis DataFrame.
+    fixture_matches (pd.DataFrame): Table of resolve_fixtures, computed from both frames when not given.
 
     Returns:
     pd.DataFrame: Merged DataFrame with matched "Ja/Nee" events and filtered conditions.
@@ -159,6 +194,9 @@ def create_merged_tennis_overunder(kambi_filtered_tennis, toto_filtered_tennis):
         (toto_filtered_tennis['Outcome Name'].str.contains('Under'))
     ]
 
+    if kambi_filtered_tennis_overunder.empty or toto_filtered_tennis_overunder.empty:
+        return pd.DataFrame()
+
     # Remove accents and replace '-' with spaces in the necessary columns
     for column in ['event_name', 'criterion_label', 'criterion_english_label']:
         kambi_filtered_tennis_overunder[column] = kambi_filtered_tennis_overunder[column].apply(
@@ -176,19 +214,12 @@ def create_merged_tennis_overunder(kambi_filtered_tennis, toto_filtered_tennis):
             )
         )
 
-    # Get event names for matching
-    kambi_events = kambi_filtered_tennis_overunder['event_name'].tolist()
-
-    # Function to find the best match
-    def find_best_match(event_name):
-        result = process.extractOne(event_name, kambi_events, scorer=fuzz.token_set_ratio, score_cutoff=90)
-        if result is None:
-            return None
-        match, _, _ = result
-        return match
-
-    # Apply matching
-    toto_filtered_tennis_overunder['matched_event'] = toto_filtered_tennis_overunder['Event Name'].apply(find_best_match)
+    # Pick the Kambi event of every Toto event among this market's candidates in the shared match table
+    if fixture_matches is None:
+        fixture_matches = resolve_fixtures(toto_filtered_tennis, kambi_filtered_tennis)
+    toto_filtered_tennis_overunder = toto_filtered_tennis_overunder.merge(
+        select_fixture_matches(fixture_matches, kambi_filtered_tennis_overunder), on=['Event Name', 'start_time'], how='left'
+    )
 
     # Define OverUnderType
     def determine_over_under_type(label):
@@ -264,13 +295,15 @@ def create_merged_tennis_overunder(kambi_filtered_tennis, toto_filtered_tennis):
 
     return merged_tennis_overunder
 
-def create_merged_tennis_yesno(toto_filtered_tennis: pd.DataFrame, kambi_filtered_tennis: pd.DataFrame) -> pd.DataFrame:
+def create_merged_tennis_yesno(toto_filtered_tennis: pd.DataFrame, kambi_filtered_tennis: pd.DataFrame,
+                               fixture_matches: pd.DataFrame = None) -> pd.DataFrame:
     """
     Preprocess, match, and merge tennis betting data from Toto and Kambi for "Ja/Nee" events.
 
     Args:
     toto_filtered_tennis (pd.DataFrame): Filtered Toto tennis DataFrame.
     kambi_filtered_tennis (pd.DataFrame): Filtered Kambi tennis DataFrame.
+    fixture_matches (pd.DataFrame): Table of resolve_fixtures, computed from both frames when not given.
 
     Returns:
     pd.DataFrame: Merged DataFrame with matched "Ja/Nee" events and filtered conditions.
@@ -286,6 +319,9 @@ def create_merged_tennis_yesno(toto_filtered_tennis: pd.DataFrame, kambi_filtere
         (toto_filtered_tennis['Outcome Name'].str.contains('Nee', na=False))
     ]
 
+    if kambi_filtered_tennis_yesno.empty or toto_filtered_tennis_yesno.empty:
+        return pd.DataFrame()
+
     # Preprocess strings: Replace '-' with spaces and remove accents
     def preprocess_text(text):
         return ''.join(
@@ -300,19 +336,12 @@ def create_merged_tennis_yesno(toto_filtered_tennis: pd.DataFrame, kambi_filtere
     toto_filtered_tennis_yesno['Event Name'] = toto_filtered_tennis_yesno['Event Name'].apply(preprocess_text)
     toto_filtered_tennis_yesno['Market Name'] = toto_filtered_tennis_yesno['Market Name'].apply(preprocess_text)
 
-    # Create a list of Kambi event names
-    kambi_events = kambi_filtered_tennis_yesno['event_name'].tolist()
-
-    # Function to find the best match for an event name
-    def find_best_match(event_name):
-        result = process.extractOne(event_name, kambi_events, scorer=fuzz.token_set_ratio, score_cutoff=90)
-        if result is None:
-            return None
-        match, score, _ = result
-        return match
-
-    # Apply matching function to Toto data
-    toto_filtered_tennis_yesno['matched_event'] = toto_filtered_tennis_yesno['Event Name'].apply(find_best_match)
+    # Pick the Kambi event of every Toto event among this market's candidates in the shared match table
+    if fixture_matches is None:
+        fixture_matches = resolve_fixtures(toto_filtered_tennis, kambi_filtered_tennis)
+    toto_filtered_tennis_yesno = toto_filtered_tennis_yesno.merge(
+        select_fixture_matches(fixture_matches, kambi_filtered_tennis_yesno), on=['Event Name', 'start_time'], how='left'
+    )
 
     # Create 'YesNoType' column
     kambi_filtered_tennis_yesno['YesNoType'] = kambi_filtered_tennis_yesno['criterion_label'].apply(
@@ -380,12 +409,23 @@ def create_merged_tennis_yesno(toto_filtered_tennis: pd.DataFrame, kambi_filtere
 
 def process_tennis_betting_data(toto_filtered_tennis, kambi_filtered_tennis):
     # Call the specific functions to process different bet types
-    merged_df_winnaar = create_merged_df_winnaar(toto_filtered_tennis, kambi_filtered_tennis)
-    merged_tennis_overunder = create_merged_tennis_overunder(kambi_filtered_tennis, toto_filtered_tennis)
-    merged_tennis_yesno = create_merged_tennis_yesno(toto_filtered_tennis, kambi_filtered_tennis)
+    # Score every Toto event once, for all three markets
+    fixture_matches = resolve_fixtures(toto_filtered_tennis, kambi_filtered_tennis)
+    merged_df_winnaar = create_merged_df_winnaar(toto_filtered_tennis, kambi_filtered_tennis, fixture_matches)
+    merged_tennis_overunder = create_merged_tennis_overunder(kambi_filtered_tennis, toto_filtered_tennis, fixture_matches)
+    merged_tennis_yesno = create_merged_tennis_yesno(toto_filtered_tennis, kambi_filtered_tennis, fixture_matches)
+
+    # Select and return the relevant columns
+    result_columns = [
+        'Event Name', 'Market Name', 'Outcome Name', 'outcome_label', 
+        'Odds (Decimal)', 'odds', 'Arbitrage Percentage', 
+        'Is Arbitrage', 'Stake A', 'Stake B'
+    ]
 
     # Perform the stacked union
     total_tennis = pd.concat([merged_tennis_overunder, merged_df_winnaar, merged_tennis_yesno], ignore_index=True, sort=True)
+    if total_tennis.empty:
+        return pd.DataFrame(columns=result_columns)
 
     # Calculate Arbitrage Percentage
     total_tennis['Arbitrage Percentage'] = (1 / total_tennis['Odds (Decimal)'] + 1 / total_tennis['odds']) * 100
@@ -406,52 +446,68 @@ def process_tennis_betting_data(toto_filtered_tennis, kambi_filtered_tennis):
         axis=1
     )
 
-    # Select and return the relevant columns
-    result = total_tennis[[
-        'Event Name', 'Market Name', 'Outcome Name', 'outcome_label', 
-        'Odds (Decimal)', 'odds', 'Arbitrage Percentage', 
-        'Is Arbitrage', 'Stake A', 'Stake B'
-    ]]
+    result = total_tennis[result_columns]
     
     return result
 
 toto_directory = "Data/scrapers/Toto/"
 kambi_directory = "Data/scrapers/unibet/"
-start_time = datetime.utcnow()
 
-toto_file_path = get_latest_file(toto_directory)
-kambi_file_path = get_latest_file(kambi_directory)
+def detect_tennis_arbitrage(toto_df: pd.DataFrame = None, kambi_df: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Run tennis arbitrage detection without writing a report, as the orchestrator does in every mode.
+
+    Args:
+    toto_df (pd.DataFrame): Raw Toto scrape, e.g. handed over in-process by the orchestrator.
+    kambi_df (pd.DataFrame): Raw Kambi scrape. When either frame is missing, the tennis
+        rows of the latest snapshots in cloud storage are used.
+
+    Returns:
+    pd.DataFrame: Evaluated tennis outcome pairs with their arbitrage percentage.
+    """
+    if toto_df is None or kambi_df is None:
+        toto_df, kambi_df = get_latest_data()
 
-print(f"Latest Toto file Tennis: {toto_file_path}")
-print(f"Latest Kambi file Tennis: {kambi_file_path}")
-start_time = datetime.utcnow()
+    toto_filtered_tennis, kambi_filtered_tennis = preprocess_tennis_data(toto_df, kambi_df)
+    return process_tennis_betting_data(toto_filtered_tennis, kambi_filtered_tennis)
 
-toto_filtered_tennis, kambi_filtered_tennis = preprocess_tennis_data(toto_file_path, kambi_file_path)
 
-# # Now, `merged_df_winnaar` contains the processed and filtered merged data
-# merged_df_winnaar = create_merged_df_winnaar(toto_filtered_tennis, kambi_filtered_tennis)
-# # Now, `merged_tennis_overunder` contains the processed and filtered merged data
-# merged_tennis_overunder = create_merged_tennis_overunder(kambi_filtered_tennis, toto_filtered_tennis)
-# # Now, `merged_tennis_yesno` contains the processed and filtered merged data
-# merged_tennis_yesno = create_merged_tennis_yesno(toto_filtered_tennis, kambi_filtered_tennis)
+def main(toto_df: pd.DataFrame = None, kambi_df: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Run tennis arbitrage detection and write its CSV report, as the standalone script does.
 
-# Perform the stacked union
-total_tennis_results = process_tennis_betting_data(toto_filtered_tennis, kambi_filtered_tennis)
-total_tennis_results.to_csv(f'test_total_merge_Tennis_{start_time}.csv')
+    Args:
+    toto_df (pd.DataFrame): Raw Toto scrape; the latest snapshots are used when either frame is missing.
+    kambi_df (pd.DataFrame): Raw Kambi scrape.
 
-# Check if latest output file contains Arbitrage opportunities
-try:
-    arbitrage_found = False
-    arbitrage_messages = []
-    
-    if total_tennis_results["Is Arbitrage"].any():
-        arbitrage_messages.append(f"Arbitrage opportunity found in Tennis: test_total_merge_Tennis_{start_time}.csv")
-        arbitrage_found = True
-        
-    if arbitrage_found:
-        print("\n".join(arbitrage_messages))
-    else:
-        print("Tennis: No arbitrage opportunities found.")
+    Returns:
+    pd.DataFrame: Evaluated tennis outcome pairs with their arbitrage percentage.
+    """
+    start_time = datetime.utcnow()
+
+    # Perform the stacked union
+    total_tennis_results = detect_tennis_arbitrage(toto_df, kambi_df)
+    total_tennis_results.to_csv(f'test_total_merge_Tennis_{start_time}.csv')
+
+    # Check if latest output file contains Arbitrage opportunities
+    try:
+        arbitrage_found = False
+        arbitrage_messages = []
         
-except Exception as e:
-    print(f"Tennis: Error checking for arbitrage opportunities: {str(e)}")
\ No newline at end of file
+        if total_tennis_results["Is Arbitrage"].any():
+            arbitrage_messages.append(f"Arbitrage opportunity found in Tennis: test_total_merge_Tennis_{start_time}.csv")
+            arbitrage_found = True
+            
+        if arbitrage_found:
+            print("\n".join(arbitrage_messages))
+        else:
+            print("Tennis: No arbitrage opportunities found.")
+            
+    except Exception as e:
+        print(f"Tennis: Error checking for arbitrage opportunities: {str(e)}")
+
+    return total_tennis_results
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,13 @@
-import requests
 import json
 import pandas as pd
 import time
-import random
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Any
-from cloud_storage import get_storage_manager
+from upload_queue import upload_snapshot
+from http_transport import HttpTransport, get_transport
+from columnar import ColumnarFrameBuilder
+from fast_json import decode_response, TotoEventListResponse, TotoCollectionsResponse, TotoMarketDataResponse
 import logging
 
 # Configure logging
@@ -15,6 +16,14 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+# Columns of the flattened market data rows, in output order
+TOTO_OUTCOME_COLUMNS = [
+    'event_id', 'Event Name', 'Market Name', 'Outcome Name', 'Odds (Decimal)',
+    'Price Numerator', 'Price Denominator', 'Outcome Type', 'Outcome SubType'
+]
+# Labels repeated across many outcomes, stored once per distinct value
+TOTO_INTERNED_COLUMNS = ['Event Name', 'Market Name', 'Outcome Name', 'Outcome Type', 'Outcome SubType']
+
 # def get_event_matches() -> pd.DataFrame:
 #     """
 #     Fetch matches for a given time range
@@ -110,17 +119,20 @@ logging.basicConfig(
 #     # Combine all match data into a single DataFrame
 #     return pd.DataFrame(all_matches)
 
-import requests
 import time
-import random
 import pandas as pd
 from datetime import datetime, timedelta
 from itertools import islice
 
-def get_event_matches() -> pd.DataFrame:
+def get_event_matches(max_workers: int = 8, discovery_stats: Dict[str, Dict[str, Any]] = None) -> pd.DataFrame:
     """
     Fetch matches using both range-based drilldown IDs and specific country drilldown IDs
     
+    Args:
+        max_workers (int): Number of drilldown batches fetched concurrently
+        discovery_stats (Dict[str, Dict[str, Any]]): Optional dict that is filled with
+            the timing, match count and failures of every drilldown batch
+    
     Returns:
         pd.DataFrame: DataFrame containing match information
     """
@@ -227,8 +239,8 @@ def get_event_matches() -> pd.DataFrame:
             batch = {k: data[k] for k in islice(it, batch_size)}
             yield batch
 
-    def fetch_matches(drilldown_ids: str, batch_info: str) -> list:
-        """Helper function to fetch matches for given drilldown IDs"""
+    def fetch_matches(drilldown_ids: str, batch_info: str) -> tuple:
+        """Helper function to fetch matches for given drilldown IDs, returns (matches, failed)"""
         url = (
             f"https://content.toto.nl/content-service/api/v1/q/event-list?"
             f"startTimeFrom={start_time}"
@@ -256,9 +268,9 @@ def get_event_matches() -> pd.DataFrame:
         }
 
         try:
-            response = requests.get(url, headers=headers)
+            response = get_transport('toto').get(url, headers=headers, timeout=30, retries=2)
             response.raise_for_status()
-            data = response.json()
+            data = decode_response(response, TotoEventListResponse)
             
             matches = []
             for event in data.get('data', {}).get('events', []):
@@ -280,11 +292,11 @@ def get_event_matches() -> pd.DataFrame:
                 matches.append(match)
             
             print(f"Successfully fetched data for {batch_info}")
-            return matches
+            return matches, False
             
         except Exception as e:
             print(f"An error occurred for {batch_info}: {e}")
-            return []
+            return [], True
 
     # Current time in UTC
     now = datetime.utcnow()
@@ -313,15 +325,28 @@ def get_event_matches() -> pd.DataFrame:
 
     # Part 2: Fetch matches using country-specific drilldown IDs
     print("\nProcessing country-specific drilldown IDs...")
-    for batch_num, country_batch in enumerate(batch_dict(COUNTRY_MARKET_DRILLDOWNS, 1)):
+    if discovery_stats is None:
+        discovery_stats = {}
+
+    def timed_fetch(country_batch: Dict[str, int]) -> list:
         drilldown_ids = ','.join(str(id) for id in country_batch.values())
         batch_info = f"countries: {', '.join(country_batch.keys())}"
-        matches = fetch_matches(drilldown_ids, batch_info)
-        all_matches.extend(matches)
-        
-        if batch_num < len(COUNTRY_MARKET_DRILLDOWNS) // 5:  # Don't sleep after the last batch
-            continue
-            # time.sleep(random.uniform(1, 2))
+        start = time.perf_counter()
+        matches, failed = fetch_matches(drilldown_ids, batch_info)
+        discovery_stats[batch_info] = {
+            'seconds': round(time.perf_counter() - start, 3),
+            'matches': len(matches),
+            'failures': int(failed)
+        }
+        return matches
+
+    # Batches run concurrently but are merged in COUNTRY_MARKET_DRILLDOWNS order
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for matches in executor.map(timed_fetch, batch_dict(COUNTRY_MARKET_DRILLDOWNS, 1)):
+            all_matches.extend(matches)
+
+    failures = sum(stats['failures'] for stats in discovery_stats.values())
+    logging.info(f"Toto: Discovery over {len(discovery_stats)} drilldown batches, {failures} failed")
 
     # Create and return the final DataFrame
     return pd.DataFrame(all_matches)
@@ -383,12 +408,13 @@ def get_headers() -> Dict[str, str]:
 #         print(f"Error collecting market IDs: {e} for event_ids: {batch_ids}")
     
 #     return event_market_ids_dict
-def fetch_market_ids_for_event_batch(batch_ids: List[int]) -> Dict[int, List[int]]:
+def fetch_market_ids_for_event_batch(batch_ids: List[int], transport: HttpTransport = None) -> Dict[int, List[int]]:
     """
     Fetch market IDs for a small batch of event IDs.
     
     Args:
         batch_ids (List[int]): List of event IDs to process.
+        transport (HttpTransport): Shared pooled session, defaults to the 'toto' transport.
     
     Returns:
         Dict[int, List[int]]: Dictionary mapping event IDs to their market IDs.
@@ -408,11 +434,9 @@ def fetch_market_ids_for_event_batch(batch_ids: List[int]) -> Dict[int, List[int
     )
     
     try:
-        # Add random sleep to reduce request rate
-        time.sleep(random.uniform(0.1, 0.3))
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        json_data = response.json()
+        # Pacing and back-off are handled by the transport's per-host rate limiter
+        response = (transport or get_transport('toto')).get(url, headers=headers, timeout=30, retries=2)
+        json_data = decode_response(response, TotoCollectionsResponse)
         
         preferred_collections = ['Alles', 'UNASSIGNED']
         fallback_collections = ['Wedstrijd', 'Doelpunten', 'Schoten', 'Schoten op doel']
@@ -449,7 +473,8 @@ def collect_market_ids(event_ids: List[int], max_workers: int = 10, batch_size:
     
     Args:
         event_ids (List[int]): Full list of event IDs
-        max_workers (int): Maximum number of concurrent threads
+        max_workers (int): Maximum number of concurrent threads; the host rate limiter
+            adapts the number of requests actually in flight below this ceiling
         batch_size (int): Number of event IDs to process in each batch
     
     Returns:
@@ -460,10 +485,13 @@ def collect_market_ids(event_ids: List[int], max_workers: int = 10, batch_size:
     # Split event_ids into batches
     event_id_batches = [event_ids[i:i + batch_size] for i in range(0, len(event_ids), batch_size)]
     
+    # Every worker keeps its own keep-alive connection in the shared pool
+    transport = get_transport('toto', pool_maxsize=max_workers)
+    
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         # Submit all batches
         future_to_batch = {
-            executor.submit(fetch_market_ids_for_event_batch, batch): batch 
+            executor.submit(fetch_market_ids_for_event_batch, batch, transport): batch 
             for batch in event_id_batches
         }
         
@@ -478,18 +506,25 @@ def collect_market_ids(event_ids: List[int], max_workers: int = 10, batch_size:
     
     return event_market_ids_dict
 
-def fetch_market_data_for_batch(batch_market_ids: List[int]) -> List[Dict[str, Any]]:
+def fetch_market_data_for_batch(
+    batch_market_ids: List[int], 
+    transport: HttpTransport = None, 
+    batch_data: ColumnarFrameBuilder = None
+) -> ColumnarFrameBuilder:
     """
     Fetch market data for a batch of market IDs
     
     Args:
         batch_market_ids (List[int]): List of market IDs to process
+        transport (HttpTransport): Shared pooled session, defaults to the 'toto' transport
+        batch_data (ColumnarFrameBuilder): Builder to append the rows to, a new one by default
     
     Returns:
-        List[Dict[str, Any]]: List of extracted market data
+        ColumnarFrameBuilder: Extracted market data, one row per outcome in TOTO_OUTCOME_COLUMNS order
     """
     headers = get_headers()
-    batch_data = []
+    if batch_data is None:
+        batch_data = ColumnarFrameBuilder(TOTO_OUTCOME_COLUMNS, TOTO_INTERNED_COLUMNS)
     
     market_ids_str = ','.join(map(str, batch_market_ids))
     
@@ -503,29 +538,29 @@ def fetch_market_data_for_batch(batch_market_ids: List[int]) -> List[Dict[str, A
     )
     
     try:
-        # Add random sleep to reduce request rate
-        time.sleep(random.uniform(0.1, 0.3))
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        json_data = response.json()
+        # Pacing and back-off are handled by the transport's per-host rate limiter
+        response = (transport or get_transport('toto')).get(url, headers=headers, timeout=30, retries=2)
+        json_data = decode_response(response, TotoMarketDataResponse)
         
         for event in json_data['data']['events']:
             event_id = event['id']
             event_name = event['name']
             
             for market in event['markets']:
+                market_name = market['name']
                 for outcome in market['outcomes']:
-                    batch_data.append({
-                        'event_id': event_id,
-                        'Event Name': event_name,
-                        'Market Name': market['name'],
-                        'Outcome Name': outcome['name'],
-                        'Odds (Decimal)': outcome['prices'][0]['decimal'],
-                        'Price Numerator': outcome['prices'][0]['numerator'],
-                        'Price Denominator': outcome['prices'][0]['denominator'],
-                        'Outcome Type': outcome['type'],
-                        'Outcome SubType': outcome.get('subType', '')
-                    })
+                    price = outcome['prices'][0]
+                    batch_data.append(
+                        event_id,
+                        event_name,
+                        market_name,
+                        outcome['name'],
+                        price['decimal'],
+                        price['numerator'],
+                        price['denominator'],
+                        outcome['type'],
+                        outcome.get('subType', '')
+                    )
         
     except Exception as e:
         print(f"Error processing market data: {e} for batch: {batch_market_ids}")
@@ -542,7 +577,8 @@ def process_market_data(
     
     Args:
         market_ids (List[int]): Full list of market IDs
-        max_workers (int): Maximum number of concurrent threads
+        max_workers (int): Maximum number of concurrent threads; the host rate limiter
+            adapts the number of requests actually in flight below this ceiling
         batch_size (int): Number of market IDs to process in each batch
     
     Returns:
@@ -551,14 +587,17 @@ def process_market_data(
     # Split market IDs into batches
     market_id_batches = [market_ids[i:i + batch_size] for i in range(0, len(market_ids), batch_size)]
     
-    # Collected data from all batches
-    all_data = []
+    # Collected data from all batches; batch builders share its interned label tables
+    all_data = ColumnarFrameBuilder(TOTO_OUTCOME_COLUMNS, TOTO_INTERNED_COLUMNS)
+    
+    # Every worker keeps its own keep-alive connection in the shared pool
+    transport = get_transport('toto', pool_maxsize=max_workers)
     
     # Use ThreadPoolExecutor for concurrent processing
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         # Submit all batches
         future_to_batch = {
-            executor.submit(fetch_market_data_for_batch, batch): batch 
+            executor.submit(fetch_market_data_for_batch, batch, transport, all_data.new_part()): batch 
             for batch in market_id_batches
         }
         
@@ -570,41 +609,134 @@ def process_market_data(
             except Exception as e:
                 print(f"Batch processing error: {e}")
     
-    # Convert to DataFrame
-    return pd.DataFrame(all_data) if all_data else pd.DataFrame()
+    # Convert to DataFrame straight from the column lists
+    return all_data.to_frame()
+
+def fetch_event_market_data(
+    event_id: int, 
+    transport: HttpTransport = None, 
+    batch_size: int = 100, 
+    event_data: ColumnarFrameBuilder = None
+) -> ColumnarFrameBuilder:
+    """
+    Fetch the market IDs of a single event and then all of its market data
+    
+    Args:
+        event_id (int): Event ID to process
+        transport (HttpTransport): Shared pooled session, defaults to the 'toto' transport
+        batch_size (int): Number of market IDs to request at once
+        event_data (ColumnarFrameBuilder): Builder to append the rows to, a new one by default
+    
+    Returns:
+        ColumnarFrameBuilder: Market data of the event, one row per outcome in TOTO_OUTCOME_COLUMNS order
+    """
+    if event_data is None:
+        event_data = ColumnarFrameBuilder(TOTO_OUTCOME_COLUMNS, TOTO_INTERNED_COLUMNS)
+    
+    event_market_ids = fetch_market_ids_for_event_batch([event_id], transport)
+    market_ids = next(iter(event_market_ids.values()), [])
+    for i in range(0, len(market_ids), batch_size):
+        fetch_market_data_for_batch(market_ids[i:i + batch_size], transport, event_data)
+    
+    return event_data
+
+def stream_market_data(
+    matches_df: pd.DataFrame, 
+    on_event, 
+    max_workers: int = 20, 
+    batch_size: int = 100
+) -> pd.DataFrame:
+    """
+    Concurrently fetch market data event by event, handing every event over as soon as it is complete
+    
+    Unlike collect_market_ids followed by process_market_data, no market data
+    request waits for the market IDs of all other events, so the first events
+    are available for detection while the rest is still being scraped.
+    
+    Args:
+        matches_df (pd.DataFrame): Matches as returned by get_event_matches
+        on_event (callable): Called with the final rows of every event, including
+            the match columns, in completion order
+        max_workers (int): Maximum number of concurrent threads
+        batch_size (int): Number of market IDs per market data request
+    
+    Returns:
+        pd.DataFrame: DataFrame containing processed market data, as process_market_data
+    """
+    match_columns = matches_df[['event_id', 'sport', 'competition', 'match_name', 'home_team', 'away_team', 'start_time']]
+    
+    # Collected data from all events; event builders share its interned label tables
+    all_data = ColumnarFrameBuilder(TOTO_OUTCOME_COLUMNS, TOTO_INTERNED_COLUMNS)
+    
+    # Every worker keeps its own keep-alive connection in the shared pool
+    transport = get_transport('toto', pool_maxsize=max_workers)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(fetch_event_market_data, event_id, transport, batch_size, all_data.new_part())
+            for event_id in matches_df['event_id'].drop_duplicates()
+        ]
+        
+        for future in as_completed(futures):
+            try:
+                event_data = future.result()
+            except Exception as e:
+                print(f"Event processing error: {e}")
+                continue
+            all_data.extend(event_data)
+            if len(event_data):
+                on_event(event_data.to_frame().merge(match_columns, on='event_id', how='left').drop_duplicates())
+    
+    return all_data.to_frame()
 
-def main() -> Dict[str, pd.DataFrame]:
+def main(on_event=None) -> Dict[str, pd.DataFrame]:
     """
     Main function to scrape and process TOTO betting data
     
+    Args:
+        on_event (callable): When given, events are scraped one by one with
+            stream_market_data and their rows are handed to on_event as soon as
+            each event is complete
+    
     Returns:
         Dict[str, pd.DataFrame]: Dictionary containing matches and market data
     """
+    scrape_started = datetime.utcnow()
     try:
         # Step 1: Get event matches
         logging.info("Toto: Fetching matches...")
         matches_df = get_event_matches()
         
-        # Step 2: Collect market IDs
-        logging.info("Toto: Fetching Market IDs...")
-        event_market_ids_dict = collect_market_ids(
-            matches_df['event_id'].tolist(), 
-            max_workers=20,  
-            batch_size=1
-        )
-        
-        # Step 3: Flatten market IDs into a single list
-        all_market_ids = []
-        for market_ids in event_market_ids_dict.values():
-            all_market_ids.extend(market_ids)
-        
-        # Step 4: Process market data
-        logging.info("Toto: Fetching odds data from Market IDs...")
-        market_data_df = process_market_data(
-            all_market_ids, 
-            max_workers=100,  
-            batch_size=100
-        )
+        if on_event is not None:
+            # Steps 2-4 per event, streaming every completed event
+            logging.info("Toto: Streaming odds data per event...")
+            market_data_df = stream_market_data(
+                matches_df, 
+                on_event, 
+                max_workers=20, 
+                batch_size=100
+            )
+        else:
+            # Step 2: Collect market IDs
+            logging.info("Toto: Fetching Market IDs...")
+            event_market_ids_dict = collect_market_ids(
+                matches_df['event_id'].tolist(), 
+                max_workers=20,  
+                batch_size=1
+            )
+            
+            # Step 3: Flatten market IDs into a single list
+            all_market_ids = []
+            for market_ids in event_market_ids_dict.values():
+                all_market_ids.extend(market_ids)
+            
+            # Step 4: Process market data
+            logging.info("Toto: Fetching odds data from Market IDs...")
+            market_data_df = process_market_data(
+                all_market_ids, 
+                max_workers=100,  
+                batch_size=100
+            )
 
         # Step 5: Create final DataFrame
         final_df = market_data_df.merge(
@@ -613,10 +745,12 @@ def main() -> Dict[str, pd.DataFrame]:
             how='left'
         ).drop_duplicates()
 
-        # Step 6: Upload to Google Cloud Storage
-        storage_mgr = get_storage_manager()
-        blob_path = storage_mgr.upload_dataframe(final_df, 'toto')
-        logging.info(f"Toto: Data uploaded to cloud storage: {blob_path}")
+        # Report how many connections were reused instead of re-established
+        get_transport('toto').log_stats('Toto')
+
+        # Step 6: Upload to Google Cloud Storage, in the background so detection can start right away
+        blob_path = upload_snapshot(final_df, 'toto', scrape_started=scrape_started)
+        logging.info(f"Toto: Data uploaded to cloud storage: {blob_path}" if blob_path else "Toto: Data queued for upload")
         
         return final_df
         
@@ -1,10 +1,18 @@
 import os
+import json
+import hashlib
+import threading
+import time
 import pandas as pd
 import requests
 import regex as re
-from datetime import datetime, timedelta
-from cloud_storage import get_storage_manager
+from datetime import datetime, timedelta, timezone
+from upload_queue import upload_snapshot
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from http_transport import get_transport
+from columnar import ColumnarFrameBuilder
+from fast_json import decode_response, KambiBetOfferResponse
 pd.options.mode.chained_assignment = None  # Suppress SettingWithCopyWarning
 
 # Configure logging
@@ -13,8 +21,140 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+# Columns of the flattened bet offer rows, in output order
+KAMBI_OUTCOME_COLUMNS = [
+    'bet_offer_id', 'criterion_id', 'criterion_label', 'criterion_english_label', 'occurrence_type',
+    'lifetime', 'bet_offer_type_id', 'bet_offer_type_name', 'bet_offer_type_english_name', 'event_id',
+    'outcome_id', 'outcome_label', 'outcome_english_label', 'odds', 'line', 'participant', 'type',
+    'changed_date', 'odds_fractional', 'odds_american', 'status', 'cash_out_status', 'home_score', 'away_score'
+]
+# Labels repeated across many outcomes, stored once per distinct value
+KAMBI_INTERNED_COLUMNS = [
+    'criterion_label', 'criterion_english_label', 'occurrence_type', 'lifetime', 'bet_offer_type_name',
+    'bet_offer_type_english_name', 'outcome_label', 'outcome_english_label', 'participant', 'type',
+    'changed_date', 'odds_fractional', 'status', 'cash_out_status'
+]
+
+# Event IDs per bet offer request, overridable with KAMBI_BET_OFFER_BATCH_SIZE (0 for one request per event).
+# Batches the API rejects are split, so this only needs to be a size it usually accepts.
+DEFAULT_BET_OFFER_BATCH_SIZE = 20
+
+FINGERPRINT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "event_fingerprints.json")
+
+
+class EventFingerprintCache:
+    """
+    Persistent per-event fingerprints of Kambi bet offers.
+
+    For every event it keeps the HTTP validators (ETag/Last-Modified), a hash of
+    the last betoffer payload, the max outcome changedDate and the changedDate of
+    every outcome, so an incremental scrape can skip unchanged events and emit
+    only the outcomes that moved. Entries are evicted once the event has kicked off.
+    """
+
+    def __init__(self, path: str = FINGERPRINT_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self.stats = {'not_modified': 0, 'same_payload': 0, 'changed': 0, 'new': 0}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Kambi: Ignoring unreadable fingerprint cache {path}: {e}")
+
+    def get(self, event_id) -> dict:
+        with self._lock:
+            return self.entries.get(str(event_id))
+
+    def record_kickoffs(self, start_times: dict):
+        """Store the kickoff time of each event, used for TTL eviction."""
+        with self._lock:
+            for event_id, start_time in start_times.items():
+                self.entries.setdefault(str(event_id), {})['start_time'] = start_time
+
+    def diff(self, event_id, response: requests.Response, rows: ColumnarFrameBuilder) -> ColumnarFrameBuilder:
+        """
+        Update the fingerprint of an event and return only its changed outcome rows.
+
+        Rows get a 'delta' flag: True when the event was already known and the row
+        is a changed or new outcome, False when the event is seen for the first time.
+        """
+        outcome_ids = [str(outcome_id) for outcome_id in rows.column('outcome_id')]
+        changed_dates = rows.column('changed_date')
+        outcomes = dict(zip(outcome_ids, changed_dates))
+        with self._lock:
+            entry = self.entries.setdefault(str(event_id), {})
+            known_outcomes = entry.get('outcomes')
+            entry.update({
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'offers_hash': hashlib.blake2b(response.content, digest_size=16).hexdigest(),
+                'max_changed_date': max(outcomes.values(), default=None),
+                'outcomes': outcomes
+            })
+            if known_outcomes is None:
+                self.stats['new'] += 1
+                changed_rows = rows
+            else:
+                self.stats['changed'] += 1
+                changed_rows = rows.take(
+                    index for index, (outcome_id, changed_date) in enumerate(zip(outcome_ids, changed_dates))
+                    if known_outcomes.get(outcome_id) != changed_date
+                )
+        changed_rows.add_column('delta', [known_outcomes is not None] * len(changed_rows))
+        return changed_rows
+
+    def is_same_payload(self, event_id, response: requests.Response) -> bool:
+        """Check whether a 200 response carries exactly the previously seen payload."""
+        entry = self.get(event_id)
+        if not entry or 'offers_hash' not in entry:
+            return False
+        return hashlib.blake2b(response.content, digest_size=16).hexdigest() == entry['offers_hash']
+
+    def count(self, outcome: str):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def conditional_headers(self, event_id) -> dict:
+        """Build If-None-Match/If-Modified-Since headers for an event, if validators are known."""
+        entry = self.get(event_id) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def evict_started(self, now: datetime = None) -> int:
+        """
+        Drop the fingerprints of events whose kickoff has passed.
+
+        Returns:
+            int: Number of evicted events
+        """
+        now = now or datetime.now(timezone.utc)
+        evicted = 0
+        with self._lock:
+            for event_id in list(self.entries):
+                start_time = self.entries[event_id].get('start_time')
+                if start_time and pd.Timestamp(start_time) <= now:
+                    del self.entries[event_id]
+                    evicted += 1
+        return evicted
+
+    def save(self):
+        """Write the cache atomically so an interrupted scrape never leaves a truncated file."""
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
 class BettingDataFetcher:
-    def __init__(self):
+    def __init__(self, max_in_flight: int = 16, bet_offer_batch_size: int = None):
         self.now = datetime.utcnow()
         # Round down to the current hour
         start_datetime = self.now.replace(minute=0, second=0, microsecond=0)
@@ -50,10 +190,22 @@ class BettingDataFetcher:
             "depth": "0",
             "ncid": "1731338297307"
         }
+        # Maximum number of bet offer requests in flight at the same time
+        self.max_in_flight = max_in_flight
+        # Number of event IDs packed into one betoffer request, 0 for one request per event
+        if bet_offer_batch_size is None:
+            bet_offer_batch_size = int(os.getenv('KAMBI_BET_OFFER_BATCH_SIZE', DEFAULT_BET_OFFER_BATCH_SIZE))
+        self.bet_offer_batch_size = bet_offer_batch_size
+        # Template for outcome row builders; parts share its interned label tables
+        self.outcome_rows = ColumnarFrameBuilder(KAMBI_OUTCOME_COLUMNS, KAMBI_INTERNED_COLUMNS)
+        # Per pathTermId timing and failure counts of the last fetch_events call
+        self.discovery_stats = {}
+        # Keep-alive session whose per-host pool matches the in-flight limit
+        self.transport = get_transport('kambi', pool_maxsize=max_in_flight)
 
     def fetch_groups(self):
         """Fetch group data from the API."""
-        response = requests.get(self.base_group_url, headers=self.headers, params=self.params)
+        response = self.transport.get(self.base_group_url, headers=self.headers, params=self.params)
         if response.status_code == 200:
             data = response.json()
             extracted_data = [
@@ -68,113 +220,320 @@ class BettingDataFetcher:
         else:
             raise Exception(f"Failed to fetch groups: {response.status_code}")
 
-    def fetch_events(self, path_term_ids, added_path_terms):
-        """Fetch events based on pathTermId."""
-        all_events_data = []
-        all_path_terms = list(set(list(set(path_term_ids)) + added_path_terms))
-        for path_term_id in all_path_terms:
-            url = self.event_url.format(path_term_id)
-            response = requests.get(url, headers=self.headers, cookies=self.cookies)
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    # Check if 'layout' and the necessary sections exist
-                    if 'layout' in data and 'sections' in data['layout'] and len(data['layout']['sections']) > 1:
-                        sections = data['layout']['sections'][1]
-                        if 'widgets' in sections and len(sections['widgets']) > 0:
-                            widgets = sections['widgets'][0]
-                            if 'matches' in widgets:
-                                matches = widgets['matches']
+    def fetch_path_term_events(self, path_term_id):
+        """
+        Fetch the events listed under a single pathTermId.
+
+        Returns:
+            tuple: (list of event rows, raw response data or None, whether the request failed)
+        """
+        events = []
+        data = None
+        url = self.event_url.format(path_term_id)
+        try:
+            response = self.transport.get(url, headers=self.headers, cookies=self.cookies, retries=2)
+        except requests.RequestException as e:
+            print(f"Request failed for {path_term_id}: {e}")
+            return events, None, True
+        if response.status_code == 200:
+            try:
+                data = response.json()
+                # Check if 'layout' and the necessary sections exist
+                if 'layout' in data and 'sections' in data['layout'] and len(data['layout']['sections']) > 1:
+                    sections = data['layout']['sections'][1]
+                    if 'widgets' in sections and len(sections['widgets']) > 0:
+                        widgets = sections['widgets'][0]
+                        if 'matches' in widgets:
+                            matches = widgets['matches']
                                 
-                                # Check if 'groups' is present in matches
-                                if 'groups' in matches and len(matches['groups']) > 0:
-                                    # Loop over all groups
-                                    for group in matches['groups']:
-                                        group_name = group.get('name', 'N/A')  # Get the group name, if available
-                                        if 'events' in group:
-                                            # Loop over events and gather the necessary information
-                                            for event in group['events']:
-                                                event_info = event.get('event', {})
-                                                event_data = {
-                                                    'event_id': event_info.get('id'),
-                                                    'event_name': event_info.get('englishName'),
-                                                    'start_time': event_info.get('start'),
-                                                    'sport': event_info.get('sport'),
-                                                    'country/sport': path_term_id.split('/')[-1],
-                                                    'group_name': group_name  # Include the group name here
-                                                }
-                                                all_events_data.append(event_data)
-                                        else:
-                                            print(f"No 'events' key in group {group_name} for {path_term_id}")
-                                elif 'events' in matches:
-                                    # Fallback: If 'groups' is not found, check if 'events' is directly under 'matches'
-                                    for event in matches['events']:
-                                        event_info = event.get('event', {})
-                                        event_data = {
-                                            'event_id': event_info.get('id'),
-                                            'event_name': event_info.get('englishName'),
-                                            'start_time': event_info.get('start'),
-                                            'sport': event_info.get('sport'),
-                                            'group_name': 'N/A'  # No group in this case
-                                        }
-                                        all_events_data.append(event_data)
-                                else:
-                                    print(f"No 'groups' or 'events' in matches for {path_term_id}")
+                            # Check if 'groups' is present in matches
+                            if 'groups' in matches and len(matches['groups']) > 0:
+                                # Loop over all groups
+                                for group in matches['groups']:
+                                    group_name = group.get('name', 'N/A')  # Get the group name, if available
+                                    if 'events' in group:
+                                        # Loop over events and gather the necessary information
+                                        for event in group['events']:
+                                            event_info = event.get('event', {})
+                                            event_data = {
+                                                'event_id': event_info.get('id'),
+                                                'event_name': event_info.get('englishName'),
+                                                'start_time': event_info.get('start'),
+                                                'sport': event_info.get('sport'),
+                                                'country/sport': path_term_id.split('/')[-1],
+                                                'group_name': group_name  # Include the group name here
+                                            }
+                                            events.append(event_data)
+                                    else:
+                                        print(f"No 'events' key in group {group_name} for {path_term_id}")
+                            elif 'events' in matches:
+                                # Fallback: If 'groups' is not found, check if 'events' is directly under 'matches'
+                                for event in matches['events']:
+                                    event_info = event.get('event', {})
+                                    event_data = {
+                                        'event_id': event_info.get('id'),
+                                        'event_name': event_info.get('englishName'),
+                                        'start_time': event_info.get('start'),
+                                        'sport': event_info.get('sport'),
+                                        'group_name': 'N/A'  # No group in this case
+                                    }
+                                    events.append(event_data)
                             else:
-                                print(f"No 'matches' in widgets for {path_term_id}")
+                                print(f"No 'groups' or 'events' in matches for {path_term_id}")
                         else:
-                            print(f"No 'widgets' in section for {path_term_id}")
+                            print(f"No 'matches' in widgets for {path_term_id}")
                     else:
-                        print(f"Invalid data structure for {path_term_id}")
+                        print(f"No 'widgets' in section for {path_term_id}")
+                else:
+                    print(f"Invalid data structure for {path_term_id}")
 
-                except Exception as e:
-                    print(f"Error processing {path_term_id}: {e}")
-            else:
-                print(f"Request failed for {path_term_id} with status code: {response.status_code}")
+            except Exception as e:
+                print(f"Error processing {path_term_id}: {e}")
+                return events, data, True
+        else:
+            print(f"Request failed for {path_term_id} with status code: {response.status_code}")
+            return events, None, True
+        return events, data, False
+
+    def fetch_events(self, path_term_ids, added_path_terms, max_workers: int = 8):
+        """
+        Fetch events based on pathTermId, several path terms at a time.
+
+        Path terms are processed in sorted order and merged in that order, so the
+        result does not depend on which request finishes first. Per path term
+        timings, event counts and failures are kept in self.discovery_stats.
+        """
+        all_events_data = []
+        data = None
+        all_path_terms = sorted(set(list(set(path_term_ids)) + added_path_terms), key=str)
+        self.discovery_stats = {}
+
+        def timed_fetch(path_term_id):
+            start = time.perf_counter()
+            events, path_term_data, failed = self.fetch_path_term_events(path_term_id)
+            self.discovery_stats[path_term_id] = {
+                'seconds': round(time.perf_counter() - start, 3),
+                'events': len(events),
+                'failures': int(failed)
+            }
+            return events, path_term_data
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for events, path_term_data in executor.map(timed_fetch, all_path_terms):
+                all_events_data.extend(events)
+                if path_term_data is not None:
+                    data = path_term_data
+        failures = sum(stats['failures'] for stats in self.discovery_stats.values())
+        slowest = max(self.discovery_stats.items(), key=lambda item: item[1]['seconds'], default=(None, {}))
+        logging.info(
+            f"Kambi: Discovery over {len(all_path_terms)} path terms, {failures} failed, "
+            f"slowest {slowest[0]} ({slowest[1].get('seconds')}s)"
+        )
         return pd.DataFrame(all_events_data), data
 
-    def fetch_bet_offers(self, event_ids):
-        """Fetch bet offers for a list of event IDs."""
-        all_rows = []
-        for event_id in event_ids:
-            url = self.bet_offer_url.format(event_id=event_id)
-            response = requests.get(url, headers=self.headers, params=self.params)
-            if response.status_code == 200:
-                data = response.json()
-                for offer in data.get("betOffers", []):
-                    for outcome in offer.get("outcomes", []):
-                        all_rows.append({
-                        'bet_offer_id': offer['id'],
-                        'criterion_id': offer['criterion']['id'],
-                        'criterion_label': offer['criterion']['label'],
-                        'criterion_english_label': offer['criterion'].get('englishLabel', None),  # Safe access
-                        'occurrence_type': offer['criterion'].get('occurrenceType', None),  # Safe access
-                        'lifetime': offer['criterion'].get('lifetime', None),  # Safe access
-                        'bet_offer_type_id': offer['betOfferType']['id'],
-                        'bet_offer_type_name': offer['betOfferType']['name'],
-                        'bet_offer_type_english_name': offer['betOfferType']['englishName'],
-                        'event_id': offer['eventId'],
-                        'outcome_id': outcome['id'],
-                        'outcome_label': outcome['label'],
-                        'outcome_english_label': outcome['englishLabel'],
-                        'odds': outcome.get('odds', None),  # Safe access
-                        'line': outcome.get('line', None),  # New field added
-                        'participant': outcome.get('participant', None),  # New field added
-                        'type': outcome['type'],
-                        'changed_date': outcome['changedDate'],
-                        'odds_fractional': outcome.get('oddsFractional', None),  # Safe access
-                        'odds_american': outcome.get('oddsAmerican', None),  # Safe access
-                        'status': outcome['status'],
-                        'cash_out_status': outcome['cashOutStatus'],
-                        'home_score': outcome.get('homeScore', None),  # Safe access
-                        'away_score': outcome.get('awayScore', None)   # Safe access
-                    })
-            else:
-                print(f"Kambi: Failed to fetch bet offers for event ID {event_id}: {response.status_code}")
-        return pd.DataFrame(all_rows)
+    def parse_bet_offers(self, data, rows: ColumnarFrameBuilder = None) -> ColumnarFrameBuilder:
+        """Flatten a Kambi betoffer response into one row per outcome, in KAMBI_OUTCOME_COLUMNS order."""
+        rows = rows if rows is not None else self.outcome_rows.new_part()
+        for offer in data.get("betOffers", []):
+            criterion = offer['criterion']
+            bet_offer_type = offer['betOfferType']
+            for outcome in offer.get("outcomes", []):
+                rows.append(
+                    offer['id'],
+                    criterion['id'],
+                    criterion['label'],
+                    criterion.get('englishLabel', None),  # Safe access
+                    criterion.get('occurrenceType', None),  # Safe access
+                    criterion.get('lifetime', None),  # Safe access
+                    bet_offer_type['id'],
+                    bet_offer_type['name'],
+                    bet_offer_type['englishName'],
+                    offer['eventId'],
+                    outcome['id'],
+                    outcome['label'],
+                    outcome['englishLabel'],
+                    outcome.get('odds', None),  # Safe access
+                    outcome.get('line', None),  # New field added
+                    outcome.get('participant', None),  # New field added
+                    outcome['type'],
+                    outcome['changedDate'],
+                    outcome.get('oddsFractional', None),  # Safe access
+                    outcome.get('oddsAmerican', None),  # Safe access
+                    outcome['status'],
+                    outcome['cashOutStatus'],
+                    outcome.get('homeScore', None),  # Safe access
+                    outcome.get('awayScore', None)   # Safe access
+                )
+        return rows
 
-    def run(self):
-        """Run the full data fetching process."""
+    def fetch_event_bet_offers(self, event_id, fingerprints: EventFingerprintCache = None):
+        """
+        Fetch and flatten the bet offers of a single event over the pooled session.
+
+        With a fingerprint cache the request is conditional, unchanged payloads are
+        not parsed, and only outcomes whose changedDate moved are returned.
+        """
+        url = self.bet_offer_url.format(event_id=event_id)
+        headers = self.headers
+        if fingerprints is not None:
+            headers = {**self.headers, **fingerprints.conditional_headers(event_id)}
+        try:
+            response = self.transport.get(url, headers=headers, params=self.params, timeout=30, retries=2)
+        except requests.RequestException as e:
+            print(f"Kambi: Failed to fetch bet offers for event ID {event_id}: {e}")
+            return self.outcome_rows.new_part()
+        if fingerprints is not None and response.status_code == 304:
+            fingerprints.count('not_modified')
+            return self.outcome_rows.new_part()
+        if response.status_code == 200:
+            if fingerprints is None:
+                return self.parse_bet_offers(decode_response(response, KambiBetOfferResponse))
+            if fingerprints.is_same_payload(event_id, response):
+                fingerprints.count('same_payload')
+                return self.outcome_rows.new_part()
+            return fingerprints.diff(event_id, response, self.parse_bet_offers(decode_response(response, KambiBetOfferResponse)))
+        print(f"Kambi: Failed to fetch bet offers for event ID {event_id}: {response.status_code}")
+        return self.outcome_rows.new_part()
+
+    def fetch_batch_bet_offers(self, batch_ids):
+        """
+        Fetch the bet offers of several events in one request.
+
+        A failed batch is split in halves and retried until single events remain,
+        so one bad event id only costs its own offers.
+
+        Returns:
+            ColumnarFrameBuilder: Outcome rows grouped per event, in the order of batch_ids
+        """
+        url = self.bet_offer_url.format(event_id=','.join(map(str, batch_ids)))
+        try:
+            response = self.transport.get(url, headers=self.headers, params=self.params, timeout=30, retries=2)
+            status = response.status_code
+            data = decode_response(response, KambiBetOfferResponse) if status == 200 else None
+        except (requests.RequestException, ValueError) as e:
+            status, data = e, None
+        if data is None:
+            if len(batch_ids) == 1:
+                print(f"Kambi: Failed to fetch bet offers for event ID {batch_ids[0]}: {status}")
+                return self.outcome_rows.new_part()
+            middle = len(batch_ids) // 2
+            rows = self.fetch_batch_bet_offers(batch_ids[:middle])
+            rows.extend(self.fetch_batch_bet_offers(batch_ids[middle:]))
+            return rows
+
+        # Kambi does not guarantee the offer order across events, regroup per event
+        rows = self.parse_bet_offers(data)
+        positions_per_event = {event_id: [] for event_id in batch_ids}
+        for position, event_id in enumerate(rows.column('event_id')):
+            positions_per_event.setdefault(event_id, []).append(position)
+        return rows.take(position for positions in positions_per_event.values() for position in positions)
+
+    def fetch_bet_offers(self, event_ids, max_in_flight=None, fingerprints: EventFingerprintCache = None, batch_size=None, on_rows=None):
+        """
+        Fetch bet offers for a list of event IDs with a bounded number of requests in flight.
+
+        Args:
+            event_ids: Event IDs to fetch bet offers for
+            max_in_flight (int): Concurrent request limit, defaults to the fetcher's limit.
+                Use 1 for the old sequential behaviour.
+            fingerprints (EventFingerprintCache): When given, only changed outcome rows
+                are returned, with a 'delta' column. Incremental scrapes always use one
+                conditional request per event, so batch_size is ignored.
+            batch_size (int): Number of event IDs per request, defaults to the
+                fetcher's bet_offer_batch_size
+            on_rows (callable): Called from the worker thread with the ColumnarFrameBuilder
+                of every completed request, as soon as it completes. A blocking callback
+                holds back that worker, which bounds how far fetching runs ahead.
+
+        Returns:
+            pd.DataFrame: One row per outcome, in the order of event_ids
+        """
+        max_in_flight = max_in_flight or self.max_in_flight
+        batch_size = batch_size or self.bet_offer_batch_size
+        self.transport.ensure_pool_size(max_in_flight)
+        # Events listed without an id cannot be requested, skip them rather than the whole scrape
+        event_ids = pd.Series(event_ids, dtype=object).dropna().astype('int64').tolist()
+        if fingerprints is not None or not batch_size:
+            fetch = lambda event_id: self.fetch_event_bet_offers(event_id, fingerprints)
+            tasks = event_ids
+        else:
+            fetch = self.fetch_batch_bet_offers
+            tasks = [event_ids[i:i + batch_size] for i in range(0, len(event_ids), batch_size)]
+        if on_rows is not None:
+            fetch_rows = fetch
+
+            def fetch(task):
+                rows = fetch_rows(task)
+                if len(rows):
+                    on_rows(rows)
+                return rows
+
+        all_rows = self.outcome_rows.new_part()
+        if fingerprints is not None:
+            all_rows.add_column('delta', [])
+        # executor.map yields results in submission order, so the row order
+        # matches the sequential scrape regardless of completion order
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            for rows in executor.map(fetch, tasks):
+                all_rows.extend(rows)
+        return all_rows.to_frame()
+
+    def enrich_bet_offers(self, offers_df: pd.DataFrame, events_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Join the event details onto the outcome rows and normalise names and outcome types.
+
+        Args:
+            offers_df (pd.DataFrame): Outcome rows as returned by fetch_bet_offers
+            events_df (pd.DataFrame): Events as returned by fetch_events
+
+        Returns:
+            pd.DataFrame: Outcome rows in the format uploaded as the 'unibet' snapshot
+        """
+        # Overlapping path terms, e.g. a country and one of its cups, list the same event more than once
+        events_df = events_df.drop_duplicates('event_id')
+        final_df = offers_df.merge(events_df[['event_id', 'event_name', 'sport', 'group_name', 'start_time']], on="event_id", how="left")
+
+        # Function to reformat names from "Last, First" to "First Last"
+        def reformat_name(match_name):
+            # Use regex to match "Last, First - Last, First" format
+            formatted_names = re.sub(r"(\w+), (\w+)", r"\2 \1", match_name)
+            formatted_names = formatted_names.replace(" - ", " vs ")
+            return formatted_names
+
+        # Apply the function to the 'event_name' column
+        final_df['event_name'] = final_df['event_name'].apply(reformat_name)
+
+        # Define a function to swap and reformat the criterion_label for tennis
+        def swap_name_format(row):
+            if row['sport'] == 'TENNIS':
+                # Use regex to capture "Last name, First name" pattern and rearrange
+                match = re.search(r"(\w+), (\w+) wint minstens één set", row['criterion_label'])
+                if match:
+                    last_name, first_name = match.groups()
+                    # Reformat to "First name Last name Wint een Set"
+                    return f"{first_name} {last_name} Wint een Set"
+            # Return the original criterion_label if conditions are not met
+            return row['criterion_label']
+
+        # Apply the function to the criterion_label column
+        final_df['criterion_label'] = final_df.apply(swap_name_format, axis=1)
+
+        # Replace values in the 'type' column
+        final_df['type'] = final_df['type'].replace({'OT_ONE': '1', 'OT_TWO': '2'})
+        return final_df
+
+    def run(self, incremental: bool = False, on_event=None):
+        """
+        Run the full data fetching process.
+
+        Args:
+            incremental (bool): Only emit outcomes that changed since the previous
+                incremental run, using the persistent EventFingerprintCache. The
+                delta rows are uploaded as 'unibet_delta' so the full 'unibet'
+                snapshots stay complete.
+            on_event (callable): Called with the enriched outcome rows of every event
+                as soon as its bet offers are in, for streaming detection
+        """
         try:
             logging.info("Kambi: Fetching groups...")
             groups_df = self.fetch_groups()
@@ -243,43 +602,33 @@ class BettingDataFetcher:
             logging.info(f"Kambi: Fetched {len(events_df)} events.")
 
             logging.info("Kambi: Fetching bet offers...")
-            offers_df = self.fetch_bet_offers(events_df["event_id"].unique())
+            fingerprints = None
+            if incremental:
+                fingerprints = EventFingerprintCache()
+                evicted = fingerprints.evict_started()
+                fingerprints.record_kickoffs(dict(zip(events_df['event_id'], events_df['start_time'])))
+                logging.info(f"Kambi: Evicted {evicted} started events from the fingerprint cache.")
+            on_rows = None
+            if on_event is not None:
+                def on_rows(rows):
+                    event_rows = self.enrich_bet_offers(rows.to_frame(), events_df)
+                    for _, event_df in event_rows.groupby('event_id', sort=False):
+                        on_event(event_df)
+            offers_df = self.fetch_bet_offers(events_df["event_id"].unique(), fingerprints=fingerprints, on_rows=on_rows)
+            if incremental:
+                fingerprints.save()
+                logging.info(f"Kambi: Incremental scrape {fingerprints.stats}, {len(offers_df)} changed outcomes.")
 
-            final_df = offers_df.merge(events_df[['event_id', 'event_name', 'sport', 'group_name', 'start_time']], on="event_id", how="left")
-            
-            # Function to reformat names from "Last, First" to "First Last"
-            def reformat_name(match_name):
-                # Use regex to match "Last, First - Last, First" format
-                formatted_names = re.sub(r"(\w+), (\w+)", r"\2 \1", match_name)
-                formatted_names = formatted_names.replace(" - ", " vs ")
-                return formatted_names
-
-            # Apply the function to the 'event_name' column
-            final_df['event_name'] = final_df['event_name'].apply(reformat_name)
-
-            # Define a function to swap and reformat the criterion_label for tennis
-            def swap_name_format(row):
-                if row['sport'] == 'TENNIS':
-                    # Use regex to capture "Last name, First name" pattern and rearrange
-                    match = re.search(r"(\w+), (\w+) wint minstens één set", row['criterion_label'])
-                    if match:
-                        last_name, first_name = match.groups()
-                        # Reformat to "First name Last name Wint een Set"
-                        return f"{first_name} {last_name} Wint een Set"
-                # Return the original criterion_label if conditions are not met
-                return row['criterion_label']
-
-            # Apply the function to the criterion_label column
-            final_df['criterion_label'] = final_df.apply(swap_name_format, axis=1)
-
-            # Replace values in the 'type' column
-            final_df['type'] = final_df['type'].replace({'OT_ONE': '1', 'OT_TWO': '2'})
+            final_df = self.enrich_bet_offers(offers_df, events_df)
+            if incremental and final_df.empty:
+                # Same columns as a delta with changes, only nothing to upload
+                return final_df
             logging.info(f"Kambi: Fetched {len(final_df)} bet offers.")
+            self.transport.log_stats('Kambi')
             
-            # Upload to Google Cloud Storage
-            storage_mgr = get_storage_manager()
-            blob_path = storage_mgr.upload_dataframe(final_df, 'unibet')
-            logging.info(f"Unibet: Data uploaded to cloud storage: {blob_path}")
+            # Upload to Google Cloud Storage, in the background so detection can start right away
+            blob_path = upload_snapshot(final_df, 'unibet_delta' if incremental else 'unibet', scrape_started=self.now)
+            logging.info(f"Unibet: Data uploaded to cloud storage: {blob_path}" if blob_path else "Unibet: Data queued for upload")
             
             return final_df
             
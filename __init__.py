@@ -1,10 +1,22 @@
 import os
 import subprocess
+import time
+import importlib.util
+import multiprocessing
 from threading import Thread
-from flask import Flask
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from flask import Flask, jsonify
 import ArbSignal_Football
+import ArbSignal_Tennis
+import cloud_storage
+import upload_queue
+import alias_registry
+import pair_cache
+from event_stream import EventStream, FixtureJoiner
+from shared_snapshot import SharedSnapshot, run_detector
 import threading
 import logging
+import pandas as pd
 
 # Paths to the Python scripts
 BASE_DIR = "/Users/ddeboe01/Downloads/ArbitrageBets"
@@ -13,6 +25,11 @@ TOTO_PY = os.path.join(BASE_DIR, "Data/scrapers/Toto/totoAllSport.py")
 ARBSIGNAL_PY_FOOTBALL = os.path.join(BASE_DIR, "ArbSignal_Football.py")
 ARBSIGNAL_PY_TENNIS = os.path.join(BASE_DIR, "ArbSignal_Tennis.py")
 
+# Scraper modules for the in-process pipeline, loaded from this checkout
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+UNIBET_MODULE_PATH = os.path.join(PACKAGE_DIR, "Data/scrapers/unibet/unibetAllSport.py")
+TOTO_MODULE_PATH = os.path.join(PACKAGE_DIR, "Data/scrapers/Toto/totoAllSport.py")
+
 import os
 
 def get_latest_file(sport: str, file_extension: str = "*.csv", directory: str = None) -> str:
@@ -48,7 +65,196 @@ def run_py(script_path):
     subprocess.run(['python3', script_path], check=True)
 
 
-def main():
+def load_module(name: str, path: str):
+    """
+    Import a scraper script as a module, so its functions can be called in-process.
+
+    The scrapers live in plain directories rather than packages, hence the
+    explicit file location.
+    """
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_stage(name: str, timings: dict, func, *args):
+    """Run a pipeline stage and record its wall-clock duration in timings."""
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[name] = round(time.perf_counter() - start, 2)
+        logging.info(f"Pipeline: stage {name} took {timings[name]}s")
+
+
+def save_matching_state():
+    """Persist the aliases and outcome pairs matched this cycle, once per cycle rather than per fixture."""
+    alias_registry.save_alias_registry()
+    pair_cache.save_pair_caches()
+
+
+def run_detector_processes(toto_df: pd.DataFrame, kambi_df: pd.DataFrame):
+    """
+    Run the football and tennis detectors in parallel worker processes on shared snapshots.
+
+    Each snapshot is written once to shared memory as Arrow; the workers map it
+    read-only and only convert their own sport's rows, so the detectors use
+    separate cores without every worker holding and parsing both full books.
+
+    Returns:
+        tuple: (football results, tennis results, private memory per worker in MB)
+    """
+    with SharedSnapshot.publish(toto_df, "toto") as toto, SharedSnapshot.publish(kambi_df, "kambi") as kambi:
+        # Spawned rather than forked, this process runs Flask and scraper threads
+        with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as executor:
+            football_future = executor.submit(run_detector, "football", toto, kambi)
+            tennis_future = executor.submit(run_detector, "tennis", toto, kambi)
+            football_results, football_memory = football_future.result()
+            tennis_results, tennis_memory = tennis_future.result()
+    return football_results, tennis_results, {"football": football_memory, "tennis": tennis_memory}
+
+
+def run_pipeline(detector_processes: bool = False) -> dict:
+    """
+    Scrape both bookmakers and run the detectors in a single process.
+
+    Kambi and Toto are scraped concurrently and their DataFrames are handed
+    straight to the football and tennis detectors, which also run concurrently,
+    so no stage pays interpreter start-up and import cost or a CSV round trip.
+
+    Args:
+        detector_processes (bool): Run the detectors in worker processes on
+            shared-memory snapshots instead of threads, see run_detector_processes
+
+    Returns:
+        dict: The scraped DataFrames, the detector results and per-stage timings in seconds
+    """
+    timings = {}
+    pipeline_start = time.perf_counter()
+
+    unibet_scraper = load_module("unibetAllSport", UNIBET_MODULE_PATH)
+    toto_scraper = load_module("totoAllSport", TOTO_MODULE_PATH)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        kambi_future = executor.submit(run_stage, "kambi_scrape", timings, unibet_scraper.BettingDataFetcher().run)
+        toto_future = executor.submit(run_stage, "toto_scrape", timings, toto_scraper.main)
+        kambi_df = kambi_future.result()
+        toto_df = toto_future.result()
+
+    worker_memory = None
+    if detector_processes:
+        football_results, tennis_results, worker_memory = run_stage(
+            "detection", timings, run_detector_processes, toto_df, kambi_df
+        )
+        logging.info(f"Pipeline: detector private memory (MB) {worker_memory}")
+    else:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            football_future = executor.submit(run_stage, "football_detection", timings, ArbSignal_Football.main, toto_df, kambi_df)
+            tennis_future = executor.submit(run_stage, "tennis_detection", timings, ArbSignal_Tennis.detect_tennis_arbitrage, toto_df, kambi_df)
+            football_results = football_future.result()
+            tennis_results = tennis_future.result()
+        save_matching_state()
+
+    timings["total"] = round(time.perf_counter() - pipeline_start, 2)
+    logging.info(f"Pipeline: timings {timings}")
+    return {
+        "toto": toto_df,
+        "kambi": kambi_df,
+        "football": football_results,
+        "tennis": tennis_results,
+        "worker_memory": worker_memory,
+        "timings": timings
+    }
+
+
+def publish_scrape(stream: EventStream, source: str, scrape):
+    """Run a scraper that publishes its events onto the stream, closing the source when it ends."""
+    try:
+        return scrape(on_event=stream.publisher(source))
+    finally:
+        stream.close(source)
+
+
+def concat_results(frames) -> pd.DataFrame:
+    frames = [frame for frame in frames if not frame.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def run_streaming_pipeline(queue_size: int = 256) -> dict:
+    """
+    Scrape both bookmakers and detect per fixture while the scrapes are still running.
+
+    The scrapers publish every event as soon as its odds are in onto a bounded
+    queue. A FixtureJoiner in this thread pairs the Toto and Kambi events of a
+    fixture and runs the sport's detector the moment both sides are present.
+
+    Args:
+        queue_size (int): Maximum number of event batches waiting for detection
+
+    Returns:
+        dict: The scraped DataFrames, the concatenated detector results, stream statistics and timings
+    """
+    timings = {}
+    pipeline_start = time.perf_counter()
+
+    unibet_scraper = load_module("unibetAllSport", UNIBET_MODULE_PATH)
+    toto_scraper = load_module("totoAllSport", TOTO_MODULE_PATH)
+
+    stream = EventStream(["kambi", "toto"], maxsize=queue_size)
+    joiner = FixtureJoiner({"football": ArbSignal_Football.main, "tennis": ArbSignal_Tennis.detect_tennis_arbitrage})
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        kambi_future = executor.submit(
+            run_stage, "kambi_scrape", timings, publish_scrape, stream, "kambi", unibet_scraper.BettingDataFetcher().run
+        )
+        toto_future = executor.submit(
+            run_stage, "toto_scrape", timings, publish_scrape, stream, "toto", toto_scraper.main
+        )
+        try:
+            for batch in stream:
+                joiner.add(batch)
+        except Exception:
+            # The scrapers block on a full queue, and the executor waits for them on exit
+            stream.drain()
+            raise
+        kambi_df = kambi_future.result()
+        toto_df = toto_future.result()
+    save_matching_state()
+
+    timings["total"] = round(time.perf_counter() - pipeline_start, 2)
+    stream_stats = joiner.get_stats()
+    logging.info(f"Pipeline: stream {stream_stats}")
+    logging.info(f"Pipeline: timings {timings}")
+    return {
+        "toto": toto_df,
+        "kambi": kambi_df,
+        "football": (
+            concat_results(result[0] for result in joiner.results["football"]),
+            concat_results(result[1] for result in joiner.results["football"])
+        ),
+        "tennis": concat_results(joiner.results["tennis"]),
+        "stream": stream_stats,
+        "timings": timings
+    }
+
+
+def main(in_process: bool = True, streaming: bool = False, detector_processes: bool = False):
+    """
+    Run one full scrape and detection cycle.
+
+    Args:
+        in_process (bool): Use the in-process pipeline; False runs every script
+            as a separate Python process like before.
+        streaming (bool): Detect per fixture while scraping, see run_streaming_pipeline
+        detector_processes (bool): Detect in worker processes attached to shared
+            snapshots, see run_detector_processes
+    """
+    if streaming:
+        return run_streaming_pipeline()
+    if in_process:
+        return run_pipeline(detector_processes=detector_processes)
+
     os.chdir(BASE_DIR)  # Set the working directory
 
     # Threads for parallel execution of the first two scripts
@@ -85,6 +291,14 @@ def run_arbitrage_detection():
         try:
             logging.info("Starting arbitrage detection cycle")
             ArbSignal_Football.main()
+            save_matching_state()
+            logging.info(f"Snapshot cache: {cloud_storage.get_storage_manager().get_cache_stats()}")
+            if upload_queue.upload_queue is not None:
+                logging.info(f"Upload queue: {upload_queue.upload_queue.get_stats()}")
+            if alias_registry.alias_registry is not None:
+                logging.info(f"Alias registry: {alias_registry.alias_registry.get_stats()}")
+            for name, cache in pair_cache.pair_caches.items():
+                logging.info(f"Pair cache {name}: {cache.get_stats()}")
             # Sleep for 5 minutes before next check
             threading.Event().wait(300)
         except Exception as e:
@@ -100,6 +314,16 @@ def home():
 def health():
     return 'OK'
 
+@app.route('/cache')
+def cache_stats():
+    storage_mgr = cloud_storage.storage_manager
+    return jsonify(storage_mgr.get_cache_stats() if storage_mgr is not None else {})
+
+@app.route('/uploads')
+def upload_stats():
+    queue = upload_queue.upload_queue
+    return jsonify(queue.get_stats() if queue is not None else {})
+
 if __name__ == '__main__':
     # Start the arbitrage detection in a background thread
     arbitrage_thread = threading.Thread(target=run_arbitrage_detection, daemon=True)
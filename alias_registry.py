@@ -0,0 +1,293 @@
+import os
+import csv
+import json
+import heapq
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+from storage_backend import GenerationMismatch, ObjectNotFound
+from cloud_storage import get_storage_manager
+
+# Object holding the registry in the snapshot storage backend
+ALIAS_REGISTRY_PATH = "odds_data/aliases/registry.json"
+# Aliases kept at most, overridable with ALIAS_REGISTRY_MAX
+DEFAULT_MAX_ALIASES = 50000
+# Days after which a learned alias counts half, overridable with ALIAS_HALF_LIFE_DAYS
+DEFAULT_HALF_LIFE_DAYS = 30.0
+# Fuzzy score (0-100) from which a match is learned as an alias
+LEARN_THRESHOLD = 95
+# Decayed confidence (0-1) below which an alias is no longer used
+MIN_CONFIDENCE = 0.5
+# Seconds after which a used alias has its last seen time moved to now
+SEEN_REFRESH_SECONDS = 86400
+SAVE_ATTEMPTS = 5
+EXPORT_COLUMNS = ['kind', 'entity', 'source', 'spelling', 'confidence', 'seen', 'manual']
+
+
+def alias_key(name: str) -> str:
+    """Lookup key of a spelling: case and whitespace differences do not make a new alias."""
+    return ' '.join(str(name).casefold().split())
+
+
+class AliasRegistry:
+    """
+    Persistent map of team and player spellings per bookmaker onto canonical entities.
+
+    Detectors record the name pairs of high-confidence fuzzy matches here, and
+    on later runs resolve a Toto name with an exact dictionary lookup of its
+    Kambi spelling, so fuzzy matching only runs for names never seen before.
+    Each alias has a confidence, the match score it was learned with, which
+    halves every half_life_days since it was last seen; once below
+    MIN_CONFIDENCE the alias is ignored and eventually pruned. Manually
+    imported aliases have full confidence, never decay and are never
+    overwritten by learning.
+
+    The registry lives as JSON in the storage backend and is merged with the
+    stored version on save, so concurrent detector processes do not lose
+    each other's aliases.
+    """
+
+    def __init__(self, backend=None, path: str = ALIAS_REGISTRY_PATH, max_aliases: int = None,
+                 half_life_days: float = None):
+        """
+        Args:
+            backend (StorageBackend): Where the registry is stored, None keeps it in memory only
+            path (str): Object name of the registry
+            max_aliases (int): Aliases kept; the least confident are pruned beyond this
+            half_life_days (float): Days after which the confidence of a learned alias halves
+        """
+        self.backend = backend
+        self.path = path
+        self.max_aliases = max_aliases or int(os.getenv('ALIAS_REGISTRY_MAX', DEFAULT_MAX_ALIASES))
+        self.half_life_days = half_life_days or float(os.getenv('ALIAS_HALF_LIFE_DAYS', DEFAULT_HALF_LIFE_DAYS))
+        # (kind, source, alias_key(spelling)) -> alias entry
+        self.aliases: Dict[tuple, dict] = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'learned': 0, 'pruned': 0}
+
+    @staticmethod
+    def key(entry: dict) -> tuple:
+        return entry['kind'], entry['source'], alias_key(entry['spelling'])
+
+    def confidence(self, entry: dict, now: datetime = None) -> float:
+        """Confidence of an alias after decay."""
+        if entry['manual']:
+            return entry['confidence']
+        age = ((now or datetime.now(timezone.utc)) - datetime.fromisoformat(entry['seen'])).total_seconds()
+        return entry['confidence'] * 0.5 ** (max(age, 0) / 86400 / self.half_life_days)
+
+    def entity(self, kind: str, source: str, name: str) -> Optional[str]:
+        """Entity a spelling is known as, None when unknown or no longer confident."""
+        if name is None:
+            return None
+        entry = self.aliases.get((kind, source, alias_key(name)))
+        if entry is None or not entry['entity'] or self.confidence(entry) < MIN_CONFIDENCE:
+            return None
+        return entry['entity']
+
+    def resolve(self, kind: str, name: str, candidates: Iterable[str], source: str = 'toto',
+                target: str = 'kambi') -> Optional[str]:
+        """
+        Find the candidate known to be the same entity as name.
+
+        Args:
+            kind (str): 'team' or 'player'
+            name (str): Spelling of the source bookmaker
+            candidates (Iterable[str]): Spellings of the target bookmaker to choose from
+            source (str): Bookmaker of name
+            target (str): Bookmaker of the candidates
+
+        Returns:
+            str: The first candidate registered for name's entity, None when there is none.
+                Both aliases of a hit count as seen, so aliases in use do not decay
+        """
+        with self._lock:
+            entity = self.entity(kind, source, name)
+            if entity is not None:
+                for candidate in candidates:
+                    if self.entity(kind, target, candidate) == entity:
+                        self.stats['hits'] += 1
+                        self.touch(self.aliases[(kind, source, alias_key(name))])
+                        self.touch(self.aliases[(kind, target, alias_key(candidate))])
+                        return candidate
+            self.stats['misses'] += 1
+            return None
+
+    def touch(self, entry: dict):
+        """Mark a learned alias as seen now; at most once per SEEN_REFRESH_SECONDS, to not rewrite the registry every cycle."""
+        now = datetime.now(timezone.utc)
+        if not entry['manual'] and (now - datetime.fromisoformat(entry['seen'])).total_seconds() > SEEN_REFRESH_SECONDS:
+            entry['seen'] = now.isoformat()
+            self.dirty = True
+
+    def learn(self, kind: str, spellings: Dict[str, str], score: float):
+        """
+        Record that the spellings of some bookmakers name the same entity.
+
+        Args:
+            kind (str): 'team' or 'player'
+            spellings (dict): Bookmaker ('toto', 'kambi') -> spelling
+            score (float): Fuzzy match score 0-100; below LEARN_THRESHOLD nothing is learned
+        """
+        if score < LEARN_THRESHOLD or any(spelling is None for spelling in spellings.values()):
+            return
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            existing = [self.aliases.get((kind, source, alias_key(spelling))) for source, spelling in spellings.items()]
+            # A spelling manually kept apart is never aliased
+            if any(entry is not None and not entry['entity'] for entry in existing):
+                return
+            # Keep the entity a spelling already has, the most confident one when they disagree
+            known = [entry for entry in existing if entry is not None]
+            if known:
+                entity = max(known, key=lambda entry: (entry['manual'], self.confidence(entry, now)))['entity']
+            else:
+                entity = f"{kind}:{alias_key(spellings.get('kambi', next(iter(spellings.values()))))}"
+            for (source, spelling), entry in zip(spellings.items(), existing):
+                if entry is not None and entry['manual']:
+                    continue
+                self.aliases[(kind, source, alias_key(spelling))] = {
+                    'kind': kind, 'entity': entity, 'source': source, 'spelling': spelling,
+                    'confidence': round(score / 100, 3), 'seen': now.isoformat(), 'manual': False,
+                }
+                self.stats['learned'] += 1
+            self.dirty = True
+            if len(self.aliases) > self.max_aliases:
+                self.prune(now)
+
+    def prune(self, now: datetime = None):
+        """Drop the least confident learned aliases beyond max_aliases, and those no longer used."""
+        now = now or datetime.now(timezone.utc)
+        expired = [key for key, entry in self.aliases.items() if self.confidence(entry, now) < MIN_CONFIDENCE / 2]
+        for key in expired:
+            del self.aliases[key]
+        excess = len(self.aliases) - self.max_aliases
+        if excess > 0:
+            learned = ((self.confidence(entry, now), key) for key, entry in self.aliases.items() if not entry['manual'])
+            for _, key in heapq.nsmallest(excess, learned):
+                del self.aliases[key]
+        self.stats['pruned'] += len(expired) + max(excess, 0)
+
+    def merge(self, entries: Iterable[dict]):
+        """Merge stored aliases in: manual ones win, otherwise the most recently seen."""
+        for entry in entries:
+            key = self.key(entry)
+            current = self.aliases.get(key)
+            if current is None or (entry['manual'], entry['seen']) > (current['manual'], current['seen']):
+                self.aliases[key] = entry
+
+    def load(self):
+        """Read the stored registry; an unavailable one leaves the registry empty."""
+        if self.backend is None:
+            return
+        try:
+            stored = json.loads(self.backend.download(self.path))
+        except ObjectNotFound:
+            return
+        with self._lock:
+            self.merge(stored['aliases'])
+        logging.info(f"Alias registry: loaded {len(stored['aliases'])} aliases")
+
+    def save(self):
+        """Write learned aliases back, merged with whatever other processes stored meanwhile."""
+        if self.backend is None or not self.dirty:
+            return
+        for _ in range(SAVE_ATTEMPTS):
+            current = self.backend.stat(self.path)
+            try:
+                if current is not None:
+                    stored = json.loads(self.backend.download(self.path))
+                    with self._lock:
+                        self.merge(stored['aliases'])
+                with self._lock:
+                    self.prune()
+                    data = json.dumps({'aliases': list(self.aliases.values())})
+                self.backend.upload(
+                    self.path, data, 'application/json',
+                    if_generation_match=current.generation if current is not None else 0
+                )
+                self.dirty = False
+                logging.info(f"Alias registry: saved {len(self.aliases)} aliases")
+                return
+            except (ObjectNotFound, GenerationMismatch):
+                continue
+        raise RuntimeError(f"Alias registry: gave up saving after {SAVE_ATTEMPTS} attempts")
+
+    def export_csv(self, path: str):
+        """Write all aliases to a CSV file, for review and manual corrections."""
+        with self._lock:
+            entries = sorted(self.aliases.values(), key=lambda entry: (entry['kind'], entry['entity'], entry['source']))
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=EXPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(entries)
+
+    def import_csv(self, path: str) -> int:
+        """
+        Load corrected aliases from a CSV file in the export format.
+
+        Every row becomes a manual alias, with confidence 1 unless given. A row
+        with an empty entity keeps its spelling from ever being aliased, e.g.
+        to undo a wrong match.
+
+        Returns:
+            int: Number of rows applied
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        applied = 0
+        with open(path, newline='', encoding='utf-8') as f, self._lock:
+            for row in csv.DictReader(f):
+                self.aliases[(row['kind'], row['source'], alias_key(row['spelling']))] = {
+                    'kind': row['kind'], 'entity': row.get('entity') or '', 'source': row['source'],
+                    'spelling': row['spelling'], 'confidence': float(row.get('confidence') or 1.0),
+                    'seen': now, 'manual': True,
+                }
+                applied += 1
+            self.dirty = True
+        return applied
+
+    def get_stats(self) -> dict:
+        """Return the lookup and learning counters and the number of aliases."""
+        with self._lock:
+            return dict(self.stats, aliases=len(self.aliases))
+
+
+def alias_registry_enabled() -> bool:
+    """Aliases are learned and used unless ALIAS_REGISTRY=0."""
+    return os.getenv('ALIAS_REGISTRY', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+# Initialize the alias registry
+alias_registry = None
+_registry_lock = threading.Lock()
+
+def get_alias_registry() -> Optional[AliasRegistry]:
+    """Return the global alias registry, loaded from the snapshot storage backend; None when disabled."""
+    global alias_registry
+    if not alias_registry_enabled():
+        return None
+    with _registry_lock:
+        if alias_registry is None:
+            backend = None
+            try:
+                backend = get_storage_manager().backend
+            except Exception as e:
+                logging.warning(f"Alias registry: storage unavailable, aliases are kept in memory only: {e}")
+            alias_registry = AliasRegistry(backend)
+            try:
+                alias_registry.load()
+            except Exception as e:
+                logging.warning(f"Alias registry: could not load stored aliases: {e}")
+    return alias_registry
+
+
+def save_alias_registry():
+    """Persist what the global registry learned; failures are logged, they must not fail detection."""
+    if alias_registry is None:
+        return
+    try:
+        alias_registry.save()
+    except Exception as e:
+        logging.error(f"Alias registry: could not save aliases: {e}")
@@ -0,0 +1,68 @@
+"""
+Peak RSS and build time of list-of-dicts vs ColumnarFrameBuilder for a large scrape.
+
+Each mode runs in its own subprocess so the reported peak RSS is not shared.
+Labels are rebuilt for every row, like json decoding does, so the dict mode keeps
+one string object per row and the columnar mode has to intern them.
+
+Usage:
+    python benchmarks/columnar_builder_benchmark.py [n_outcomes]
+"""
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../Data/scrapers/unibet')))
+
+
+def outcome_values(n_outcomes: int):
+    """Yield Kambi-like outcome rows in KAMBI_OUTCOME_COLUMNS order."""
+    for i in range(n_outcomes):
+        offer = i // 2
+        yield (
+            offer, 1001159 + offer % 300, ''.join(['Totaal Aantal Doelpunten ', str(offer % 300)]),
+            ''.join(['Total Goals ', str(offer % 300)]), 'GOALS', 'FULL_TIME', 6, ''.join(['Over/', 'Under']),
+            ''.join(['Over/', 'Under']), 1000000 + offer // 40, i, ''.join(['Ov', 'er']), ''.join(['Ov', 'er']),
+            1500 + i % 700, 2500, None, ''.join(['OT_', 'OVER']), ''.join(['2025-01-26T14:23:', str(i % 60), 'Z']),
+            ''.join(['1/', str(i % 5 + 1)]), '-200', ''.join(['OP', 'EN']), ''.join(['ENA', 'BLED']), None, None
+        )
+
+
+def run_mode(mode: str, n_outcomes: int):
+    from unibetAllSport import KAMBI_OUTCOME_COLUMNS, KAMBI_INTERNED_COLUMNS
+    from columnar import ColumnarFrameBuilder
+
+    start = time.perf_counter()
+    if mode == 'dicts':
+        all_rows = []
+        for values in outcome_values(n_outcomes):
+            all_rows.append(dict(zip(KAMBI_OUTCOME_COLUMNS, values)))
+        accumulated = time.perf_counter()
+        frame = __import__('pandas').DataFrame(all_rows)
+    else:
+        builder = ColumnarFrameBuilder(KAMBI_OUTCOME_COLUMNS, KAMBI_INTERNED_COLUMNS)
+        for values in outcome_values(n_outcomes):
+            builder.append(*values)
+        accumulated = time.perf_counter()
+        frame = builder.to_frame(categorical=(mode == 'categorical'))
+    built = time.perf_counter()
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:>12}: accumulate {accumulated - start:6.2f}s  build {built - accumulated:6.2f}s  "
+          f"peak RSS {peak_rss_mb:8.1f} MB  frame {frame.memory_usage(deep=True).sum() / 2**20:8.1f} MB")
+
+
+def main():
+    n_outcomes = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{n_outcomes} outcomes")
+    for mode in ['dicts', 'columnar', 'categorical']:
+        subprocess.run([sys.executable, __file__, '--mode', mode, str(n_outcomes)], check=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == '--mode':
+        run_mode(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
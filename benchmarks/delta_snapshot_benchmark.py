@@ -0,0 +1,62 @@
+"""
+Benchmark of delta snapshots against full snapshots.
+
+Moves the odds of a growing fraction of the outcomes of a synthetic Kambi
+snapshot and compares the bytes of the full snapshot with those of the delta
+upload_dataframe would write instead, plus the time to diff and to rebuild.
+
+Usage:
+    python benchmarks/delta_snapshot_benchmark.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from snapshot_format import dataframe_to_parquet
+from snapshot_delta import DELTA_KEYS, diff_snapshots, apply_delta
+from snapshot_format_benchmark import make_kambi_snapshot
+
+
+def check_repeated_events(keys):
+    """An event listed by several path terms must not duplicate its outcomes, or no delta can be computed."""
+    previous = make_kambi_snapshot(n_events=50, repeated_events=5)
+    assert previous['outcome_id'].is_unique, "repeated events duplicated their outcomes"
+    current = previous.copy()
+    current.loc[0, 'odds'] += 10
+    delta = diff_snapshots(previous, current, keys)
+    assert delta is not None and len(delta) == 1, "snapshot with repeated events was not diffed"
+    print("Repeated events: outcomes unique, delta of 1 row")
+
+
+def main():
+    keys = DELTA_KEYS['unibet']
+    check_repeated_events(keys)
+    previous = make_kambi_snapshot()
+    full_bytes = len(dataframe_to_parquet(previous, 'unibet'))
+    rng = np.random.default_rng(0)
+    print(f"Kambi snapshot: {len(previous)} rows, {full_bytes / 2**20:.2f}MB as Parquet")
+    print(f"  {'moved':>6} {'delta rows':>10} {'delta size':>10} {'diff':>7} {'rebuild':>8}")
+    for fraction in (0.01, 0.05, 0.2):
+        current = previous.copy()
+        moved = rng.choice(len(current), int(len(current) * fraction), replace=False)
+        current.loc[moved, 'odds'] += 10
+
+        start = time.perf_counter()
+        delta = diff_snapshots(previous, current, keys)
+        diff_time = time.perf_counter() - start
+        delta_bytes = len(dataframe_to_parquet(delta, 'unibet'))
+        start = time.perf_counter()
+        rebuilt = apply_delta(previous, delta, keys)
+        rebuild_time = time.perf_counter() - start
+        assert len(rebuilt) == len(current)
+
+        print(f"  {fraction:6.0%} {len(delta):10} {delta_bytes / 2**20:8.2f}MB "
+              f"{diff_time * 1000:5.0f}ms {rebuild_time * 1000:6.0f}ms  ({full_bytes / delta_bytes:.0f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark of the football Draw No Bet fixture matching.
+
+Matches synthetic Toto and Kambi Draw No Bet markets, with the Kambi team
+names spelled slightly differently, once with fixture_matching.match_fixtures
+and, on a sample of Toto rows, with the row-wise fuzzywuzzy scan it replaced.
+The row-wise time is extrapolated to all rows, and the matches of the sample
+are compared.
+
+Usage:
+    python benchmarks/fixture_matching_benchmark.py [n_events] [sample_rows]
+"""
+import os
+import sys
+import time
+import random
+
+import pandas as pd
+from fuzzywuzzy import fuzz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fixture_matching import match_fixtures, BLOCK_COLUMNS
+
+SYLLABLES = ['ka', 'lo', 'ven', 'dor', 'mi', 'sta', 'ber', 'gen', 'ro', 'ta', 'hal', 'wijk', 'rsk', 'ul', 'zee', 'mond']
+PREFIXES = ['FC ', 'SV ', 'Real ', 'AS ', '']
+SUFFIXES = [' United', ' City', ' Rovers', '', '']
+
+
+def team_names(n: int, rnd: random.Random):
+    names = set()
+    while len(names) < n:
+        base = ''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))).capitalize()
+        names.add(rnd.choice(PREFIXES) + base + rnd.choice(SUFFIXES))
+    return sorted(names)
+
+
+def kambi_spelling(name: str, rnd: random.Random) -> str:
+    """How Kambi might write a Toto team name: without its prefix, or abbreviated."""
+    variant = rnd.random()
+    if variant < 0.3:
+        return name.split(' ', 1)[-1] if name.startswith(tuple(PREFIXES[:-1])) else name
+    if variant < 0.4:
+        return name.replace(' United', ' Utd')
+    return name
+
+
+def make_dnb_markets(n_events: int, seed: int = 0):
+    rnd = random.Random(seed)
+    teams = team_names(2 * n_events, rnd)
+    rnd.shuffle(teams)
+    toto_rows, kambi_rows = [], []
+    for e in range(n_events):
+        home, away = teams[2 * e], teams[2 * e + 1]
+        start_time = f"2025-01-{1 + e % 28:02d}T{12 + e % 9}:00:00Z"
+        sex = 'W' if e % 10 == 0 else 'M'
+        kambi_event = f"{kambi_spelling(home, rnd)} vs {kambi_spelling(away, rnd)}"
+        for subtype in ['1', '2']:
+            toto_rows.append((f"{home} vs {away}", 'Draw No Bet', subtype, sex, start_time))
+            kambi_rows.append((kambi_event, 'Draw No Bet', subtype, sex, start_time))
+    toto_df = pd.DataFrame(toto_rows, columns=['Event Name', 'Market Name', 'Outcome SubType'] + BLOCK_COLUMNS)
+    kambi_df = pd.DataFrame(kambi_rows, columns=['event_name', 'criterion_label', 'outcome_label'] + BLOCK_COLUMNS)
+    # Kambi lists its events in its own order
+    return toto_df, kambi_df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def row_wise_match(event_name, kambi_df):
+    """The per-row scan of ArbSignal_Football.create_merged_df_winnaar before match_fixtures."""
+    parts = event_name.split(' vs ')
+    if len(parts) == 2:
+        team1 = parts[0].strip()
+        team2 = parts[1].strip()
+        kambi_matches = kambi_df[
+            (kambi_df['Team1'].apply(lambda x: fuzz.token_set_ratio(team1, x) >= 80)) &
+            (kambi_df['Team2'].apply(lambda x: fuzz.token_set_ratio(team2, x) >= 80))
+        ]
+        if not kambi_matches.empty:
+            best_score_team1 = kambi_matches['Team1'].apply(lambda x: fuzz.token_set_ratio(team1, x)).max()
+            best_score_team2 = kambi_matches['Team2'].apply(lambda x: fuzz.token_set_ratio(team2, x)).max()
+            return kambi_matches['event_name'].iloc[0], (best_score_team1 + best_score_team2) / 2
+    return None, None
+
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    sample_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    toto_df, kambi_df = make_dnb_markets(n_events)
+    print(f"Toto {len(toto_df)} rows, Kambi {len(kambi_df)} rows, {n_events} events each")
+
+    start = time.perf_counter()
+    matches = match_fixtures(toto_df, kambi_df)
+    matched = toto_df.merge(matches, on=['Event Name'] + BLOCK_COLUMNS, how='left')
+    blocked_time = time.perf_counter() - start
+    print(f"  {'blocked matrix':>15}: {blocked_time:8.2f}s  {matches['matched_event'].notna().sum()} "
+          f"of {len(matches)} events matched")
+
+    kambi_df[['Team1', 'Team2']] = kambi_df['event_name'].str.split(' vs ', expand=True)
+    sample = matched.sample(sample_rows, random_state=1)
+    start = time.perf_counter()
+    row_wise = [row_wise_match(event_name, kambi_df) for event_name in sample['Event Name']]
+    row_wise_time = (time.perf_counter() - start) / sample_rows * len(toto_df)
+    print(f"  {'row-wise':>15}: {row_wise_time:8.2f}s  extrapolated from {sample_rows} rows, "
+          f"{row_wise_time / blocked_time:.0f}x slower")
+
+    # The row-wise scan ignored kickoff and sex, so its first match could be a
+    # fixture at another time, which the merge on start_time and sex then dropped
+    kickoffs = kambi_df.drop_duplicates('event_name').set_index('event_name')[BLOCK_COLUMNS]
+    same, other_block = 0, 0
+    for (_, row), (event, score) in zip(sample.iterrows(), row_wise):
+        if event is not None and tuple(kickoffs.loc[event]) != tuple(row[BLOCK_COLUMNS]):
+            other_block += 1
+        elif (event, score) == (row['matched_event'], row['fuzzy_score']) or (event is None and pd.isna(row['matched_event'])):
+            same += 1
+    print(f"  sample: {same} of {sample_rows} rows identical, {other_block} row-wise matches at another kickoff")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Compare one-request-per-event with multi-event batched Kambi bet offer requests.
+
+Checks that every mode returns an identical DataFrame, including batches that the
+stand-in server rejects and the fetcher has to split.
+
+Usage:
+    python benchmarks/kambi_batch_benchmark.py [n_events] [latency_seconds]
+"""
+import sys
+import time
+
+from kambi_standin import start_standin_server, point_fetcher_at
+from unibetAllSport import BettingDataFetcher
+
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    # Requests for more than 40 events fail, so batch_size=64 has to split
+    server, base_url = start_standin_server(latency, max_batch=40)
+    event_ids = list(range(1000000, 1000000 + n_events))
+
+    results = {}
+    for batch_size in [0, 10, 40, 64]:
+        fetcher = point_fetcher_at(BettingDataFetcher(bet_offer_batch_size=batch_size), base_url)
+        requests_before = sum(stats['requests'] for stats in fetcher.transport.get_stats().values())
+        start = time.perf_counter()
+        offers_df = fetcher.fetch_bet_offers(event_ids)
+        elapsed = time.perf_counter() - start
+        requests_made = sum(stats['requests'] for stats in fetcher.transport.get_stats().values()) - requests_before
+        results[batch_size] = offers_df
+        print(f"batch_size={str(batch_size):>4}: {elapsed:7.2f}s  {requests_made:5d} requests  {len(offers_df)} rows")
+
+    baseline = results[0]
+    for batch_size, offers_df in results.items():
+        assert offers_df.equals(baseline), f"batch_size={batch_size} changed the DataFrame"
+    print("Batched and unbatched modes returned identical DataFrames")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
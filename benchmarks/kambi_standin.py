@@ -0,0 +1,107 @@
+"""
+Local stand-in for the Kambi offering API, used by the scraper benchmarks.
+
+Serves synthetic betoffer payloads with a configurable per-request latency so
+that fetch strategies can be compared without touching eu-offering-api.kambicdn.com.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'Data/scrapers/unibet'))
+
+BET_OFFER_PATH = re.compile(r"/offering/v2018/ubnl/betoffer/event/([\d,]+)\.json")
+
+
+def make_bet_offers(event_id: int, offers_per_event: int = 20) -> list:
+    """Build a deterministic list of Kambi bet offers for one event."""
+    offers = []
+    for i in range(offers_per_event):
+        offer_id = event_id * 1000 + i
+        offers.append({
+            "id": offer_id,
+            "eventId": event_id,
+            "criterion": {
+                "id": 1001159 + i,
+                "label": f"Totaal Aantal Doelpunten {i}",
+                "englishLabel": f"Total Goals {i}",
+                "occurrenceType": "GOALS",
+                "lifetime": "FULL_TIME"
+            },
+            "betOfferType": {"id": 6, "name": "Over/Under", "englishName": "Over/Under"},
+            "outcomes": [
+                {
+                    "id": offer_id * 10 + side,
+                    "label": label,
+                    "englishLabel": label,
+                    "odds": 1500 + 10 * i + side,
+                    "line": 2500,
+                    "type": "OT_OVER" if side == 0 else "OT_UNDER",
+                    "changedDate": "2025-01-26T14:23:09Z",
+                    "oddsFractional": "1/2",
+                    "oddsAmerican": "-200",
+                    "status": "OPEN",
+                    "cashOutStatus": "ENABLED"
+                }
+                for side, label in enumerate(["Over", "Under"])
+            ]
+        })
+    return offers
+
+
+class KambiStandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real CDN
+    disable_nagle_algorithm = True
+    latency = 0.02
+    offers_per_event = 20
+    # Larger multi-event requests are rejected, to exercise batch splitting
+    max_batch = None
+
+    def do_GET(self):
+        match = BET_OFFER_PATH.match(self.path.split('?')[0])
+        if not match:
+            self.send_error(404)
+            return
+        time.sleep(self.latency)
+        event_ids = [int(event_id) for event_id in match.group(1).split(',')]
+        if self.max_batch and len(event_ids) > self.max_batch:
+            self.send_error(414)
+            return
+        bet_offers = []
+        for event_id in event_ids:
+            bet_offers.extend(make_bet_offers(event_id, self.offers_per_event))
+        body = json.dumps({"betOffers": bet_offers}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_standin_server(latency: float = 0.02, max_batch: int = None):
+    """
+    Start the stand-in server on a free local port in a daemon thread.
+
+    Returns:
+        tuple: (server, base_url)
+    """
+    handler = type("Handler", (KambiStandInHandler,), {"latency": latency, "max_batch": max_batch})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def point_fetcher_at(fetcher, base_url: str):
+    """Redirect a BettingDataFetcher's bet offer requests to the stand-in server."""
+    fetcher.bet_offer_url = base_url + "/offering/v2018/ubnl/betoffer/event/{event_id}.json"
+    return fetcher
@@ -0,0 +1,54 @@
+"""
+Benchmark of recording Kambi bet offer responses into the ResponseArchive and replaying them.
+
+Fetches from the local stand-in server while recording, then fetches the same
+events again from the archive only, and reports the compression achieved with
+the trained dictionaries and the fetch time of both runs.
+
+Usage:
+    python benchmarks/response_archive_benchmark.py [n_events] [latency_seconds]
+"""
+import os
+import sys
+import time
+import tempfile
+
+from kambi_standin import start_standin_server, point_fetcher_at
+from http_transport import HttpTransport
+from response_archive import ResponseArchive
+from unibetAllSport import BettingDataFetcher
+
+
+def fetch(archive, base_url, event_ids):
+    fetcher = point_fetcher_at(BettingDataFetcher(max_in_flight=16), base_url)
+    fetcher.transport = HttpTransport('kambi', pool_maxsize=16, archive=archive)
+    start = time.perf_counter()
+    offers_df = fetcher.fetch_bet_offers(event_ids, batch_size=1)
+    return offers_df, time.perf_counter() - start
+
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    server, base_url = start_standin_server(latency)
+    event_ids = list(range(1000000, 1000000 + n_events))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'responses.sqlite')
+        archive = ResponseArchive(path)
+        recorded_df, record_time = fetch(archive, base_url, event_ids)
+        stats = archive.get_stats()
+        archive.close()
+        print(f"record: {record_time:6.2f}s  {stats['recorded']} responses, {stats['raw_bytes'] / 2**20:.1f}MB raw, "
+              f"{stats['stored_bytes'] / 2**20:.2f}MB stored with {archive.codec_name} "
+              f"({stats['compression_ratio']}x), file {os.path.getsize(path) / 2**20:.2f}MB")
+
+        archive = ResponseArchive(path, replay=True)
+        server.shutdown()
+        replayed_df, replay_time = fetch(archive, base_url, event_ids)
+        print(f"replay: {replay_time:6.2f}s  {archive.get_stats()['replayed']} responses, "
+              f"{n_events / replay_time:.0f} events/s, identical: {recorded_df.equals(replayed_df)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark of the snapshot handoff to detector worker processes.
+
+Compares two ways of getting synthetic Toto and Kambi snapshots into one
+worker per sport: pickling both full DataFrames into every worker, and
+publishing them once as shared Arrow snapshots that the workers map and
+filter to their own sport. Reports the handoff time and the private (unshared)
+memory of every worker, without running the detectors themselves.
+
+Usage:
+    python benchmarks/shared_snapshot_benchmark.py
+"""
+import os
+import sys
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from event_stream import SPORTS
+from shared_snapshot import SharedSnapshot, private_memory_mb
+from snapshot_format_benchmark import make_toto_snapshot, make_kambi_snapshot
+
+
+def sport_labels(sport):
+    return [label for label, label_sport in SPORTS.items() if label_sport == sport]
+
+
+def load_pickled(sport, toto_df, kambi_df):
+    labels = sport_labels(sport)
+    rows = len(toto_df[toto_df['sport'].isin(labels)]) + len(kambi_df[kambi_df['sport'].isin(labels)])
+    return rows, private_memory_mb()
+
+
+def load_shared(sport, toto, kambi):
+    labels = sport_labels(sport)
+    rows = len(toto.to_pandas(sports=labels)) + len(kambi.to_pandas(sports=labels))
+    return rows, private_memory_mb()
+
+
+def run(name, func, *snapshots):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as executor:
+        # Warm up the workers, so interpreter start-up is not measured
+        list(executor.map(sum, [[], []]))
+        start = time.perf_counter()
+        futures = {sport: executor.submit(func, sport, *snapshots) for sport in ('football', 'tennis')}
+        results = {sport: future.result() for sport, future in futures.items()}
+        elapsed = time.perf_counter() - start
+    workers = ", ".join(f"{sport} {rows} rows {memory:.0f}MB" for sport, (rows, memory) in results.items())
+    print(f"  {name:>8}: {elapsed * 1000:6.0f}ms  {workers}")
+
+
+def main():
+    toto_df = make_toto_snapshot(4000)
+    kambi_df = make_kambi_snapshot(4000)
+    print(f"Toto {len(toto_df)} rows, Kambi {len(kambi_df)} rows, private memory per worker")
+    run("pickled", load_pickled, toto_df, kambi_df)
+    start = time.perf_counter()
+    with SharedSnapshot.publish(toto_df, "toto") as toto, SharedSnapshot.publish(kambi_df, "kambi") as kambi:
+        print(f"  {'publish':>8}: {(time.perf_counter() - start) * 1000:6.0f}ms")
+        run("shared", load_shared, toto, kambi)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark of the CSV and Parquet snapshot formats of CloudStorageManager.
+
+Serialises synthetic Toto and Kambi snapshots (or CSV snapshots passed on the
+command line) the way upload_dataframe does and reads them back the way
+get_latest_file does, without the network transfer.
+
+Usage:
+    python benchmarks/snapshot_format_benchmark.py [toto|unibet snapshot.csv ...]
+"""
+import io
+import sys
+import time
+
+import pandas as pd
+
+from kambi_standin import make_bet_offers
+from unibetAllSport import BettingDataFetcher
+from snapshot_format import dataframe_to_parquet, parquet_to_dataframe
+
+# Columns the detectors actually use, for the projected read
+PROJECTIONS = {
+    'toto': ['Event Name', 'Market Name', 'Outcome Name', 'Odds (Decimal)', 'Outcome Type', 'Outcome SubType',
+             'sport', 'competition', 'start_time'],
+    'unibet': ['criterion_label', 'criterion_english_label', 'bet_offer_type_name', 'bet_offer_type_english_name',
+               'outcome_label', 'outcome_english_label', 'odds', 'line', 'participant', 'type', 'event_name',
+               'sport', 'group_name', 'start_time'],
+}
+
+
+def make_kambi_snapshot(n_events: int = 2000, repeated_events: int = 0) -> pd.DataFrame:
+    """Synthetic enriched Kambi snapshot; the first repeated_events events are listed twice, as by overlapping path terms."""
+    fetcher = BettingDataFetcher()
+    rows = fetcher.outcome_rows.new_part()
+    for event_id in range(1000000, 1000000 + n_events):
+        fetcher.parse_bet_offers({"betOffers": make_bet_offers(event_id, offers_per_event=40)}, rows)
+    offers_df = rows.to_frame()
+    events_df = pd.DataFrame({
+        'event_id': range(1000000, 1000000 + n_events),
+        'event_name': [f"Team {i} A - Team {i} B" for i in range(n_events)],
+        'sport': ['FOOTBALL' if i % 3 else 'TENNIS' for i in range(n_events)],
+        'group_name': [f"League {i % 40}" for i in range(n_events)],
+        'start_time': [f"2025-01-{1 + i % 28:02d}T{12 + i % 10}:00:00Z" for i in range(n_events)],
+    })
+    events_df = pd.concat([events_df, events_df.head(repeated_events)], ignore_index=True)
+    return fetcher.enrich_bet_offers(offers_df, events_df)
+
+
+def make_toto_snapshot(n_events: int = 2000, markets_per_event: int = 40) -> pd.DataFrame:
+    rows = []
+    for e in range(n_events):
+        event_name = f"Team {e} A vs Team {e} B"
+        for m in range(markets_per_event):
+            for side, outcome in enumerate(["Over", "Under"]):
+                rows.append((
+                    20000000 + e, event_name, f"Totaal Goals Over/Under {m}.5", outcome, 1.8 + side / 10,
+                    4 + side, 5, 'HL', outcome[0], 'Voetbal' if e % 3 else 'Tennis', f"Competitie {e % 40}",
+                    event_name, f"Team {e} A", f"Team {e} B", f"2025-01-{1 + e % 28:02d}T{12 + e % 10}:00:00Z"
+                ))
+    return pd.DataFrame(rows, columns=[
+        'event_id', 'Event Name', 'Market Name', 'Outcome Name', 'Odds (Decimal)', 'Price Numerator',
+        'Price Denominator', 'Outcome Type', 'Outcome SubType', 'sport', 'competition', 'match_name',
+        'home_team', 'away_team', 'start_time'
+    ])
+
+
+def timed(func, repeat: int = 3):
+    """Return the result of func and its best wall-clock time over repeat runs."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def bench(name: str, source: str, df: pd.DataFrame):
+    csv_text, csv_write = timed(lambda: df.to_csv(index=False))
+    csv_bytes = csv_text.encode()
+    _, csv_read = timed(lambda: pd.read_csv(io.BytesIO(csv_bytes)))
+    parquet_bytes, parquet_write = timed(lambda: dataframe_to_parquet(df, source))
+    _, parquet_read = timed(lambda: parquet_to_dataframe(parquet_bytes))
+    columns = [column for column in PROJECTIONS[source] if column in df.columns]
+    _, projected_read = timed(lambda: parquet_to_dataframe(parquet_bytes, columns=columns))
+    _, categorical_read = timed(lambda: parquet_to_dataframe(parquet_bytes, columns=columns, categorical=True))
+
+    print(f"{name}: {len(df)} rows, {len(df.columns)} columns")
+    print(f"  {'format':>24} {'size':>10} {'write':>9} {'read':>9}")
+    print(f"  {'csv':>24} {len(csv_bytes) / 2**20:8.2f}MB {csv_write * 1000:7.0f}ms {csv_read * 1000:7.0f}ms")
+    print(f"  {'parquet':>24} {len(parquet_bytes) / 2**20:8.2f}MB {parquet_write * 1000:7.0f}ms {parquet_read * 1000:7.0f}ms")
+    print(f"  {f'parquet {len(columns)} columns':>24} {'':>10} {'':>9} {projected_read * 1000:7.0f}ms")
+    print(f"  {'parquet categorical':>24} {'':>10} {'':>9} {categorical_read * 1000:7.0f}ms")
+    print(f"  size {len(csv_bytes) / len(parquet_bytes):.1f}x smaller, read {csv_read / parquet_read:.1f}x faster, "
+          f"projected read {csv_read / projected_read:.1f}x faster")
+
+
+def main():
+    if len(sys.argv) > 2:
+        source = sys.argv[1]
+        for path in sys.argv[2:]:
+            bench(path, source, pd.read_csv(path))
+        return
+    bench("Toto snapshot", 'toto', make_toto_snapshot())
+    bench("Kambi snapshot", 'unibet', make_kambi_snapshot())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Throughput benchmark of CloudStorageManager on the offline storage backends.
+
+Uploads synthetic Toto and Kambi snapshots and reads them back through the
+in-memory and local filesystem backends, with the snapshot cache disabled, so
+the serialisation and storage path can be measured without any network.
+
+Usage:
+    python benchmarks/storage_backend_benchmark.py [rounds]
+"""
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cloud_storage import CloudStorageManager
+from storage_backend import LocalBackend, MemoryBackend
+from snapshot_format_benchmark import make_toto_snapshot, make_kambi_snapshot
+
+
+def bench(name, backend, snapshots, rounds):
+    manager = CloudStorageManager(formats={'toto': 'parquet', 'unibet': 'parquet'}, backend=backend)
+    manager.cache = None
+    # Full snapshots every round, not deltas against the previous one
+    manager.delta_chain = 0
+    manager.history = None
+    rows = sum(len(df) for df in snapshots.values()) * rounds
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for source, df in snapshots.items():
+            manager.upload_dataframe(df, source)
+    upload = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for source in snapshots:
+            manager.read_snapshot(source)
+    read = time.perf_counter() - start
+    print(f"  {name:>6}: upload {rows / upload:9.0f} rows/s, read {rows / read:9.0f} rows/s")
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    snapshots = {'toto': make_toto_snapshot(), 'unibet': make_kambi_snapshot()}
+    print(f"{sum(len(df) for df in snapshots.values())} rows per round, {rounds} rounds")
+    bench("memory", MemoryBackend(), snapshots, rounds)
+    with tempfile.TemporaryDirectory() as directory:
+        bench("local", LocalBackend(directory), snapshots, rounds)
+
+
+if __name__ == "__main__":
+    main()
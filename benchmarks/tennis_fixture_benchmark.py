@@ -0,0 +1,97 @@
+"""
+Benchmark of the tennis fixture matching.
+
+Builds synthetic Toto and Kambi tennis books, with a few outcome rows per
+event for each of the three markets, and matches their event names once
+with fixture_matching.resolve_fixtures and select_fixture_matches, and as the market builders did
+before: a process.extractOne over the Kambi events at the same kickoff for
+every Toto row of every market. The matches of both are compared.
+
+Usage:
+    python benchmarks/tennis_fixture_benchmark.py [n_events] [rows_per_market]
+"""
+import os
+import sys
+import time
+import random
+
+import pandas as pd
+from rapidfuzz import process, fuzz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fixture_matching import resolve_fixtures, select_fixture_matches, normalize_event_name
+from kickoff_index import KickoffIndex
+
+FIRST_NAMES = ['Novak', 'Iga', 'Carlos', 'Aryna', 'Jannik', 'Coco', 'Daniil', 'Elena', 'Holger', 'Ons']
+SYLLABLES = ['ka', 'lo', 'vic', 'dor', 'mi', 'sta', 'ber', 'gen', 'ro', 'ta', 'ski', 'ova', 'nen', 'ez']
+MARKETS = 3
+
+
+def player_names(n: int, rnd: random.Random):
+    names = set()
+    while len(names) < n:
+        surname = ''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))).capitalize()
+        names.add(f"{rnd.choice(FIRST_NAMES)} {surname}")
+    return sorted(names)
+
+
+def make_tennis_books(n_events: int, rows_per_market: int, seed: int = 0):
+    rnd = random.Random(seed)
+    players = player_names(2 * n_events, rnd)
+    rnd.shuffle(players)
+    toto_rows, kambi_rows = [], []
+    for e in range(n_events):
+        home, away = players[2 * e], players[2 * e + 1]
+        start_time = f"2025-01-{1 + e % 28:02d}T{10 + e % 10}:00:00Z"
+        # Kambi writes the surname first
+        kambi_event = ' - '.join(f"{name.split(' ', 1)[1]}, {name.split(' ', 1)[0]}" for name in (home, away))
+        kambi_rows.append((kambi_event, start_time))
+        toto_rows += [(f"{home} - {away}", start_time)] * (MARKETS * rows_per_market)
+    toto_df = pd.DataFrame(toto_rows, columns=['Event Name', 'start_time'])
+    kambi_df = pd.DataFrame(kambi_rows, columns=['event_name', 'start_time'])
+    return toto_df, kambi_df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def row_wise_match(toto_df, kambi_df):
+    """The per-row extractOne of each ArbSignal_Tennis market builder before resolve_fixtures."""
+    toto_df = toto_df.assign(**{'Event Name': toto_df['Event Name'].apply(normalize_event_name)})
+    kambi_df = kambi_df.assign(event_name=kambi_df['event_name'].apply(normalize_event_name))
+    kickoff_index = KickoffIndex(kambi_df)
+
+    def find_best_match(event_name, start_time):
+        kambi_events = kickoff_index.candidates(start_time)['event_name'].tolist()
+        result = process.extractOne(event_name, kambi_events, scorer=fuzz.token_set_ratio, score_cutoff=90)
+        return None if result is None else result[0]
+
+    return toto_df.apply(lambda row: find_best_match(row['Event Name'], row['start_time']), axis=1)
+
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rows_per_market = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    toto_df, kambi_df = make_tennis_books(n_events, rows_per_market)
+    print(f"Toto {len(toto_df)} rows, Kambi {len(kambi_df)} events, {n_events} events each")
+
+    start = time.perf_counter()
+    fixture_matches = resolve_fixtures(toto_df, kambi_df)
+    kambi_normalized = kambi_df.assign(event_name=kambi_df['event_name'].apply(normalize_event_name))
+    matches = select_fixture_matches(fixture_matches, kambi_normalized)
+    resolved = toto_df.assign(**{'Event Name': toto_df['Event Name'].apply(normalize_event_name)}).merge(
+        matches, on=['Event Name', 'start_time'], how='left'
+    )['matched_event']
+    table_time = time.perf_counter() - start
+    print(f"  {'match table':>12}: {table_time:8.2f}s  {len(matches)} of "
+          f"{len(toto_df.drop_duplicates(['Event Name', 'start_time']))} events matched")
+
+    start = time.perf_counter()
+    row_wise = row_wise_match(toto_df, kambi_df)
+    row_wise_time = time.perf_counter() - start
+    print(f"  {'row-wise':>12}: {row_wise_time:8.2f}s  {row_wise_time / table_time:.0f}x slower")
+
+    same = (resolved.fillna('') == row_wise.fillna('').to_numpy()).sum()
+    print(f"  {same} of {len(toto_df)} rows matched identically")
+
+
+if __name__ == "__main__":
+    main()
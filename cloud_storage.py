@@ -1,71 +1,474 @@
 import os
+import json
+import logging
 from datetime import datetime
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from google.cloud import storage
+from typing import Dict, Iterable, Optional
 from dotenv import load_dotenv
+from storage_backend import StorageBackend, ObjectInfo, ObjectNotFound, GenerationMismatch, backend_from_env
+from snapshot_cache import SnapshotCache, cache_from_env
+from snapshot_format import dataframe_to_parquet, parquet_to_dataframe, parquet_columns, to_utc, PARQUET_CONTENT_TYPE, SNAPSHOT_SCHEMA_VERSION
+from odds_history import OddsHistory, history_enabled
+from snapshot_delta import DELTA_KEYS, CHANGE_COLUMN, diff_snapshots, apply_delta, delta_summary
 
 # Load environment variables
 load_dotenv()
 
+# Supported snapshot formats and their file extensions
+SNAPSHOT_EXTENSIONS = {'csv': 'csv', 'parquet': 'parquet'}
+
+# One small pointer object per source, outside the snapshot prefixes
+MANIFEST_PREFIX = "odds_data/manifests"
+MANIFEST_UPDATE_ATTEMPTS = 5
+
+# Snapshots split per sport and kickoff date live below this prefix
+PARTITION_PREFIX = "odds_data/partitions"
+PARTITION_UPLOAD_WORKERS = 8
+
+# Snapshots that only hold the rows changed since the previous upload
+DELTA_PREFIX = "odds_data/deltas"
+# Deltas written on top of one full snapshot before the next full one, overridable
+# with SNAPSHOT_DELTA_CHAIN (0 always uploads full snapshots)
+DEFAULT_DELTA_CHAIN = 12
+# A delta changing more than this fraction of the rows is uploaded as a full snapshot
+DELTA_MAX_FRACTION = 0.5
+
+
+def parse_snapshot_formats(value: str) -> Dict[str, str]:
+    """
+    Parse a per-source format setting such as "toto=parquet,unibet=parquet".
+
+    Args:
+        value (str): Comma separated source=format pairs
+
+    Returns:
+        Dict[str, str]: Format per source
+    """
+    formats = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        source, _, file_format = item.partition('=')
+        file_format = file_format.strip().lower()
+        if file_format not in SNAPSHOT_EXTENSIONS:
+            raise ValueError(f"Unsupported snapshot format for {source}: {file_format}")
+        formats[source.strip()] = file_format
+    return formats
+
+
+def partition_keys(df: pd.DataFrame):
+    """
+    Return the sport and kickoff date (UTC, YYYY-MM-DD) of every row, used to partition uploads.
+    
+    Returns:
+        tuple: (sports, dates) as string Series aligned with df, 'unknown' where missing
+    """
+    sports = df['sport'].fillna('unknown').astype(str)
+    dates = pd.to_datetime(df['start_time'], utc=True, errors='coerce').dt.strftime('%Y-%m-%d').fillna('unknown')
+    return sports, dates
+
+
+def partition_matches(partition: dict, sports: Optional[set], start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]) -> bool:
+    """Whether a manifest partition can hold rows for the given sports and kickoff window."""
+    if sports is not None and partition['sport'] not in sports:
+        return False
+    if partition.get('first_start') is None or partition.get('last_start') is None:
+        return True
+    first_start, last_start = to_utc(partition['first_start']), to_utc(partition['last_start'])
+    if start is not None and last_start < start:
+        return False
+    if end is not None and first_start >= end:
+        return False
+    return True
+
+
 class CloudStorageManager:
-    def __init__(self):
-        self.project_id = os.getenv('GCP_PROJECT_ID')
-        self.bucket_name = os.getenv('GCP_BUCKET_NAME')
-        self.credentials_path = os.getenv('GCP_CREDENTIALS_PATH')
-        
-        if not all([self.project_id, self.bucket_name, self.credentials_path]):
-            raise ValueError("Missing required Google Cloud Storage configuration in environment variables")
-        
-        # Set credentials
-        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = self.credentials_path
-        self.client = storage.Client()
-        self.bucket = self.client.bucket(self.bucket_name)
+    def __init__(self, formats: Dict[str, str] = None, backend: StorageBackend = None, cache: Optional[SnapshotCache] = None):
+        """
+        Args:
+            formats (Dict[str, str]): Snapshot format per source, see parse_snapshot_formats
+            backend (StorageBackend): Object store to use, selected by STORAGE_BACKEND
+                by default (Google Cloud Storage, a local directory or memory)
+            cache (SnapshotCache): Local read-through cache for downloaded snapshots,
+                configured from SNAPSHOT_CACHE_DIR / SNAPSHOT_CACHE_MAX_MB by default
+        """
+        self.backend = backend if backend is not None else backend_from_env()
+        self.bucket_name = self.backend.name
+        
+        # Snapshot format per source, e.g. SNAPSHOT_FORMATS="toto=parquet,unibet=parquet"; CSV by default
+        self.formats = formats if formats is not None else parse_snapshot_formats(os.getenv('SNAPSHOT_FORMATS', ''))
+        
+        # Snapshots are immutable per generation, so repeated reads can be served from disk
+        self.cache = cache if cache is not None else cache_from_env()
+        
+        # Odds changes of every upload, queryable by event and time; ODDS_HISTORY=0 disables it
+        self.history = OddsHistory(self.backend, self.cache) if history_enabled() else None
+        
+        # Upload only the rows that changed since the previous snapshot of a source
+        self.delta_chain = int(os.getenv('SNAPSHOT_DELTA_CHAIN', DEFAULT_DELTA_CHAIN))
+        # Last snapshot uploaded by this process per source, as (uploaded, DataFrame)
+        self.last_uploads = {}
     
-    def upload_dataframe(self, df: pd.DataFrame, source: str) -> str:
+    def get_format(self, source: str) -> str:
+        """Return the snapshot format configured for a source."""
+        return self.formats.get(source, 'csv')
+    
+    def upload_dataframe(
+        self, 
+        df: pd.DataFrame, 
+        source: str, 
+        file_format: str = None, 
+        scrape_started: datetime = None, 
+        partitioned: bool = None
+    ) -> str:
         """
-        Upload a DataFrame to Google Cloud Storage.
+        Upload a DataFrame to Google Cloud Storage and point the source's manifest at it.
+        
+        When this process uploaded the previous snapshot of the source, and fewer
+        than SNAPSHOT_DELTA_CHAIN deltas were written since the last full snapshot,
+        only the inserted, updated and removed rows are uploaded as a delta, see
+        snapshot_delta. The odds that changed are also appended to the source's
+        odds history, see OddsHistory.
         
         Args:
             df (pd.DataFrame): DataFrame to upload
             source (str): Source identifier ('toto' or 'unibet')
+            file_format (str): 'csv' or 'parquet', defaults to the format configured for the source
+            scrape_started (datetime): UTC time at which the scrape started, recorded in the manifest
+            partitioned (bool): Upload one file per sport and kickoff date, see read_snapshot.
+                Defaults to True for non-empty data with 'sport' and 'start_time' columns.
             
         Returns:
-            str: Cloud storage path of the uploaded file
+            str: Cloud storage path of the uploaded file or delta, or of the directory holding its partitions
         """
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        filename = f"{source}_data_{timestamp}.csv"
-        blob_path = f"odds_data/{source}/{filename}"
+        file_format = file_format or self.get_format(source)
+        if partitioned is None:
+            partitioned = not df.empty and {'sport', 'start_time'} <= set(df.columns)
+        uploaded = datetime.utcnow()
+        timestamp = uploaded.strftime("%Y%m%d_%H%M%S")
+        extension = SNAPSHOT_EXTENSIONS[file_format]
+        manifest = {
+            'source': source,
+            'format': file_format,
+            'rows': len(df),
+            'columns': [str(column) for column in df.columns],
+            'schema_version': SNAPSHOT_SCHEMA_VERSION,
+            'scrape_started': scrape_started.isoformat() if scrape_started else None,
+            'uploaded': uploaded.isoformat(),
+            'base_uploaded': uploaded.isoformat(),
+            'deltas': [],
+        }
+        
+        previous_manifest, delta = self.snapshot_delta(df, source)
+        if delta is not None:
+            blob_path = f"{DELTA_PREFIX}/{source}/{source}_delta_{timestamp}.{extension}"
+            generation = self.upload_frame(delta, source, file_format, blob_path)
+            summary = delta_summary(delta)
+            logging.info(f"Storage: {source} delta with {summary['upserts']} changed and {summary['removals']} removed rows")
+            # Same base, one more delta on top of it
+            manifest = dict(
+                previous_manifest, 
+                rows=len(df), 
+                scrape_started=manifest['scrape_started'], 
+                uploaded=manifest['uploaded'], 
+                deltas=previous_manifest.get('deltas', []) + [
+                    dict(summary, blob_path=blob_path, generation=generation, uploaded=manifest['uploaded'])
+                ]
+            )
+        elif partitioned:
+            blob_path = f"{PARTITION_PREFIX}/{source}/{source}_data_{timestamp}"
+            sports, dates = partition_keys(df)
+            
+            def upload_partition(key, part):
+                sport, date = key
+                part_path = f"{blob_path}/sport={quote(sport, safe='')}/date={date}.{extension}"
+                part_generation = self.upload_frame(part, source, file_format, part_path)
+                start_times = part['start_time'].dropna().astype(str)
+                return {
+                    'sport': sport,
+                    'date': date,
+                    'blob_path': part_path,
+                    'generation': part_generation,
+                    'rows': len(part),
+                    'first_start': start_times.min() if len(start_times) else None,
+                    'last_start': start_times.max() if len(start_times) else None,
+                }
+            
+            # Partitions are small and independent, upload them concurrently
+            with ThreadPoolExecutor(max_workers=PARTITION_UPLOAD_WORKERS) as executor:
+                partitions = list(executor.map(lambda item: upload_partition(*item), df.groupby([sports, dates], sort=True)))
+            manifest.update(blob_path=blob_path, generation=None, partitions=partitions)
+        else:
+            blob_path = f"odds_data/{source}/{source}_data_{timestamp}.{extension}"
+            generation = self.upload_frame(df, source, file_format, blob_path)
+            manifest.update(blob_path=blob_path, generation=generation)
         
-        # Create a blob
-        blob = self.bucket.blob(blob_path)
+        self.update_manifest(source, manifest)
+        self.last_uploads[source] = (manifest['uploaded'], df)
         
-        # Convert DataFrame to CSV and upload
-        blob.upload_from_string(df.to_csv(index=False), 'text/csv')
+        if self.history is not None:
+            try:
+                self.history.append(df, source, observed_at=scrape_started or uploaded)
+            except Exception as e:
+                # The snapshot is safely stored, a gap in the history must not fail the scrape
+                logging.error(f"Storage: could not record {source} odds history: {e}")
         
         return blob_path
     
-    def get_latest_file(self, source: str) -> pd.DataFrame:
+    def snapshot_delta(self, df: pd.DataFrame, source: str):
+        """
+        Diff a snapshot against the previous one, when a delta can be uploaded instead of a full snapshot.
+        
+        Returns:
+            tuple: (manifest of the previous snapshot, delta DataFrame), or (None, None)
+                when a full snapshot has to be uploaded
+        """
+        last_upload = self.last_uploads.get(source)
+        if source not in DELTA_KEYS or self.delta_chain <= 0 or last_upload is None:
+            return None, None
+        previous_manifest = self.get_manifest(source)
+        # Another process uploaded since, or the chain of deltas is long enough
+        if (previous_manifest is None or previous_manifest.get('uploaded') != last_upload[0]
+                or len(previous_manifest.get('deltas', [])) >= self.delta_chain):
+            return None, None
+        delta = diff_snapshots(last_upload[1], df, DELTA_KEYS[source])
+        if delta is None or len(delta) > DELTA_MAX_FRACTION * max(len(df), 1):
+            return None, None
+        return previous_manifest, delta
+    
+    def upload_frame(self, df: pd.DataFrame, source: str, file_format: str, blob_path: str) -> int:
+        """Serialise a DataFrame in the given format and upload it to blob_path, returning its generation."""
+        if file_format == 'parquet':
+            # Typed, dictionary-encoded and compressed with the source's schema
+            return self.backend.upload(blob_path, dataframe_to_parquet(df, source), PARQUET_CONTENT_TYPE)
+        
+        # Convert DataFrame to CSV and upload
+        return self.backend.upload(blob_path, df.to_csv(index=False), 'text/csv')
+    
+    def get_manifest(self, source: str) -> Optional[dict]:
+        """
+        Read the pointer to the latest snapshot of a source.
+        
+        Args:
+            source (str): Source identifier ('toto' or 'unibet')
+            
+        Returns:
+            dict: Latest blob path, generation, format, row count, schema version and
+                scrape/upload timestamps; None when the source has no manifest yet
+        """
+        try:
+            return json.loads(self.backend.download(f"{MANIFEST_PREFIX}/{source}.json"))
+        except ObjectNotFound:
+            return None
+    
+    def update_manifest(self, source: str, manifest: dict):
+        """
+        Atomically replace the manifest of a source, unless a newer upload already did.
+        
+        The write is conditional on the generation that was read, so two scrapers
+        uploading at once can never leave the manifest pointing at the older snapshot.
+        
+        Args:
+            source (str): Source identifier ('toto' or 'unibet')
+            manifest (dict): New manifest, with an ISO 'uploaded' timestamp
+        """
+        manifest_path = f"{MANIFEST_PREFIX}/{source}.json"
+        for _ in range(MANIFEST_UPDATE_ATTEMPTS):
+            current = self.backend.stat(manifest_path)
+            if current is not None:
+                try:
+                    current_manifest = json.loads(self.backend.download(manifest_path))
+                except ObjectNotFound:
+                    continue
+                if current_manifest.get('uploaded', '') > manifest['uploaded']:
+                    return
+            try:
+                self.backend.upload(
+                    manifest_path, json.dumps(manifest), 'application/json',
+                    if_generation_match=current.generation if current is not None else 0
+                )
+                return
+            except GenerationMismatch:
+                continue
+        logging.warning(f"Storage: gave up updating the {source} manifest after {MANIFEST_UPDATE_ATTEMPTS} attempts")
+    
+    def get_latest_file(self, source: str, columns: Optional[Iterable[str]] = None, categorical: bool = False) -> pd.DataFrame:
         """
         Get the latest file from Google Cloud Storage for a specific source.
         
+        CSV and Parquet snapshots are both read, whichever was uploaded last, and
+        partitioned snapshots are read in full. See read_snapshot to read a subset.
+        
         Args:
             source (str): Source identifier ('toto' or 'unibet')
+            columns (Iterable[str]): Columns to read, all by default. Parquet
+                snapshots only decode these columns.
+            categorical (bool): Return the labels of Parquet snapshots as pandas categoricals
             
         Returns:
             pd.DataFrame: DataFrame containing the latest data
         """
-        # List all blobs in the source directory
-        blobs = list(self.bucket.list_blobs(prefix=f"odds_data/{source}/"))
+        return self.read_snapshot(source, columns=columns, categorical=categorical)
+    
+    def read_snapshot(
+        self, 
+        source: str, 
+        sports: Optional[Iterable[str]] = None, 
+        start=None, 
+        end=None, 
+        columns: Optional[Iterable[str]] = None, 
+        categorical: bool = False
+    ) -> pd.DataFrame:
+        """
+        Read the rows of the latest snapshot that match sport and kickoff time filters.
         
-        if not blobs:
-            raise FileNotFoundError(f"No files found for source: {source}")
+        For partitioned snapshots only the partitions of the requested sports and
+        kickoff dates are downloaded, so the cost scales with the selection rather
+        than with the whole book. Older, single-file snapshots are read in full and
+        filtered afterwards, with the same result. Deltas uploaded since the last
+        full snapshot are applied on top of it. Downloads go through the local
+        cache, which is only missed when a blob's generation is new.
+        
+        Args:
+            source (str): Source identifier ('toto' or 'unibet')
+            sports (Iterable[str]): Values of the 'sport' column to keep, all by default
+            start (datetime | str): Keep events kicking off at or after this UTC time
+            end (datetime | str): Keep events kicking off before this UTC time
+            columns (Iterable[str]): Columns to return, all by default
+            categorical (bool): Return the labels of Parquet snapshots as pandas categoricals
+            
+        Returns:
+            pd.DataFrame: Matching rows of the latest snapshot
+        """
+        start, end = to_utc(start), to_utc(end)
+        windowed = start is not None or end is not None
+        sports = set(sports) if sports is not None else None
+        manifest = self.get_manifest(source)
+        deltas = manifest.get('deltas', []) if manifest is not None else []
+        keys = DELTA_KEYS.get(source, [])
+        read_columns = list(columns) if columns is not None else None
+        if read_columns is not None:
+            # Columns needed to filter rows of single-file snapshots and to apply deltas
+            read_columns += [
+                column for column in ['sport', 'start_time'] + (keys if deltas else []) if column not in read_columns
+            ]
+        
+        if manifest is not None and manifest.get('partitions') is not None:
+            partitions = [
+                partition for partition in manifest['partitions']
+                if partition_matches(partition, sports, start, end)
+            ]
+            with ThreadPoolExecutor(max_workers=PARTITION_UPLOAD_WORKERS) as executor:
+                frames = list(executor.map(
+                    lambda partition: self.read_blob(partition['blob_path'], partition['generation'], read_columns, categorical),
+                    partitions
+                ))
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=read_columns or manifest['columns'])
+        else:
+            if manifest is not None:
+                # A single small read instead of listing every historical snapshot
+                blob_path, generation = manifest['blob_path'], manifest.get('generation')
+            else:
+                # Sources uploaded before manifests existed
+                latest_blob = self.find_latest_blob(source)
+                blob_path, generation = latest_blob.name, latest_blob.generation
+            df = self.read_blob(blob_path, generation, read_columns, categorical)
         
-        # Get the latest blob based on creation time
-        latest_blob = max(blobs, key=lambda x: x.time_created)
+        if deltas:
+            # Rebuild the latest state, the deltas being applied in upload order
+            with ThreadPoolExecutor(max_workers=PARTITION_UPLOAD_WORKERS) as executor:
+                delta_frames = list(executor.map(
+                    lambda delta: self.read_blob(
+                        delta['blob_path'], delta['generation'], 
+                        read_columns + [CHANGE_COLUMN] if read_columns is not None else None, categorical
+                    ),
+                    deltas
+                ))
+            for delta_df in delta_frames:
+                df = apply_delta(df, delta_df, keys)
+        
+        if sports is not None and 'sport' in df.columns:
+            df = df[df['sport'].isin(sports)]
+        if windowed and 'start_time' in df.columns:
+            kickoff = pd.to_datetime(df['start_time'], utc=True, errors='coerce')
+            keep = pd.Series(True, index=df.index)
+            if start is not None:
+                keep &= kickoff >= start
+            if end is not None:
+                keep &= kickoff < end
+            df = df[keep]
+        if columns is not None:
+            df = df[list(columns)]
+        return df.reset_index(drop=True)
+    
+    def read_changes(self, source: str, since: str) -> Optional[pd.DataFrame]:
+        """
+        Read the rows that changed since an earlier snapshot, instead of the whole latest snapshot.
+        
+        Args:
+            source (str): Source identifier ('toto' or 'unibet')
+            since (str): 'uploaded' timestamp of the manifest of the earlier snapshot
+            
+        Returns:
+            pd.DataFrame: Upserted rows and the keys of removed rows, told apart by the
+                '_change' column, latest change per key; None when a full snapshot was
+                uploaded since, so the whole snapshot has to be read again
+        """
+        manifest = self.get_manifest(source)
+        if manifest is None or source not in DELTA_KEYS or manifest.get('base_uploaded', manifest['uploaded']) > since:
+            return None
+        deltas = [delta for delta in manifest.get('deltas', []) if delta['uploaded'] > since]
+        if not deltas:
+            return pd.DataFrame(columns=manifest['columns'] + [CHANGE_COLUMN])
+        df = pd.concat(
+            [self.read_blob(delta['blob_path'], delta['generation']) for delta in deltas], ignore_index=True
+        )
+        return df.drop_duplicates(DELTA_KEYS[source], keep='last').reset_index(drop=True)
+    
+    def read_blob(self, blob_path: str, generation, columns: Optional[Iterable[str]] = None, categorical: bool = False) -> pd.DataFrame:
+        """
+        Read one snapshot blob, from the local cache when its generation is there.
+        
+        Args:
+            blob_path (str): Object name in the bucket
+            generation: Object generation, None to bypass the cache
+            columns (Iterable[str]): Columns to read; columns missing from the blob are skipped
+            categorical (bool): Return the labels of Parquet blobs as pandas categoricals
+            
+        Returns:
+            pd.DataFrame: Blob contents
+        """
+        content = self.cache.get(blob_path, generation) if self.cache is not None else None
+        if content is None:
+            content = self.backend.download(blob_path)
+            if self.cache is not None:
+                # Read the cached file from now on, Parquet is then memory-mapped
+                content = self.cache.put(blob_path, generation, content) or content
+        
+        if blob_path.endswith('.parquet'):
+            if columns is not None:
+                available = set(parquet_columns(content))
+                columns = [column for column in columns if column in available]
+            return parquet_to_dataframe(content, columns=columns, categorical=categorical)
+        
+        # Read the CSV
+        if isinstance(content, bytes):
+            content = pd.io.common.BytesIO(content)
+        wanted = set(columns) if columns is not None else None
+        return pd.read_csv(content, usecols=(lambda column: column in wanted) if wanted is not None else None)
+    
+    def get_cache_stats(self) -> dict:
+        """Return the hit, miss and bytes saved counters of the snapshot cache."""
+        return self.cache.get_stats() if self.cache is not None else {}
+    
+    def find_latest_blob(self, source: str) -> ObjectInfo:
+        """Find the latest snapshot of a source by listing all of them."""
+        latest_blob = self.backend.latest(prefix=f"odds_data/{source}/")
+        
+        if latest_blob is None:
+            raise FileNotFoundError(f"No files found for source: {source}")
         
-        # Download and read the CSV
-        content = latest_blob.download_as_string()
-        return pd.read_csv(pd.io.common.BytesIO(content))
+        return latest_blob
 
 # Initialize the storage manager
 storage_manager = None
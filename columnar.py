@@ -0,0 +1,103 @@
+import pandas as pd
+from typing import Any, Dict, Iterable, List
+
+
+class ColumnarFrameBuilder:
+    """
+    Accumulate scraper output column by column instead of as one dict per row.
+
+    Every column is a plain list that values are appended to positionally, so no
+    per-row dict (and no copy of every key string) is ever created. Columns listed
+    in `interned` hold repeated labels such as market or criterion names; equal
+    values are collapsed onto one shared str object, so a million outcomes with a
+    few hundred distinct labels only keep a few hundred label strings alive.
+    """
+
+    def __init__(self, columns: Iterable[str], interned: Iterable[str] = ()):
+        self.columns = list(columns)
+        self.interned = [column for column in interned if column in self.columns]
+        self.data: Dict[str, List[Any]] = {column: [] for column in self.columns}
+        # Shared value -> canonical object tables; builders created with new_part() reuse them
+        self._intern_tables = {column: {} for column in self.interned}
+        self._appenders = [self.data[column].append for column in self.columns]
+        self._interned_positions = [self.columns.index(column) for column in self.interned]
+
+    def __len__(self) -> int:
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def new_part(self) -> 'ColumnarFrameBuilder':
+        """Create an empty builder with the same columns that shares this builder's intern tables."""
+        part = ColumnarFrameBuilder(self.columns, self.interned)
+        part._intern_tables = self._intern_tables
+        return part
+
+    def append(self, *values):
+        """Append one row; values must be given in column order."""
+        if self._interned_positions:
+            values = list(values)
+            for position, column in zip(self._interned_positions, self.interned):
+                value = values[position]
+                if value is not None:
+                    values[position] = self._intern_tables[column].setdefault(value, value)
+        for append, value in zip(self._appenders, values):
+            append(value)
+
+    def extend(self, other: 'ColumnarFrameBuilder'):
+        """Append all rows of another builder with the same columns."""
+        if len(other) == 0:
+            return
+        for column in self.columns:
+            self.data[column].extend(other.data[column])
+
+    def column(self, name: str) -> List[Any]:
+        return self.data[name]
+
+    def add_column(self, name: str, values: List[Any]):
+        """Add a column of len(self) values."""
+        if name not in self.data:
+            self.columns.append(name)
+        self.data[name] = list(values)
+        self._appenders = [self.data[column].append for column in self.columns]
+
+    def take(self, indices: Iterable[int]) -> 'ColumnarFrameBuilder':
+        """
+        Select rows by position.
+
+        Returns:
+            ColumnarFrameBuilder: New builder holding only the selected rows, in the given order
+        """
+        indices = list(indices)
+        selected = self.new_part()
+        for column in self.columns:
+            source = self.data[column]
+            selected.data[column] = [source[index] for index in indices]
+        selected._appenders = [selected.data[column].append for column in selected.columns]
+        return selected
+
+    def to_frame(self, categorical: bool = False) -> pd.DataFrame:
+        """
+        Build the DataFrame directly from the column lists.
+
+        Args:
+            categorical (bool): Store the interned columns as pandas categoricals
+
+        Returns:
+            pd.DataFrame: One column per builder column, in builder order
+        """
+        frame = pd.DataFrame(self.data, columns=self.columns)
+        if categorical:
+            for column in self.interned:
+                frame[column] = frame[column].astype('category')
+        return frame
+
+    def to_arrow(self):
+        """Build a pyarrow Table with the interned columns dictionary-encoded."""
+        import pyarrow as pa
+
+        arrays = []
+        for column in self.columns:
+            array = pa.array(self.data[column], from_pandas=True)
+            if column in self.interned and pa.types.is_string(array.type):
+                array = array.dictionary_encode()
+            arrays.append(array)
+        return pa.Table.from_arrays(arrays, names=self.columns)
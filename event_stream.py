@@ -0,0 +1,158 @@
+import queue
+import time
+import logging
+import unicodedata
+from statistics import median
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple
+import pandas as pd
+from rapidfuzz import fuzz
+
+# Sport labels of both bookmakers, mapped onto the detector that handles them
+SPORTS = {'Voetbal': 'football', 'FOOTBALL': 'football', 'Tennis': 'tennis', 'TENNIS': 'tennis'}
+# Column holding the fixture name in each bookmaker's scrape
+EVENT_NAME_COLUMNS = {'toto': 'Event Name', 'kambi': 'event_name'}
+# Deliberately looser than the detectors' own fuzzy matching, which stays authoritative
+FIXTURE_MATCH_THRESHOLD = 60
+
+
+class EventBatch(NamedTuple):
+    source: str
+    frame: pd.DataFrame
+    published: float
+
+
+class EventStream:
+    """
+    Bounded queue carrying the rows of single events from the scrapers to the detector.
+
+    Publishing blocks while the queue is full, so a detector that falls behind
+    slows the scrapers down instead of letting batches pile up in memory.
+    """
+
+    def __init__(self, sources: Iterable[str], maxsize: int = 256):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.open_sources = set(sources)
+
+    def publisher(self, source: str) -> Callable[[pd.DataFrame], None]:
+        """Return the on_event callback through which a scraper publishes its events."""
+        def publish(frame: pd.DataFrame):
+            self.queue.put(EventBatch(source, frame, time.monotonic()))
+        return publish
+
+    def close(self, source: str):
+        """Mark a source as finished; iteration ends once all sources are closed."""
+        self.queue.put(EventBatch(source, None, time.monotonic()))
+
+    def __iter__(self) -> Iterator[EventBatch]:
+        while self.open_sources:
+            batch = self.queue.get()
+            if batch.frame is None:
+                self.open_sources.discard(batch.source)
+                continue
+            yield batch
+
+    def drain(self):
+        """Discard batches until all sources are closed, so publishers blocked on a full queue can finish."""
+        for _ in self:
+            pass
+
+
+def normalize_fixture_name(name: str) -> str:
+    """Lower-case a fixture name and strip accents, dashes and the ' vs ' separator."""
+    name = unicodedata.normalize('NFKD', str(name).replace('-', ' ').replace(' vs ', ' '))
+    return ''.join(char for char in name if not unicodedata.combining(char)).lower()
+
+
+class FixtureJoiner:
+    """
+    Pair Toto and Kambi event batches of the same fixture and detect on them as soon as both are in.
+
+    Batches are bucketed by sport and start_time, which the detectors require
+    to be equal anyway, and paired within a bucket by fuzzy name similarity.
+    Every Toto/Kambi pair is evaluated exactly once, when its second side
+    arrives, so time-to-alert is per fixture instead of per scrape cycle.
+    """
+
+    def __init__(self, detectors: Dict[str, Callable[[pd.DataFrame, pd.DataFrame], Any]], started: float = None):
+        """
+        Args:
+            detectors (dict): Sport ('football', 'tennis') -> callable(toto_df, kambi_df)
+                returning the detector output for one fixture
+            started (float): time.monotonic() at which scraping started, for latencies
+        """
+        self.detectors = detectors
+        self.started = started if started is not None else time.monotonic()
+        # (sport, start_time) -> source -> [(normalized name, EventBatch)]
+        self.buckets: Dict[tuple, Dict[str, List[tuple]]] = {}
+        self.results: Dict[str, List[Any]] = {sport: [] for sport in detectors}
+        self.latencies: List[float] = []
+        # id() of every batch that was evaluated against at least one counterpart
+        self.paired = set()
+        self.first_arbitrage = None
+        self.stats = {'batches': 0, 'skipped': 0, 'evaluations': 0, 'errors': 0, 'arbitrage': 0, 'max_queue_wait': 0.0}
+
+    def add(self, batch: EventBatch):
+        """Store one event batch and evaluate it against every matching counterpart already received."""
+        self.stats['batches'] += 1
+        # Time the batch spent queued behind earlier detections
+        self.stats['max_queue_wait'] = max(self.stats['max_queue_wait'], round(time.monotonic() - batch.published, 2))
+        frame = batch.frame
+        sport = SPORTS.get(frame['sport'].iloc[0])
+        if sport not in self.detectors:
+            self.stats['skipped'] += 1
+            return
+
+        name = normalize_fixture_name(frame[EVENT_NAME_COLUMNS[batch.source]].iloc[0])
+        sides = self.buckets.setdefault((sport, frame['start_time'].iloc[0]), {'toto': [], 'kambi': []})
+        sides[batch.source].append((name, batch))
+
+        other_source = 'kambi' if batch.source == 'toto' else 'toto'
+        for other_name, other in sides[other_source]:
+            if fuzz.token_set_ratio(name, other_name) < FIXTURE_MATCH_THRESHOLD:
+                continue
+            toto, kambi = (batch, other) if batch.source == 'toto' else (other, batch)
+            self.paired.update((id(batch), id(other)))
+            self.evaluate(sport, toto, kambi)
+
+    def evaluate(self, sport: str, toto: EventBatch, kambi: EventBatch):
+        """Run the sport's detector on one Toto/Kambi fixture pair and record the latency."""
+        self.stats['evaluations'] += 1
+        try:
+            result = self.detectors[sport](toto.frame, kambi.frame)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logging.error(f"Stream: {sport} detection failed for {toto.frame['Event Name'].iloc[0]}: {e}")
+            return
+        latency = time.monotonic() - self.started
+        self.latencies.append(latency)
+        self.results[sport].append(result)
+
+        # Detectors that flag opportunities explicitly, rather than notifying themselves
+        if isinstance(result, pd.DataFrame) and 'Is Arbitrage' in result and result['Is Arbitrage'].any():
+            self.stats['arbitrage'] += 1
+            if self.first_arbitrage is None:
+                self.first_arbitrage = latency
+            logging.info(
+                f"Stream: {sport} arbitrage opportunity in {toto.frame['Event Name'].iloc[0]} "
+                f"after {latency:.2f}s"
+            )
+
+    def get_stats(self) -> dict:
+        """
+        Report evaluation counts and per-fixture time-to-detection.
+
+        Returns:
+            dict: Counters plus first/median/last seconds from start to a fixture's
+                evaluation, and the number of events whose counterpart never arrived
+        """
+        stored = sum(len(events) for sides in self.buckets.values() for events in sides.values())
+        stats = dict(self.stats, unmatched_events=stored - len(self.paired))
+        if self.latencies:
+            stats.update(
+                first_detection=round(self.latencies[0], 2),
+                median_detection=round(median(self.latencies), 2),
+                last_detection=round(self.latencies[-1], 2)
+            )
+        if self.first_arbitrage is not None:
+            stats['first_arbitrage'] = round(self.first_arbitrage, 2)
+        return stats
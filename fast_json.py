@@ -0,0 +1,201 @@
+import json
+import logging
+from typing import Any, Dict, List, TypedDict
+
+import requests
+
+try:
+    import msgspec
+except ImportError:  # Optional: typed decoding that skips undeclared fields
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # Optional: fast untyped decoding
+    orjson = None
+
+# Declared schemas of the fields the scrapers keep. With msgspec the decoder
+# only materialises these keys and skips everything else (price history,
+# commentary, media, ...) while parsing. Scalars are typed Any so an
+# unexpected value type never rejects a payload, and total=False keeps
+# missing keys missing, so the existing .get()/[] access stays unchanged.
+
+
+# Toto events-by-ids with marketIds: market data
+class TotoPrice(TypedDict, total=False):
+    decimal: Any
+    numerator: Any
+    denominator: Any
+
+
+class TotoOutcome(TypedDict, total=False):
+    name: Any
+    type: Any
+    subType: Any
+    prices: List[TotoPrice]
+
+
+class TotoMarket(TypedDict, total=False):
+    name: Any
+    outcomes: List[TotoOutcome]
+
+
+class TotoMarketEvent(TypedDict, total=False):
+    id: Any
+    name: Any
+    markets: List[TotoMarket]
+
+
+class TotoMarketEvents(TypedDict, total=False):
+    events: List[TotoMarketEvent]
+
+
+class TotoMarketDataResponse(TypedDict, total=False):
+    data: TotoMarketEvents
+
+
+# Toto events-by-ids with eventIds: market id collections
+class TotoCollection(TypedDict, total=False):
+    name: Any
+    marketIds: List[Any]
+
+
+class TotoCollectionEvent(TypedDict, total=False):
+    id: Any
+    collections: List[TotoCollection]
+
+
+class TotoCollectionEvents(TypedDict, total=False):
+    events: List[TotoCollectionEvent]
+
+
+class TotoCollectionsResponse(TypedDict, total=False):
+    data: TotoCollectionEvents
+
+
+# Toto event-list: match discovery
+class TotoNamed(TypedDict, total=False):
+    name: Any
+
+
+class TotoTeam(TypedDict, total=False):
+    name: Any
+    side: Any
+
+
+class TotoListPrice(TypedDict, total=False):
+    decimal: Any
+
+
+class TotoListOutcome(TypedDict, total=False):
+    subType: Any
+    prices: List[TotoListPrice]
+
+
+class TotoListMarket(TypedDict, total=False):
+    outcomes: List[TotoListOutcome]
+
+
+# 'class' is a Python keyword, hence the functional TypedDict syntax
+TotoListEvent = TypedDict('TotoListEvent', {
+    'id': Any,
+    'name': Any,
+    'startTime': Any,
+    'teams': List[TotoTeam],
+    'type': TotoNamed,
+    'class': TotoNamed,
+    'category': TotoNamed,
+    'markets': List[TotoListMarket],
+}, total=False)
+
+
+class TotoListEvents(TypedDict, total=False):
+    events: List[TotoListEvent]
+
+
+class TotoEventListResponse(TypedDict, total=False):
+    data: TotoListEvents
+
+
+# Kambi betoffer/event
+class KambiCriterion(TypedDict, total=False):
+    id: Any
+    label: Any
+    englishLabel: Any
+    occurrenceType: Any
+    lifetime: Any
+
+
+class KambiBetOfferType(TypedDict, total=False):
+    id: Any
+    name: Any
+    englishName: Any
+
+
+class KambiOutcome(TypedDict, total=False):
+    id: Any
+    label: Any
+    englishLabel: Any
+    odds: Any
+    line: Any
+    participant: Any
+    type: Any
+    changedDate: Any
+    oddsFractional: Any
+    oddsAmerican: Any
+    status: Any
+    cashOutStatus: Any
+    homeScore: Any
+    awayScore: Any
+
+
+class KambiBetOffer(TypedDict, total=False):
+    id: Any
+    eventId: Any
+    criterion: KambiCriterion
+    betOfferType: KambiBetOfferType
+    outcomes: List[KambiOutcome]
+
+
+class KambiBetOfferResponse(TypedDict, total=False):
+    betOffers: List[KambiBetOffer]
+
+
+_decoders: Dict[type, Any] = {}
+
+
+def _get_decoder(schema: type):
+    decoder = _decoders.get(schema)
+    if decoder is None:
+        decoder = msgspec.json.Decoder(schema)
+        _decoders[schema] = decoder
+    return decoder
+
+
+def decode_json(content: bytes, schema: type = None) -> Any:
+    """
+    Decode a JSON payload, keeping only the fields declared in schema when msgspec is installed.
+
+    Falls back to orjson, then to the standard json module, when the fast
+    libraries are missing or the payload does not fit the schema.
+
+    Args:
+        content (bytes): Raw JSON payload
+        schema (type): One of the response TypedDicts above, or None for a full decode
+
+    Returns:
+        Any: Decoded payload as plain dicts and lists
+    """
+    if schema is not None and msgspec is not None:
+        try:
+            return _get_decoder(schema).decode(content)
+        except msgspec.ValidationError as e:
+            logging.debug(f"Schema {schema.__name__} did not match payload, decoding fully: {e}")
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def decode_response(response: requests.Response, schema: type = None) -> Any:
+    """Decode the body of a response, see decode_json."""
+    return decode_json(response.content, schema)
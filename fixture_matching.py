@@ -0,0 +1,255 @@
+import unicodedata
+from typing import Iterable, List
+import numpy as np
+import pandas as pd
+from rapidfuzz import process, fuzz
+from fuzzywuzzy import utils
+from kickoff_index import KickoffIndex
+from alias_registry import AliasRegistry
+
+# Minimum token_set_ratio of both teams for two fixtures to match
+TEAM_MATCH_THRESHOLD = 80
+# Minimum token_set_ratio of two full fixture names to match
+EVENT_MATCH_THRESHOLD = 90
+# Kickoff and further columns that must be equal for two fixtures to be compared at all
+BLOCK_COLUMNS = ['start_time', 'sex']
+
+
+def process_name(name: str) -> str:
+    """Preprocess a name exactly like fuzzywuzzy's scorers do, so rapidfuzz gives the same scores."""
+    return utils.full_process(name, force_ascii=True)
+
+
+def similarity_matrix(queries: List[str], choices: List[str]) -> np.ndarray:
+    """
+    Score every query against every choice in one batch.
+
+    Args:
+        queries (list): Names to match, None scores 0 against everything
+        choices (list): Names to match against, None scores 0 against everything
+
+    Returns:
+        np.ndarray: len(queries) x len(choices) token_set_ratio scores, rounded
+            to integers like fuzzywuzzy's fuzz.token_set_ratio
+    """
+    scores = np.zeros((len(queries), len(choices)))
+    valid_queries = [i for i, name in enumerate(queries) if name]
+    valid_choices = [j for j, name in enumerate(choices) if name]
+    if valid_queries and valid_choices:
+        scores[np.ix_(valid_queries, valid_choices)] = process.cdist(
+            [process_name(queries[i]) for i in valid_queries],
+            [process_name(choices[j]) for j in valid_choices],
+            scorer=fuzz.token_set_ratio,
+            workers=-1
+        )
+    return np.round(scores)
+
+
+def split_teams(event_names: Iterable[str]) -> pd.DataFrame:
+    """Split 'Team1 vs Team2' fixture names; names without exactly one ' vs ' get None teams."""
+    teams = [name.split(' vs ') for name in event_names]
+    return pd.DataFrame(
+        [(parts[0].strip(), parts[1].strip()) if len(parts) == 2 else (None, None) for parts in teams],
+        columns=['Team1', 'Team2']
+    )
+
+
+def team_scores(toto_names: List[str], kambi_names: List[str], registry: AliasRegistry = None) -> np.ndarray:
+    """
+    similarity_matrix of team names, resolving names the alias registry knows without fuzzy scoring.
+
+    A Toto name whose registered Kambi spelling is among kambi_names scores 100
+    against it and 0 against the others; only the remaining names are scored.
+    """
+    if registry is None:
+        return similarity_matrix(toto_names, kambi_names)
+    columns = {name: j for j, name in reversed(list(enumerate(kambi_names)))}
+    resolved = {}
+    for i, name in enumerate(toto_names):
+        alias = registry.resolve('team', name, kambi_names) if name else None
+        if alias is not None:
+            resolved[i] = columns[alias]
+    unresolved = [i for i in range(len(toto_names)) if i not in resolved]
+    scores = np.zeros((len(toto_names), len(kambi_names)))
+    scores[unresolved] = similarity_matrix([toto_names[i] for i in unresolved], kambi_names)
+    for i, j in resolved.items():
+        scores[i, j] = 100
+    return scores
+
+
+def match_block(toto_events: List[str], kambi_events: List[str], threshold: int,
+                registry: AliasRegistry = None) -> pd.DataFrame:
+    """
+    Match the fixtures of one block on the similarity of both teams.
+
+    Each Toto fixture gets the first Kambi fixture, in the given order, whose
+    Team1 and Team2 both score at least threshold. Its score is the mean of the
+    best Team1 and the best Team2 score among all Kambi fixtures that passed,
+    as the row-wise matcher this replaces computed it. Team pairs of confident
+    matches are learned by the registry.
+    """
+    toto_teams = split_teams(toto_events)
+    kambi_teams = split_teams(kambi_events)
+    # Score unique team names only, then spread the scores over the fixtures
+    scores = []
+    for column in ['Team1', 'Team2']:
+        toto_codes, toto_names = pd.factorize(toto_teams[column], use_na_sentinel=False)
+        kambi_codes, kambi_names = pd.factorize(kambi_teams[column], use_na_sentinel=False)
+        matrix = team_scores(list(toto_names), list(kambi_names), registry)
+        scores.append(matrix[np.ix_(toto_codes, kambi_codes)])
+    team1_scores, team2_scores = scores
+
+    passed = (team1_scores >= threshold) & (team2_scores >= threshold)
+    # Fixtures that do not split into two teams never match
+    passed[toto_teams['Team1'].isna().to_numpy()] = False
+    matched = passed.any(axis=1)
+    first = passed.argmax(axis=1)
+    best_team1 = np.where(passed, team1_scores, -np.inf).max(axis=1)
+    best_team2 = np.where(passed, team2_scores, -np.inf).max(axis=1)
+
+    if registry is not None:
+        for i in np.flatnonzero(matched):
+            j = first[i]
+            for column, column_scores in [('Team1', team1_scores), ('Team2', team2_scores)]:
+                registry.learn('team', {'toto': toto_teams[column].iloc[i], 'kambi': kambi_teams[column].iloc[j]},
+                               column_scores[i, j])
+
+    return pd.DataFrame({
+        'matched_event': np.where(matched, np.asarray(kambi_events, dtype=object)[first], None),
+        'fuzzy_score': np.where(matched, (best_team1 + best_team2) / 2, np.nan),
+    })
+
+
+def match_fixtures(toto_df: pd.DataFrame, kambi_df: pd.DataFrame, toto_column: str = 'Event Name',
+                   kambi_column: str = 'event_name', threshold: int = TEAM_MATCH_THRESHOLD,
+                   registry: AliasRegistry = None) -> pd.DataFrame:
+    """
+    Match Toto fixtures to Kambi fixtures of the same kickoff and sex by team name similarity.
+
+    Candidates come from a KickoffIndex on BLOCK_COLUMNS, which the detectors
+    merge on afterwards anyway. Within a block the Team1 and Team2 similarities
+    of all unique names are computed as two score matrices instead of one fuzzy
+    scan over the Kambi frame per Toto row. Team names the alias registry
+    already knows are resolved by lookup instead of scored.
+
+    Args:
+        toto_df (pd.DataFrame): Toto rows, with toto_column and BLOCK_COLUMNS
+        kambi_df (pd.DataFrame): Kambi rows, with kambi_column and BLOCK_COLUMNS
+        toto_column (str): Toto fixture name column, 'Team1 vs Team2'
+        kambi_column (str): Kambi fixture name column, 'Team1 vs Team2'
+        threshold (int): Minimum score of both teams
+        registry (AliasRegistry): Known team aliases, used and extended; None matches by score only
+
+    Returns:
+        pd.DataFrame: One row per unique Toto fixture and block, with toto_column,
+            BLOCK_COLUMNS, 'matched_event' (None when unmatched) and 'fuzzy_score'
+    """
+    toto_fixtures = toto_df[[toto_column] + BLOCK_COLUMNS].drop_duplicates()
+    kambi_fixtures = kambi_df[[kambi_column] + BLOCK_COLUMNS].drop_duplicates()
+    kickoff_index = KickoffIndex(kambi_fixtures, by=BLOCK_COLUMNS[1:])
+
+    matches = []
+    for group, candidates in kickoff_index.blocks(toto_fixtures):
+        toto_events = group[toto_column].tolist()
+        kambi_events = candidates[kambi_column].tolist()
+        if kambi_events:
+            block_matches = match_block(toto_events, kambi_events, threshold, registry)
+        else:
+            block_matches = pd.DataFrame({'matched_event': [None] * len(toto_events), 'fuzzy_score': np.nan})
+        block_matches.index = group.index
+        matches.append(pd.concat([group, block_matches], axis=1))
+
+    if not matches:
+        return pd.DataFrame(columns=[toto_column] + BLOCK_COLUMNS + ['matched_event', 'fuzzy_score'])
+    return pd.concat(matches).sort_index().reset_index(drop=True)
+
+
+def normalize_event_name(text: str) -> str:
+    """Replace '-' with spaces and strip accents, as the detectors do before matching."""
+    return ''.join(
+        char for char in unicodedata.normalize('NFKD', text.replace('-', ' '))
+        if not unicodedata.combining(char)
+    )
+
+
+def resolve_fixtures(toto_df: pd.DataFrame, kambi_df: pd.DataFrame, toto_column: str = 'Event Name',
+                     kambi_column: str = 'event_name', threshold: int = EVENT_MATCH_THRESHOLD) -> pd.DataFrame:
+    """
+    Score every unique Toto fixture name once against the Kambi fixtures at the same kickoff.
+
+    Names are normalised with normalize_event_name and compared with rapidfuzz's
+    token_set_ratio, one score matrix per kickoff block from a KickoffIndex.
+    The result lists every candidate scoring at least threshold, so all market
+    builders of a sport share one scoring pass instead of each fuzzy matching
+    every one of its rows; select_fixture_matches then picks the best
+    candidate among the Kambi fixtures that offer a builder's market.
+
+    Args:
+        toto_df (pd.DataFrame): Toto rows, with toto_column and start_time
+        kambi_df (pd.DataFrame): Kambi rows, with kambi_column and start_time
+        toto_column (str): Toto fixture name column
+        kambi_column (str): Kambi fixture name column
+        threshold (int): Minimum score of a match
+
+    Returns:
+        pd.DataFrame: One row per normalised Toto fixture name and start_time and
+            candidate, with 'matched_event' the normalised Kambi name and its 'score'
+    """
+    columns = [toto_column, 'start_time', 'matched_event', 'score']
+    toto_fixtures = toto_df[[toto_column, 'start_time']].drop_duplicates()
+    toto_fixtures[toto_column] = toto_fixtures[toto_column].map(
+        {name: normalize_event_name(name) for name in toto_fixtures[toto_column].unique()}
+    )
+    toto_fixtures = toto_fixtures.drop_duplicates()
+    kambi_fixtures = kambi_df[[kambi_column, 'start_time']].drop_duplicates()
+    kambi_fixtures[kambi_column] = kambi_fixtures[kambi_column].map(
+        {name: normalize_event_name(name) for name in kambi_fixtures[kambi_column].unique()}
+    )
+    kickoff_index = KickoffIndex(kambi_fixtures.drop_duplicates())
+
+    matches = []
+    for group, candidates in kickoff_index.blocks(toto_fixtures):
+        kambi_events = candidates[kambi_column].drop_duplicates().tolist()
+        if not kambi_events:
+            continue
+        scores = process.cdist(group[toto_column].tolist(), kambi_events, scorer=fuzz.token_set_ratio,
+                               score_cutoff=threshold, workers=-1)
+        rows, candidate_columns = np.nonzero(scores >= threshold)
+        matches.append(pd.DataFrame({
+            toto_column: group[toto_column].to_numpy()[rows],
+            'start_time': group['start_time'].to_numpy()[rows],
+            'matched_event': np.asarray(kambi_events, dtype=object)[candidate_columns],
+            'score': scores[rows, candidate_columns],
+        }))
+    if not matches:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(matches, ignore_index=True)[columns]
+
+
+def select_fixture_matches(fixture_matches: pd.DataFrame, kambi_df: pd.DataFrame, toto_column: str = 'Event Name',
+                           kambi_column: str = 'event_name') -> pd.DataFrame:
+    """
+    Pick the Kambi fixture of every Toto fixture among those of one market.
+
+    Like process.extractOne over the market's Kambi fixtures at the same
+    kickoff, the best scoring candidate wins and ties go to the one listed
+    first in kambi_df. Only fixtures of kambi_df are candidates, so a fixture
+    without the market, e.g. a doubles match at the same time, never takes
+    the match from one that has it.
+
+    Args:
+        fixture_matches (pd.DataFrame): Candidates from resolve_fixtures
+        kambi_df (pd.DataFrame): Kambi rows of the market, with normalised kambi_column names
+
+    Returns:
+        pd.DataFrame: toto_column, 'start_time' and 'matched_event' of every Toto fixture with a match
+    """
+    kambi_fixtures = kambi_df[[kambi_column, 'start_time']].drop_duplicates()
+    kambi_fixtures = pd.DataFrame({
+        'matched_event': kambi_fixtures[kambi_column].to_numpy(),
+        'start_time': kambi_fixtures['start_time'].to_numpy(),
+        'position': np.arange(len(kambi_fixtures)),
+    })
+    ranked = fixture_matches.merge(kambi_fixtures, on=['matched_event', 'start_time'])
+    best = ranked.sort_values(['score', 'position'], ascending=[False, True], kind='stable')
+    return best.drop_duplicates([toto_column, 'start_time'])[[toto_column, 'start_time', 'matched_event']]
@@ -0,0 +1,193 @@
+import threading
+import logging
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from rate_limiter import get_rate_limiter
+from response_archive import ResponseArchive, get_response_archive
+
+# Responses that indicate the host is overloaded and the request may be retried
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class HttpTransport:
+    """
+    Shared HTTP session with per-host keep-alive connection pools.
+
+    urllib3 keeps one pool per host inside the adapter; pool_maxsize caps the
+    number of open connections per host and should match the number of worker
+    threads that use the transport, otherwise surplus connections are
+    discarded after every request and have to be re-established.
+
+    Requests are paced by a per-host AdaptiveRateLimiter unless rate_limited is
+    False; its concurrency ceiling is the pool size.
+
+    With a ResponseArchive every response is recorded, or, in replay mode,
+    every request is answered from the archive without touching the network.
+    """
+
+    def __init__(self, name: str = 'default', pool_maxsize: int = 10, pool_connections: int = 10, rate_limited: bool = True,
+                 archive: ResponseArchive = None):
+        self.name = name
+        self.rate_limited = rate_limited
+        self.archive = archive
+        self.pool_maxsize = pool_maxsize
+        self.pool_connections = pool_connections
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        # Counters of adapters that were replaced by ensure_pool_size()
+        self._retired_stats = {}
+        self._mount_adapter()
+
+    def _mount_adapter(self):
+        self.adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=True
+        )
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+    def ensure_pool_size(self, pool_maxsize: int):
+        """
+        Grow the per-host pool so that pool_maxsize threads can hold a connection at once.
+
+        Args:
+            pool_maxsize (int): Required number of connections per host
+        """
+        with self._lock:
+            if pool_maxsize <= self.pool_maxsize:
+                return
+            for host, stats in self._pool_stats().items():
+                retired = self._retired_stats.setdefault(host, {'requests': 0, 'handshakes': 0})
+                retired['requests'] += stats['requests']
+                retired['handshakes'] += stats['handshakes']
+            old_adapter = self.adapter
+            self.pool_maxsize = pool_maxsize
+            self._mount_adapter()
+            old_adapter.close()
+
+    def get(self, url: str, retries: int = 0, **kwargs) -> requests.Response:
+        """
+        Issue a GET request over the pooled session.
+
+        Args:
+            url (str): Request URL
+            retries (int): Extra attempts after a 429/5xx response, timeout or connection error.
+                Retries are paced by the host's rate limiter, which has backed off by then.
+            **kwargs: Passed on to requests.Session.get
+
+        Returns:
+            requests.Response: The last response received
+        """
+        if self.archive is not None and self.archive.replaying:
+            # At full speed: no rate limiting, no network
+            return self.archive.replay(url, kwargs.get('params'))
+
+        response = self._get(url, retries, **kwargs)
+        if self.archive is not None:
+            try:
+                self.archive.record(self.name, url, kwargs.get('params'), response)
+            except Exception as e:
+                logging.warning(f"{self.name}: could not archive the response of {url}: {e}")
+        return response
+
+    def _get(self, url: str, retries: int = 0, **kwargs) -> requests.Response:
+        if not self.rate_limited:
+            return self.session.get(url, **kwargs)
+
+        limiter = get_rate_limiter(host_of(url), max_limit=self.pool_maxsize)
+        for attempt in range(retries + 1):
+            limiter.acquire()
+            try:
+                response = self.session.get(url, **kwargs)
+            except requests.Timeout:
+                limiter.release(timed_out=True)
+                if attempt == retries:
+                    raise
+                continue
+            except requests.RequestException:
+                limiter.release(None)
+                if attempt == retries:
+                    raise
+                continue
+            limiter.release(response.status_code, retry_after=parse_retry_after(response))
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == retries:
+                return response
+
+    def _pool_stats(self) -> dict:
+        pools = self.adapter.poolmanager.pools
+        stats = {}
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            host_stats = stats.setdefault(host, {'requests': 0, 'handshakes': 0})
+            host_stats['requests'] += pool.num_requests
+            host_stats['handshakes'] += pool.num_connections
+        return stats
+
+    def get_stats(self) -> dict:
+        """
+        Report request, handshake and connection reuse counts per host.
+
+        Returns:
+            dict: host -> {'requests', 'handshakes', 'reused'}
+        """
+        with self._lock:
+            stats = {host: dict(counts) for host, counts in self._retired_stats.items()}
+            for host, counts in self._pool_stats().items():
+                host_stats = stats.setdefault(host, {'requests': 0, 'handshakes': 0})
+                host_stats['requests'] += counts['requests']
+                host_stats['handshakes'] += counts['handshakes']
+        for host_stats in stats.values():
+            host_stats['reused'] = max(host_stats['requests'] - host_stats['handshakes'], 0)
+        return stats
+
+    def log_stats(self, label: str = None):
+        """Log the connection reuse statistics of this transport."""
+        label = label or self.name
+        for host, stats in self.get_stats().items():
+            reuse_rate = stats['reused'] / stats['requests'] if stats['requests'] else 0
+            logging.info(
+                f"{label}: {host} - {stats['requests']} requests, {stats['handshakes']} handshakes, "
+                f"{stats['reused']} reused ({reuse_rate:.0%})"
+            )
+            if self.rate_limited:
+                logging.info(f"{label}: {host} - rate limiter {get_rate_limiter(host).get_stats()}")
+        if self.archive is not None:
+            logging.info(f"{label}: response archive {self.archive.get_stats()}")
+
+    def close(self):
+        self.session.close()
+
+
+def host_of(url: str) -> str:
+    """Return the scheme://host:port key used for per-host pools and limiters."""
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    return f"{parts.scheme}://{parts.hostname}:{port}"
+
+
+def parse_retry_after(response: requests.Response):
+    """Return the Retry-After delay in seconds, or None when absent or not numeric."""
+    value = response.headers.get('Retry-After')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+# Initialize the transports, one per scraper
+transports = {}
+_transports_lock = threading.Lock()
+
+def get_transport(name: str = 'default', pool_maxsize: int = 10) -> HttpTransport:
+    with _transports_lock:
+        transport = transports.get(name)
+        if transport is None:
+            transport = HttpTransport(name, pool_maxsize=pool_maxsize, archive=get_response_archive())
+            transports[name] = transport
+    transport.ensure_pool_size(pool_maxsize)
+    return transport
@@ -0,0 +1,127 @@
+from typing import Dict, Hashable, Iterable, Iterator, Tuple
+import numpy as np
+import pandas as pd
+from snapshot_format import to_utc
+
+# Kickoffs further apart than this are never candidates. The detectors merge on
+# equal start_time, so by default only fixtures at the same kickoff are.
+DEFAULT_KICKOFF_TOLERANCE = pd.Timedelta(0)
+# Width of a bucket when the tolerance is smaller
+MIN_BUCKET_WIDTH = pd.Timedelta(minutes=1)
+
+
+def parse_kickoff(value) -> pd.Timestamp:
+    """Parse one start time to a UTC Timestamp, NaT when it does not parse."""
+    try:
+        return to_utc(value) if pd.notna(value) else pd.NaT
+    except (ValueError, TypeError):
+        return pd.NaT
+
+
+def normalize_kickoff(values: pd.Series) -> pd.Series:
+    """
+    Parse start times of either bookmaker to UTC Timestamps, NaT where they do not parse.
+
+    Each distinct value is parsed once, so mixed ISO formats and offsets are
+    fine and a frame with thousands of rows costs as many parses as kickoffs.
+    """
+    kickoffs = {value: parse_kickoff(value) for value in pd.unique(values)}
+    return pd.to_datetime(values.map(kickoffs), utc=True)
+
+
+class KickoffIndex:
+    """
+    Candidate generation for cross-book fixture joins.
+
+    Events of one bookmaker are bucketed by normalised kickoff, and optionally
+    by further columns such as 'sex' or 'sport', so that a fuzzy matcher only
+    compares an event against the handful of fixtures starting at (nearly) the
+    same time instead of against the whole book. Candidates keep the row order
+    of the indexed frame, so 'first match' semantics of a full scan carry over.
+    """
+
+    def __init__(self, df: pd.DataFrame, by: Iterable[str] = (), tolerance: pd.Timedelta = None,
+                 time_column: str = 'start_time'):
+        """
+        Args:
+            df (pd.DataFrame): Events to index, e.g. one row per Kambi fixture or outcome
+            by (Iterable[str]): Further columns that must be equal, e.g. ['sex']
+            tolerance (pd.Timedelta): Largest kickoff difference of a candidate, DEFAULT_KICKOFF_TOLERANCE by default
+            time_column (str): Kickoff column of df
+        """
+        self.df = df
+        self.by = list(by)
+        self.time_column = time_column
+        self.tolerance = pd.Timedelta(tolerance) if tolerance is not None else DEFAULT_KICKOFF_TOLERANCE
+        self.width = max(self.tolerance, MIN_BUCKET_WIDTH)
+        # Naive UTC datetime64, NaT where the start time does not parse
+        self.kickoffs = normalize_kickoff(df[time_column]).dt.tz_convert(None).to_numpy()
+
+        # (bucket, *by values) -> positions in df, ascending; NaT kickoffs share bucket None
+        self.buckets: Dict[tuple, np.ndarray] = {}
+        keys = pd.DataFrame({'bucket': self.bucket_numbers(self.kickoffs)}, index=df.index)
+        for column in self.by:
+            keys[column] = df[column].to_numpy()
+        for key, positions in keys.reset_index(drop=True).groupby(
+            ['bucket'] + self.by, sort=False, dropna=False
+        ).indices.items():
+            key = key if isinstance(key, tuple) else (key,)
+            self.buckets[(None if pd.isna(key[0]) else int(key[0]),) + key[1:]] = positions
+        self._candidates: Dict[tuple, np.ndarray] = {}
+
+    def bucket_numbers(self, kickoffs: np.ndarray) -> np.ndarray:
+        """Bucket of each kickoff, NaN for NaT."""
+        kickoffs = kickoffs.astype('datetime64[ns]')
+        nanoseconds = kickoffs.astype(np.int64).astype(float)
+        nanoseconds[np.isnat(kickoffs)] = np.nan
+        return np.floor(nanoseconds / self.width.value)
+
+    def positions(self, start_time, **keys: Hashable) -> np.ndarray:
+        """
+        Positions in the indexed frame of the candidates for one kickoff.
+
+        Args:
+            start_time: Kickoff, as a string, datetime or Timestamp
+            **keys: Value of each 'by' column
+
+        Returns:
+            np.ndarray: Ascending row positions of the events within the tolerance
+        """
+        by_values = tuple(keys[column] for column in self.by)
+        cache_key = (start_time,) + by_values
+        if cache_key in self._candidates:
+            return self._candidates[cache_key]
+
+        kickoff = parse_kickoff(start_time)
+        if pd.isna(kickoff):
+            candidates = self.buckets.get((None,) + by_values, np.empty(0, dtype=np.intp))
+        else:
+            # The window spans at most the neighbouring buckets
+            bucket = int(self.bucket_numbers(np.array([kickoff.to_datetime64()]))[0])
+            parts = [self.buckets.get((b,) + by_values) for b in (bucket - 1, bucket, bucket + 1)]
+            candidates = np.sort(np.concatenate([p for p in parts if p is not None] or [np.empty(0, dtype=np.intp)]))
+            distance = np.abs(self.kickoffs[candidates] - kickoff.to_datetime64())
+            candidates = candidates[distance <= self.tolerance.to_timedelta64()]
+        self._candidates[cache_key] = candidates
+        return candidates
+
+    def candidates(self, start_time, **keys: Hashable) -> pd.DataFrame:
+        """Rows of the indexed frame that are candidates for one kickoff, in their original order."""
+        return self.df.iloc[self.positions(start_time, **keys)]
+
+    def blocks(self, queries: pd.DataFrame, time_column: str = None) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Group the events of the other bookmaker by kickoff and 'by' columns, with the candidates of each group.
+
+        Args:
+            queries (pd.DataFrame): Events to match, with the kickoff and 'by' columns
+            time_column (str): Kickoff column of queries, the indexed frame's by default
+
+        Yields:
+            tuple: (group of query rows, candidate rows of the indexed frame)
+        """
+        time_column = time_column or self.time_column
+        for _, group in queries.groupby([time_column] + self.by, sort=False, dropna=False):
+            first = group.iloc[0]
+            yield group, self.candidates(first[time_column], **{column: first[column] for column in self.by})
+
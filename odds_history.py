@@ -0,0 +1,373 @@
+import io
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from storage_backend import StorageBackend, ObjectNotFound, GenerationMismatch
+from snapshot_cache import SnapshotCache
+from snapshot_format import LABEL, PARQUET_COMPRESSION, PARQUET_CONTENT_TYPE, to_utc
+
+HISTORY_PREFIX = "odds_data/history"
+INDEX_UPDATE_ATTEMPTS = 5
+
+# Number of segments (one per scrape) after which they are merged into one file,
+# overridable with ODDS_HISTORY_COMPACT_SEGMENTS
+DEFAULT_COMPACT_SEGMENTS = 48
+# Rows per Parquet row group of compacted files, small enough for event and
+# outcome filters to skip most of a file through the row group statistics
+COMPACTED_ROW_GROUP_SIZE = 20000
+
+# One row per price change of one outcome
+HISTORY_SCHEMA = pa.schema([
+    ('key', pa.string()),
+    ('event_id', pa.int64()),
+    ('observed_at', pa.timestamp('ms', tz='UTC')),
+    ('odds', pa.float64()),
+    ('line', pa.float64()),
+    ('event_name', LABEL),
+    ('market', LABEL),
+    ('outcome', LABEL),
+    ('sport', LABEL),
+    ('start_time', LABEL),
+])
+HISTORY_COLUMNS = HISTORY_SCHEMA.names
+
+
+def toto_history_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Toto outcomes have no id of their own; they are keyed by event, market and outcome name."""
+    return pd.DataFrame({
+        'key': df['event_id'].astype(str) + '|' + df['Market Name'].astype(str) + '|' + df['Outcome Name'].astype(str),
+        'event_id': df['event_id'],
+        'odds': df['Odds (Decimal)'],
+        'line': float('nan'),
+        'event_name': df['Event Name'],
+        'market': df['Market Name'],
+        'outcome': df['Outcome Name'],
+        'sport': df.get('sport'),
+        'start_time': df.get('start_time'),
+    })
+
+
+def kambi_history_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Kambi outcomes are keyed by outcome_id; odds and lines are converted from thousandths."""
+    return pd.DataFrame({
+        'key': df['outcome_id'].astype('int64').astype(str),
+        'event_id': df['event_id'],
+        'odds': pd.to_numeric(df['odds'], errors='coerce') / 1000,
+        'line': pd.to_numeric(df['line'], errors='coerce') / 1000,
+        'event_name': df.get('event_name'),
+        'market': df['criterion_label'],
+        'outcome': df['outcome_label'],
+        'sport': df.get('sport'),
+        'start_time': df.get('start_time'),
+    })
+
+
+# Snapshot source -> (history source, row extractor, snapshot holds every live outcome)
+HISTORY_SOURCES = {
+    'toto': ('toto', toto_history_rows, True),
+    'unibet': ('unibet', kambi_history_rows, True),
+    'unibet_delta': ('unibet', kambi_history_rows, False),
+}
+
+
+def frame_to_parquet(df: pd.DataFrame, row_group_size: int = None) -> bytes:
+    table = pa.Table.from_pandas(df[HISTORY_COLUMNS], schema=HISTORY_SCHEMA, preserve_index=False)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression=PARQUET_COMPRESSION, row_group_size=row_group_size)
+    return buffer.getvalue()
+
+
+class OddsHistory:
+    """
+    Append-only store of odds changes per source, with compaction and an index by event and time.
+
+    Every scrape appends one small segment holding only the outcomes whose odds
+    or line moved since the previous scrape, plus a row with empty odds for
+    every outcome that disappeared. The last known row of every outcome is kept
+    in a state file to compute that difference. Once enough segments pile up
+    they are merged into one compacted file, sorted by event, outcome and time.
+
+    A JSON index per source lists every file with its event id and observation
+    time range, so a query only downloads the files that can hold matching rows
+    and then only decodes the matching row groups. Files are immutable, so
+    downloads go through the snapshot cache. One writer per source is assumed,
+    which is how the scrapers run.
+    """
+
+    def __init__(self, backend: StorageBackend, cache: Optional[SnapshotCache] = None, compact_segments: int = None):
+        """
+        Args:
+            backend (StorageBackend): Object store holding the history, the one of CloudStorageManager
+            cache (SnapshotCache): Local cache for downloaded history files
+            compact_segments (int): Segments per compaction, see DEFAULT_COMPACT_SEGMENTS
+        """
+        self.backend = backend
+        self.cache = cache
+        self.compact_segments = compact_segments or int(
+            os.getenv('ODDS_HISTORY_COMPACT_SEGMENTS', DEFAULT_COMPACT_SEGMENTS)
+        )
+        # Last downloaded state per source, as (generation, frame)
+        self.states = {}
+
+    def index_path(self, source: str) -> str:
+        return f"{HISTORY_PREFIX}/{source}/index.json"
+
+    def get_index(self, source: str) -> dict:
+        """
+        Read the index of a source.
+
+        Returns:
+            dict: 'files' (path, generation, kind, rows, event id and observation
+                time ranges of every history file) and 'state' (path and generation
+                of the last known row per outcome)
+        """
+        try:
+            return json.loads(self.backend.download(self.index_path(source)))
+        except ObjectNotFound:
+            return {'files': [], 'state': None}
+
+    def update_index(self, source: str, update: Callable[[dict], dict]):
+        """Apply update to the index of a source, retrying when another process changed it meanwhile."""
+        path = self.index_path(source)
+        for _ in range(INDEX_UPDATE_ATTEMPTS):
+            current = self.backend.stat(path)
+            try:
+                index = json.loads(self.backend.download(path)) if current is not None else {'files': [], 'state': None}
+                self.backend.upload(
+                    path, json.dumps(update(index)), 'application/json',
+                    if_generation_match=current.generation if current is not None else 0
+                )
+                return
+            except (ObjectNotFound, GenerationMismatch):
+                continue
+        raise RuntimeError(f"Odds history: gave up updating the {source} index after {INDEX_UPDATE_ATTEMPTS} attempts")
+
+    def read_file(self, path: str, generation, filters=None, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        content = self.cache.get(path, generation) if self.cache is not None else None
+        if content is None:
+            content = self.backend.download(path)
+            if self.cache is not None:
+                content = self.cache.put(path, generation, content) or content
+        source = content if isinstance(content, str) else pa.BufferReader(content)
+        table = pq.read_table(source, columns=list(columns) if columns is not None else None, filters=filters)
+        for index, field in enumerate(table.schema):
+            if pa.types.is_dictionary(field.type):
+                table = table.set_column(index, field.name, table.column(index).cast(field.type.value_type))
+        return table.to_pandas()
+
+    def write_file(self, path: str, df: pd.DataFrame, row_group_size: int = None) -> dict:
+        """Upload history rows and return their index entry."""
+        generation = self.backend.upload(path, frame_to_parquet(df, row_group_size), PARQUET_CONTENT_TYPE)
+        return {
+            'path': path,
+            'generation': generation,
+            'rows': len(df),
+            'min_event_id': int(df['event_id'].min()) if len(df) else None,
+            'max_event_id': int(df['event_id'].max()) if len(df) else None,
+            'min_observed': df['observed_at'].min().isoformat() if len(df) else None,
+            'max_observed': df['observed_at'].max().isoformat() if len(df) else None,
+        }
+
+    def get_state(self, source: str, index: dict) -> pd.DataFrame:
+        """Return the last known row of every live outcome."""
+        state = index.get('state')
+        if state is None:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        cached = self.states.get(source)
+        if cached is not None and cached[0] == state['generation']:
+            return cached[1]
+        df = self.read_file(state['path'], state['generation'])
+        self.states[source] = (state['generation'], df)
+        return df
+
+    def append(self, df: pd.DataFrame, source: str, observed_at: datetime = None) -> int:
+        """
+        Record the odds changes of one scrape.
+
+        Args:
+            df (pd.DataFrame): Scraper output, as uploaded by CloudStorageManager
+            source (str): Snapshot source ('toto', 'unibet' or 'unibet_delta'); deltas
+                only hold changed outcomes, so they never mark outcomes as removed
+            observed_at (datetime): UTC time of the scrape, now by default
+
+        Returns:
+            int: Number of history rows written
+        """
+        if source not in HISTORY_SOURCES:
+            return 0
+        history_source, extract, complete = HISTORY_SOURCES[source]
+        # Stored with millisecond precision
+        observed_at = to_utc(observed_at or datetime.utcnow()).floor('ms')
+
+        current = extract(df).drop_duplicates('key', keep='last') if not df.empty else pd.DataFrame(columns=HISTORY_COLUMNS)
+        current['observed_at'] = observed_at
+        index = self.get_index(history_source)
+        state = self.get_state(history_source, index)
+
+        # Hash join of the scrape with the last known row of every outcome
+        joined = current[['key', 'odds', 'line']].merge(
+            state[['key', 'odds', 'line']], on='key', how='outer', suffixes=('', '_last'), indicator=True
+        )
+        moved = joined['_merge'] == 'left_only'
+        for column in ('odds', 'line'):
+            before, after = joined[f'{column}_last'], joined[column]
+            moved |= (joined['_merge'] == 'both') & (before != after) & ~(before.isna() & after.isna())
+        changed = current[current['key'].isin(joined.loc[moved, 'key'])]
+        removed = state.iloc[0:0]
+        if complete:
+            removed = state[state['key'].isin(joined.loc[joined['_merge'] == 'right_only', 'key'])].copy()
+            removed[['odds', 'line']] = float('nan')
+            removed['observed_at'] = observed_at
+        segment = pd.concat([changed, removed], ignore_index=True)[HISTORY_COLUMNS]
+
+        if complete:
+            new_state = current
+        else:
+            new_state = pd.concat([state, changed], ignore_index=True).drop_duplicates('key', keep='last')
+        if segment.empty and index.get('state') is not None:
+            return 0
+
+        timestamp = observed_at.strftime("%Y%m%d_%H%M%S")
+        entry = self.write_file(f"{HISTORY_PREFIX}/{history_source}/segments/{timestamp}.parquet", segment) if not segment.empty else None
+        state_entry = self.write_file(f"{HISTORY_PREFIX}/{history_source}/state.parquet", new_state[HISTORY_COLUMNS])
+        self.states[history_source] = (state_entry['generation'], new_state[HISTORY_COLUMNS].reset_index(drop=True))
+
+        def add_segment(index):
+            if entry is not None:
+                index['files'].append(dict(entry, kind='segment'))
+            index['state'] = {'path': state_entry['path'], 'generation': state_entry['generation']}
+            return index
+        self.update_index(history_source, add_segment)
+        logging.info(f"Odds history {history_source}: {len(changed)} changed and {len(removed)} removed outcomes")
+
+        if sum(file['kind'] == 'segment' for file in index['files']) + 1 >= self.compact_segments:
+            self.compact(history_source)
+        return len(segment)
+
+    def compact(self, source: str) -> Optional[str]:
+        """
+        Merge all segments of a source into one file sorted by event, outcome and time.
+
+        Returns:
+            str: Path of the compacted file, None when there were no segments
+        """
+        segments = [file for file in self.get_index(source)['files'] if file['kind'] == 'segment']
+        if not segments:
+            return None
+        df = pd.concat([self.read_file(file['path'], file['generation']) for file in segments], ignore_index=True)
+        df = df.sort_values(['event_id', 'key', 'observed_at'], kind='stable')
+        first = pd.Timestamp(df['observed_at'].min()).strftime("%Y%m%d_%H%M%S")
+        last = pd.Timestamp(df['observed_at'].max()).strftime("%Y%m%d_%H%M%S")
+        entry = self.write_file(
+            f"{HISTORY_PREFIX}/{source}/compacted/{first}-{last}.parquet", df, COMPACTED_ROW_GROUP_SIZE
+        )
+        merged = {file['path'] for file in segments}
+
+        def replace_segments(index):
+            index['files'] = [file for file in index['files'] if file['path'] not in merged]
+            index['files'].append(dict(entry, kind='compacted'))
+            return index
+        self.update_index(source, replace_segments)
+
+        # Only delete once the index no longer points at the segments
+        for path in merged:
+            try:
+                self.backend.delete(path)
+            except ObjectNotFound:
+                pass
+        logging.info(f"Odds history {source}: compacted {len(segments)} segments into {entry['path']}")
+        return entry['path']
+
+    def query(
+        self,
+        source: str,
+        event_ids: Iterable[int] = None,
+        keys: Iterable[str] = None,
+        start=None,
+        end=None,
+        columns: Optional[Iterable[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Read history rows, downloading only the files whose index ranges can match.
+
+        Args:
+            source (str): History source ('toto' or 'unibet')
+            event_ids (Iterable[int]): Events to read, all by default
+            keys (Iterable[str]): Outcome keys to read, all by default
+            start (datetime | str): Keep changes observed at or after this UTC time
+            end (datetime | str): Keep changes observed before this UTC time
+            columns (Iterable[str]): Columns to return, all by default
+
+        Returns:
+            pd.DataFrame: Matching rows ordered by event, outcome and observation time
+        """
+        event_ids = sorted({int(event_id) for event_id in event_ids}) if event_ids is not None else None
+        keys = [str(key) for key in keys] if keys is not None else None
+        start, end = to_utc(start), to_utc(end)
+
+        filters = []
+        if event_ids is not None:
+            filters.append(('event_id', 'in', event_ids))
+        if keys is not None:
+            filters.append(('key', 'in', keys))
+        if start is not None:
+            filters.append(('observed_at', '>=', start))
+        if end is not None:
+            filters.append(('observed_at', '<', end))
+
+        def may_match(file):
+            if file['rows'] == 0:
+                return False
+            if event_ids is not None and (event_ids[-1] < file['min_event_id'] or event_ids[0] > file['max_event_id']):
+                return False
+            if start is not None and to_utc(file['max_observed']) < start:
+                return False
+            if end is not None and to_utc(file['min_observed']) >= end:
+                return False
+            return True
+
+        frames = [
+            self.read_file(file['path'], file['generation'], filters or None, columns)
+            for file in self.get_index(source)['files'] if may_match(file)
+        ]
+        if not frames:
+            return pd.DataFrame(columns=list(columns) if columns is not None else HISTORY_COLUMNS)
+        df = pd.concat(frames, ignore_index=True)
+        order = [column for column in ('event_id', 'key', 'observed_at') if column in df.columns]
+        return df.sort_values(order, kind='stable').reset_index(drop=True) if order else df
+
+    def price_path(self, source: str, key, event_id: int = None) -> pd.DataFrame:
+        """
+        Odds and line of one outcome over time; empty odds mark periods it was off the board.
+
+        Args:
+            source (str): History source ('toto' or 'unibet')
+            key: Kambi outcome_id, or 'event_id|Market Name|Outcome Name' for Toto
+            event_id (int): Event of the outcome, lets the index skip other events' files.
+                Toto keys start with it, so it is taken from the key when omitted.
+
+        Returns:
+            pd.DataFrame: observed_at, odds and line, oldest first
+        """
+        key = str(key)
+        if event_id is None and source == 'toto':
+            event_id = int(key.split('|', 1)[0])
+        df = self.query(
+            source, event_ids=[event_id] if event_id is not None else None, keys=[key],
+            columns=['key', 'event_id', 'observed_at', 'odds', 'line']
+        )
+        return df[['observed_at', 'odds', 'line']]
+
+    def event_history(self, source: str, event_id: int, start=None, end=None) -> pd.DataFrame:
+        """Every recorded odds change of one event, optionally within an observation window."""
+        return self.query(source, event_ids=[event_id], start=start, end=end)
+
+
+def history_enabled() -> bool:
+    """Odds history is recorded on every upload unless ODDS_HISTORY=0."""
+    return os.getenv('ODDS_HISTORY', '1').strip().lower() not in ('0', 'false', 'no', 'off')
@@ -0,0 +1,231 @@
+import io
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from cloud_storage import get_storage_manager
+from kickoff_index import normalize_kickoff
+from shared_snapshot import dataframe_to_table
+from snapshot_delta import DELTA_KEYS, key_hashes
+from snapshot_format import PARQUET_CONTENT_TYPE
+from storage_backend import ObjectNotFound
+
+PAIR_CACHE_PREFIX = "odds_data/pairs"
+# Column carrying the hash of a Toto outcome's key through the market builder
+PAIR_KEY = '_toto_key'
+# Kambi event_id of a merged pair, suffixed by the builder's merge with the Toto event_id
+KAMBI_EVENT_COLUMN = 'event_id_y'
+# Columns of a merged pair that change between scrapes and are taken from the fresh data
+TOTO_ODDS_COLUMNS = ['Odds (Decimal)', 'Price Numerator', 'Price Denominator']
+KAMBI_ODDS_COLUMNS = ['odds', 'odds_fractional', 'odds_american', 'changed_date', 'status', 'cash_out_status']
+# Weight of the latest cycle in the average build cost per Toto outcome, which is
+# measured on cycles where at least this share of the outcomes is built
+COST_SMOOTHING = 0.3
+FULL_BUILD_SHARE = 0.5
+ROW_COST_METADATA = b'pair_cache_row_cost'
+
+
+class PairCache:
+    """
+    Matched Toto/Kambi outcome pairs of one market builder, reused until their event starts.
+
+    A builder such as create_merged_football_overunder normalises, classifies
+    and fuzzy matches both books on every cycle, although a pairing of a Toto
+    outcome (keyed by event, market and outcome name) with a Kambi outcome_id
+    stays valid until kickoff. The cache keeps the merged rows of earlier
+    cycles; a new cycle hash-joins the fresh odds of both books onto them and
+    runs the builder only for the Toto outcomes without a known pair, against
+    the Kambi outcomes starting at the same times. Pairs
+    are dropped when their event starts, when the Kambi outcome disappears or
+    when its line changes, and those outcomes are matched again.
+    """
+
+    def __init__(self, name: str, backend=None, event_column: str = KAMBI_EVENT_COLUMN):
+        """
+        Args:
+            name (str): Builder whose pairs are cached, e.g. 'football_overunder'
+            backend (StorageBackend): Where the pairs persist between runs, None keeps them in memory only
+            event_column (str): Column of the merged rows holding the Kambi event_id
+        """
+        self.name = name
+        self.event_column = event_column
+        self.backend = backend
+        self.path = f"{PAIR_CACHE_PREFIX}/{name}.parquet"
+        self.pairs = pd.DataFrame()
+        self.dirty = False
+        # Average seconds a full build takes per Toto outcome, for the time saved
+        self.row_cost = None
+        self.stats = {
+            'cycles': 0, 'hits': 0, 'misses': 0, 'expired': 0, 'invalidated': 0,
+            'last_hit_rate': None, 'last_seconds': None, 'last_saved_seconds': None, 'saved_seconds': 0.0,
+        }
+
+    def load(self):
+        """Read the persisted pairs; missing ones leave the cache empty."""
+        if self.backend is None:
+            return
+        try:
+            content = self.backend.download(self.path)
+        except ObjectNotFound:
+            return
+        table = pq.read_table(io.BytesIO(content))
+        self.pairs = table.to_pandas()
+        row_cost = (table.schema.metadata or {}).get(ROW_COST_METADATA)
+        self.row_cost = float(row_cost) if row_cost else None
+        logging.info(f"Pair cache {self.name}: loaded {len(self.pairs)} pairs")
+
+    def save(self):
+        """Persist the pairs when they changed."""
+        if self.backend is None or not self.dirty:
+            return
+        table = dataframe_to_table(self.pairs)
+        if self.row_cost is not None:
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), ROW_COST_METADATA: str(self.row_cost)})
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer)
+        self.backend.upload(self.path, buffer.getvalue(), PARQUET_CONTENT_TYPE)
+        self.dirty = False
+
+    def drop_pairs(self, keep: np.ndarray, counter: str):
+        if not keep.all():
+            self.stats[counter] += int((~keep).sum())
+            self.pairs = self.pairs[keep].reset_index(drop=True)
+            self.dirty = True
+
+    def validate(self, toto_df: pd.DataFrame, kambi_df: pd.DataFrame, now: pd.Timestamp):
+        """
+        Drop pairs whose event has started, or whose Kambi outcome is gone or moved its line.
+
+        Only pairs of the Toto outcomes in toto_df or the Kambi events in kambi_df
+        are checked for their outcome, so a call for a single fixture, as the
+        streaming pipeline makes, keeps the pairs of all other fixtures. A Toto
+        outcome with any invalid pair loses all its pairs and is matched again.
+        """
+        if self.pairs.empty:
+            return
+        kickoffs = normalize_kickoff(self.pairs['start_time'])
+        self.drop_pairs((kickoffs > now).to_numpy(), 'expired')
+        if self.pairs.empty:
+            return
+        in_scope = self.pairs[PAIR_KEY].isin(toto_df[PAIR_KEY])
+        if self.event_column in self.pairs.columns and 'event_id' in kambi_df.columns:
+            in_scope |= self.pairs[self.event_column].isin(kambi_df['event_id'])
+        kambi = kambi_df.drop_duplicates('outcome_id').set_index('outcome_id')
+        fresh = kambi.reindex(self.pairs['outcome_id'])
+        valid = self.pairs['outcome_id'].isin(kambi.index).to_numpy()
+        if 'line' in self.pairs.columns and 'line' in kambi.columns:
+            cached_line, fresh_line = self.pairs['line'].to_numpy(dtype=float), fresh['line'].to_numpy(dtype=float)
+            valid &= (cached_line == fresh_line) | (np.isnan(cached_line) & np.isnan(fresh_line))
+        invalid_keys = self.pairs.loc[in_scope.to_numpy() & ~valid, PAIR_KEY]
+        self.drop_pairs(~self.pairs[PAIR_KEY].isin(invalid_keys).to_numpy(), 'invalidated')
+
+    def refresh(self, toto_df: pd.DataFrame, kambi_df: pd.DataFrame) -> pd.DataFrame:
+        """The cached pairs of the given Toto outcomes, with the current odds of both books."""
+        pairs = self.pairs[self.pairs[PAIR_KEY].isin(toto_df[PAIR_KEY])].copy()
+        toto = toto_df.drop_duplicates(PAIR_KEY).set_index(PAIR_KEY).reindex(pairs[PAIR_KEY])
+        kambi = kambi_df.drop_duplicates('outcome_id').set_index('outcome_id').reindex(pairs['outcome_id'])
+        for columns, fresh in [(TOTO_ODDS_COLUMNS, toto), (KAMBI_ODDS_COLUMNS, kambi)]:
+            for column in columns:
+                if column in pairs.columns and column in fresh.columns:
+                    pairs[column] = fresh[column].to_numpy()
+        return pairs
+
+    def merge(self, toto_df: pd.DataFrame, kambi_df: pd.DataFrame,
+              build: Callable[[pd.DataFrame], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Merge Toto and Kambi outcomes, running the builder only for Toto outcomes without a known pair.
+
+        Args:
+            toto_df (pd.DataFrame): Toto outcomes, with event_id, Market Name and Outcome Name
+            kambi_df (pd.DataFrame): Kambi outcomes, with outcome_id
+            build (callable): Builder taking subsets of toto_df and kambi_df and returning
+                their merged rows with the columns of both books; extra Toto columns must be
+                carried through. It gets the Toto outcomes without a known pair and the Kambi
+                outcomes at their kickoffs, as merged rows must have equal start times
+
+        Returns:
+            pd.DataFrame: The merged rows of the builder, cached ones first
+        """
+        started = time.perf_counter()
+        toto_df = toto_df.assign(**{PAIR_KEY: key_hashes(toto_df, DELTA_KEYS['toto'])})
+        self.validate(toto_df, kambi_df, pd.Timestamp.now(tz='UTC'))
+        known = toto_df[PAIR_KEY].isin(self.pairs[PAIR_KEY]).to_numpy() if not self.pairs.empty else np.zeros(len(toto_df), bool)
+        cached = self.refresh(toto_df[known], kambi_df) if known.any() else pd.DataFrame()
+
+        new_toto = toto_df[~known]
+        built = pd.DataFrame()
+        if len(new_toto):
+            build_started = time.perf_counter()
+            built = build(new_toto, kambi_df[kambi_df['start_time'].isin(new_toto['start_time'])])
+            # Small builds are dominated by fixed costs, only mostly full ones tell what a full build costs
+            if len(new_toto) >= FULL_BUILD_SHARE * len(toto_df):
+                cost = (time.perf_counter() - build_started) / len(new_toto)
+                self.row_cost = cost if self.row_cost is None else COST_SMOOTHING * cost + (1 - COST_SMOOTHING) * self.row_cost
+            if PAIR_KEY in built.columns and len(built):
+                self.pairs = pd.concat([self.pairs, built], ignore_index=True) if not self.pairs.empty else built.reset_index(drop=True)
+                self.dirty = True
+
+        frames = [frame for frame in (cached, built) if len(frame.columns)]
+        merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        self.record(int(known.sum()), len(new_toto), time.perf_counter() - started)
+        return merged.drop(columns=PAIR_KEY, errors='ignore')
+
+    def record(self, hits: int, misses: int, seconds: float):
+        # Against building every outcome, estimated from the average cost of full builds
+        saved = max((hits + misses) * self.row_cost - seconds, 0.0) if self.row_cost is not None else 0.0
+        self.stats['cycles'] += 1
+        self.stats['hits'] += hits
+        self.stats['misses'] += misses
+        self.stats['last_hit_rate'] = round(hits / (hits + misses), 3) if hits + misses else None
+        self.stats['last_seconds'] = round(seconds, 3)
+        self.stats['last_saved_seconds'] = round(saved, 3)
+        self.stats['saved_seconds'] = round(self.stats['saved_seconds'] + saved, 3)
+        logging.info(
+            f"Pair cache {self.name}: {hits} of {hits + misses} Toto outcomes from {len(self.pairs)} cached pairs, "
+            f"{seconds:.2f}s, about {saved:.2f}s saved"
+        )
+
+    def get_stats(self) -> dict:
+        """Return the hit and invalidation counters, the cycle time and the estimated time saved in seconds."""
+        return dict(self.stats, pairs=len(self.pairs))
+
+
+def pair_cache_enabled() -> bool:
+    """Matched pairs are reused across cycles unless PAIR_CACHE=0."""
+    return os.getenv('PAIR_CACHE', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+# Initialize the pair caches, one per market builder
+pair_caches: Dict[str, PairCache] = {}
+_caches_lock = threading.Lock()
+
+def get_pair_cache(name: str) -> Optional[PairCache]:
+    """Return the pair cache of a market builder, loaded from the snapshot storage backend; None when disabled."""
+    if not pair_cache_enabled():
+        return None
+    with _caches_lock:
+        if name not in pair_caches:
+            backend = None
+            try:
+                backend = get_storage_manager().backend
+            except Exception as e:
+                logging.warning(f"Pair cache {name}: storage unavailable, pairs are kept in memory only: {e}")
+            cache = pair_caches[name] = PairCache(name, backend)
+            try:
+                cache.load()
+            except Exception as e:
+                logging.warning(f"Pair cache {name}: could not load stored pairs: {e}")
+    return pair_caches[name]
+
+
+def save_pair_caches():
+    """Persist the pairs of every builder; failures are logged, they must not fail detection."""
+    for name, cache in list(pair_caches.items()):
+        try:
+            cache.save()
+        except Exception as e:
+            logging.error(f"Pair cache {name}: could not save pairs: {e}")
@@ -0,0 +1,159 @@
+import threading
+import time
+import logging
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Token bucket that only sleeps when the request budget is exhausted.
+
+    Tokens refill continuously at `rate` per second up to `capacity`; a request
+    that finds a token available proceeds immediately.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """
+        Take one token, sleeping only for as long as the bucket is in deficit.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Reserve the token up front so concurrent callers queue behind each other
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+class AdaptiveRateLimiter:
+    """
+    Per-host token bucket combined with AIMD concurrency control.
+
+    Healthy responses additively raise the concurrency limit (by roughly one slot
+    per window of `limit` requests) and the request rate. HTTP 429/5xx responses
+    and timeouts multiplicatively cut both, at most once per cooldown period, and
+    a Retry-After header pauses the host entirely.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        initial_rate: float = 50.0,
+        min_rate: float = 1.0,
+        max_rate: float = 500.0,
+        rate_step: float = 0.5,
+        backoff_factor: float = 0.5,
+        cooldown: float = 1.0
+    ):
+        self.host = host
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+        self.backoff_factor = backoff_factor
+        self.cooldown = cooldown
+        self.bucket = TokenBucket(initial_rate, capacity=max(initial_limit, 1))
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.last_backoff = 0.0
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'timeouts': 0, 'wait_seconds': 0.0}
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Block until a concurrency slot and a rate token are available."""
+        waited = 0.0
+        with self._condition:
+            start = time.monotonic()
+            while self.in_flight >= max(int(self.limit), self.min_limit):
+                self._condition.wait()
+            self.in_flight += 1
+            pause = self.blocked_until - time.monotonic()
+            waited += time.monotonic() - start
+        if pause > 0:
+            time.sleep(pause)
+            waited += pause
+        waited += self.bucket.acquire()
+        with self._condition:
+            self.stats['requests'] += 1
+            self.stats['wait_seconds'] += waited
+
+    def release(self, status_code: Optional[int] = None, timed_out: bool = False, retry_after: Optional[float] = None):
+        """
+        Return the concurrency slot and feed the outcome back into the controller.
+
+        Args:
+            status_code (int): HTTP status of the response, None when the request failed
+            timed_out (bool): Whether the request timed out
+            retry_after (float): Seconds from a Retry-After header, if any
+        """
+        congested = timed_out or status_code is None or status_code == 429 or status_code >= 500
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if congested:
+                if timed_out:
+                    self.stats['timeouts'] += 1
+                elif status_code == 429:
+                    self.stats['throttled'] += 1
+                else:
+                    self.stats['errors'] += 1
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, now + retry_after)
+                # Responses to requests sent before the last cut reflect the old limit
+                if now - self.last_backoff >= self.cooldown:
+                    self.last_backoff = now
+                    self.limit = max(self.min_limit, self.limit * self.backoff_factor)
+                    self.bucket.set_rate(max(self.min_rate, self.bucket.rate * self.backoff_factor))
+                    logging.info(
+                        f"Rate limiter {self.host}: backing off to {int(self.limit)} in flight, "
+                        f"{self.bucket.rate:.1f} req/s (status={status_code}, timeout={timed_out})"
+                    )
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self.bucket.set_rate(min(self.max_rate, self.bucket.rate + self.rate_step))
+            self._condition.notify_all()
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            return dict(self.stats, limit=int(self.limit), rate=round(self.bucket.rate, 1), in_flight=self.in_flight)
+
+
+# Initialize the limiters, one per host
+rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(host: str, **config) -> AdaptiveRateLimiter:
+    with _rate_limiters_lock:
+        limiter = rate_limiters.get(host)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(host, **config)
+            rate_limiters[host] = limiter
+        elif 'max_limit' in config:
+            limiter.max_limit = max(limiter.max_limit, config['max_limit'])
+        return limiter
@@ -0,0 +1,282 @@
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+import requests
+
+try:
+    import zstandard
+except ImportError:  # Optional, zlib with a preset dictionary is used instead
+    zstandard = None
+
+# Payloads per endpoint collected before its compression dictionary is trained
+DICTIONARY_SAMPLES = 100
+ZSTD_DICTIONARY_SIZE = 110 * 1024
+ZSTD_LEVEL = 6
+# zlib only looks back 32KB, a larger preset dictionary is never used
+ZLIB_DICTIONARY_SIZE = 32 * 1024
+ZLIB_LEVEL = 6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dictionaries (
+    id INTEGER PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    codec TEXT NOT NULL,
+    data BLOB NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS responses (
+    id INTEGER PRIMARY KEY,
+    transport TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    request TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    codec TEXT NOT NULL,
+    dictionary_id INTEGER,
+    size INTEGER NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_request ON responses (request, fetched_at);
+CREATE INDEX IF NOT EXISTS responses_endpoint ON responses (endpoint, fetched_at);
+"""
+
+# Numeric path segments such as event ids, folded so that one endpoint shares one dictionary
+NUMERIC_SEGMENT = re.compile(r"\d+(,\d+)*")
+
+
+def endpoint_of(url: str) -> str:
+    """Host and path of a URL with its ids replaced, e.g. 'host/offering/betoffer/event/{id}.json'."""
+    parts = requests.utils.urlparse(url)
+    return f"{parts.netloc}{NUMERIC_SEGMENT.sub('{id}', parts.path)}"
+
+
+def request_key(url: str, params: dict = None) -> str:
+    """The full request URL with its query parameters in a fixed order."""
+    prepared = requests.Request('GET', url, params=params).prepare()
+    parts = requests.utils.urlparse(prepared.url)
+    query = '&'.join(sorted(parts.query.split('&'))) if parts.query else ''
+    return f"{parts.scheme}://{parts.netloc}{parts.path}" + (f"?{query}" if query else '')
+
+
+class Codec:
+    """Compression with an optional preset dictionary, zstd when available and zlib otherwise."""
+
+    def __init__(self, name: str, dictionary: bytes = None):
+        self.name = name
+        self.dictionary = dictionary
+        if name == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("The archive was written with zstd, install zstandard to read it")
+            dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            self.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dict_data)
+            self.decompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+
+    @staticmethod
+    def train(name: str, samples: List[bytes]) -> bytes:
+        """Build a dictionary from sample payloads of one endpoint."""
+        if name == 'zstd':
+            return zstandard.train_dictionary(ZSTD_DICTIONARY_SIZE, samples).as_bytes()
+        # zlib has no training; the most recent samples are the best preset
+        return b''.join(samples)[-ZLIB_DICTIONARY_SIZE:]
+
+    def compress(self, data: bytes) -> bytes:
+        if self.name == 'zstd':
+            return self.compressor.compress(data)
+        compressor = zlib.compressobj(ZLIB_LEVEL, zdict=self.dictionary) if self.dictionary else zlib.compressobj(ZLIB_LEVEL)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.name == 'zstd':
+            return self.decompressor.decompress(data)
+        decompressor = zlib.decompressobj(zdict=self.dictionary) if self.dictionary else zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+class ResponseArchive:
+    """
+    Compressed archive of raw HTTP responses in a SQLite file, for replaying scrapes offline.
+
+    Every response is indexed by transport, endpoint (URL path with ids folded),
+    full request URL and fetch time. Payloads of one endpoint are highly
+    repetitive, so once DICTIONARY_SAMPLES of them are in, a compression
+    dictionary is trained on them and used for every later payload of that
+    endpoint. With zstandard installed that is a trained zstd dictionary,
+    otherwise a zlib preset dictionary.
+
+    In replay mode HttpTransport serves every request from here instead of the
+    network: the latest response to the same request URL fetched at or before
+    replay_at.
+    """
+
+    def __init__(self, path: str, replay: bool = False, replay_at: datetime = None, codec: str = None):
+        """
+        Args:
+            path (str): SQLite file, created when missing
+            replay (bool): Serve requests from the archive instead of recording them
+            replay_at (datetime): Replay the archive as it was at this time, the latest responses by default
+            codec (str): 'zstd' or 'zlib', zstd when zstandard is installed
+        """
+        self.path = path
+        self.replaying = replay
+        self.replay_at = replay_at.timestamp() if replay_at is not None else None
+        self.codec_name = codec or ('zstd' if zstandard is not None else 'zlib')
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        # Dictionary id -> Codec, and the current dictionary id per endpoint
+        self.codecs: Dict[Optional[int], Codec] = {}
+        self.endpoint_dictionaries: Dict[str, int] = {}
+        for dictionary_id, endpoint, codec_name in self.connection.execute(
+            "SELECT id, endpoint, codec FROM dictionaries ORDER BY id"
+        ):
+            if codec_name == self.codec_name:
+                self.endpoint_dictionaries[endpoint] = dictionary_id
+        self.samples: Dict[str, List[bytes]] = {}
+        self.stats = {'recorded': 0, 'skipped': 0, 'raw_bytes': 0, 'stored_bytes': 0, 'replayed': 0, 'misses': 0}
+
+    def codec(self, codec_name: str, dictionary_id: Optional[int]) -> Codec:
+        key = (codec_name, dictionary_id)
+        codec = self.codecs.get(key)
+        if codec is None:
+            dictionary = None
+            if dictionary_id is not None:
+                dictionary = self.connection.execute(
+                    "SELECT data FROM dictionaries WHERE id = ?", (dictionary_id,)
+                ).fetchone()[0]
+            codec = self.codecs[key] = Codec(codec_name, dictionary)
+        return codec
+
+    def record(self, transport: str, url: str, params: dict, response: requests.Response):
+        """
+        Store one response; trains the endpoint's dictionary once enough samples are in.
+
+        Only 200 responses are stored: a 304 of a conditional request or an error
+        carries no data a replay could serve.
+        """
+        if response.status_code != 200:
+            with self._lock:
+                self.stats['skipped'] += 1
+            return
+        endpoint = endpoint_of(url)
+        body = response.content or b''
+        headers = json.dumps({
+            name: value for name, value in response.headers.items()
+            if name.lower() in ('content-type', 'etag', 'last-modified', 'retry-after')
+        })
+        with self._lock:
+            dictionary_id = self.endpoint_dictionaries.get(endpoint)
+            if dictionary_id is None and body:
+                samples = self.samples.setdefault(endpoint, [])
+                samples.append(body)
+                if len(samples) >= DICTIONARY_SAMPLES:
+                    dictionary_id = self.train(endpoint, samples)
+                    del self.samples[endpoint]
+            compressed = self.codec(self.codec_name, dictionary_id).compress(body)
+            self.connection.execute(
+                "INSERT INTO responses (transport, endpoint, request, fetched_at, status, headers, codec, "
+                "dictionary_id, size, body) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (transport, endpoint, request_key(url, params), time.time(), response.status_code, headers,
+                 self.codec_name, dictionary_id, len(body), compressed)
+            )
+            self.connection.commit()
+            self.stats['recorded'] += 1
+            self.stats['raw_bytes'] += len(body)
+            self.stats['stored_bytes'] += len(compressed)
+
+    def train(self, endpoint: str, samples: List[bytes]) -> Optional[int]:
+        try:
+            dictionary = Codec.train(self.codec_name, samples)
+        except Exception as e:
+            logging.warning(f"Response archive: could not train a dictionary for {endpoint}: {e}")
+            return None
+        cursor = self.connection.execute(
+            "INSERT INTO dictionaries (endpoint, codec, data, created) VALUES (?, ?, ?, ?)",
+            (endpoint, self.codec_name, dictionary, time.time())
+        )
+        self.endpoint_dictionaries[endpoint] = cursor.lastrowid
+        logging.info(f"Response archive: trained a {len(dictionary)} byte {self.codec_name} dictionary for {endpoint}")
+        return cursor.lastrowid
+
+    def replay(self, url: str, params: dict = None) -> requests.Response:
+        """
+        Build the archived response to a request.
+
+        Returns:
+            requests.Response: The latest archived 200 response, or an empty 404 when there is none
+        """
+        key = request_key(url, params)
+        # Archives written before only 200 responses were recorded may hold 304s and errors
+        query = "SELECT status, headers, codec, dictionary_id, body FROM responses WHERE request = ? AND status = 200"
+        args = [key]
+        if self.replay_at is not None:
+            query += " AND fetched_at <= ?"
+            args.append(self.replay_at)
+        with self._lock:
+            row = self.connection.execute(query + " ORDER BY fetched_at DESC LIMIT 1", args).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+            else:
+                self.stats['replayed'] += 1
+                status, headers, codec_name, dictionary_id, body = row
+                body = self.codec(codec_name, dictionary_id).decompress(body)
+
+        response = requests.Response()
+        response.url = key
+        if row is None:
+            response.status_code = 404
+            response._content = b''
+            return response
+        response.status_code = status
+        response.headers.update(json.loads(headers))
+        response._content = body
+        response.encoding = 'utf-8'
+        return response
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        if stats['stored_bytes']:
+            stats['compression_ratio'] = round(stats['raw_bytes'] / stats['stored_bytes'], 1)
+        return stats
+
+    def close(self):
+        with self._lock:
+            self.connection.commit()
+            self.connection.close()
+
+
+# Initialize the archive
+response_archive = None
+_archive_lock = threading.Lock()
+
+def get_response_archive() -> Optional[ResponseArchive]:
+    """
+    Return the archive configured by RESPONSE_ARCHIVE_DIR, None when archiving is off.
+
+    RESPONSE_ARCHIVE_MODE is 'record' (default) or 'replay'; RESPONSE_REPLAY_AT
+    is an optional ISO timestamp to replay the archive as it was at that time.
+    """
+    global response_archive
+    directory = os.getenv('RESPONSE_ARCHIVE_DIR')
+    if not directory:
+        return None
+    with _archive_lock:
+        if response_archive is None:
+            replay_at = os.getenv('RESPONSE_REPLAY_AT')
+            response_archive = ResponseArchive(
+                os.path.join(directory, 'responses.sqlite'),
+                replay=os.getenv('RESPONSE_ARCHIVE_MODE', 'record').strip().lower() == 'replay',
+                replay_at=datetime.fromisoformat(replay_at) if replay_at else None
+            )
+    return response_archive
@@ -0,0 +1,146 @@
+import os
+import uuid
+import resource
+import tempfile
+import importlib
+import logging
+from typing import Iterable, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from event_stream import SPORTS
+
+# RAM-backed where available, overridable with SHARED_SNAPSHOT_DIR
+DEFAULT_SHARED_SNAPSHOT_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+# Detector per sport, as (module, function taking toto_df and kambi_df)
+DETECTORS = {
+    'football': ('ArbSignal_Football', 'main'),
+    'tennis': ('ArbSignal_Tennis', 'detect_tennis_arbitrage'),
+}
+
+
+def dataframe_to_table(df: pd.DataFrame) -> pa.Table:
+    """Convert a scraper DataFrame to Arrow, storing columns of mixed Python types as strings."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        columns = {}
+        for column in df.columns:
+            try:
+                columns[str(column)] = pa.array(df[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                columns[str(column)] = pa.array(df[column].astype(str).where(df[column].notna(), None), pa.string())
+        return pa.table(columns)
+
+
+def private_memory_mb() -> float:
+    """
+    Memory of this process that is not shared with others, in MB.
+
+    Pages of a mapped shared snapshot count once across all workers, so this
+    is what a worker adds to the machine's memory use. Falls back to the peak
+    RSS where /proc is not available.
+    """
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return sum(int(fields[name].split()[0]) for name in ('Private_Clean', 'Private_Dirty')) / 1024
+    except (OSError, KeyError, ValueError):
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class SharedSnapshot:
+    """
+    Snapshot published once as an uncompressed Arrow IPC file, for detector processes to attach to.
+
+    Workers memory-map the file, so the Arrow buffers are shared through the
+    page cache instead of being copied or parsed per process. Only the rows
+    and columns a detector asks for are converted to pandas in that worker.
+    The handle is just a path, so it pickles into a worker process for free.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @classmethod
+    def publish(cls, df: pd.DataFrame, name: str, directory: str = None) -> 'SharedSnapshot':
+        """
+        Write a DataFrame to shared memory.
+
+        Args:
+            df (pd.DataFrame): Snapshot to share
+            name (str): Prefix of the file name, e.g. the source
+            directory (str): Where to write, SHARED_SNAPSHOT_DIR or /dev/shm by default
+
+        Returns:
+            SharedSnapshot: Handle to pass to the workers
+        """
+        directory = directory or os.getenv('SHARED_SNAPSHOT_DIR') or DEFAULT_SHARED_SNAPSHOT_DIR
+        path = os.path.join(directory, f"{name}-{os.getpid()}-{uuid.uuid4().hex[:8]}.arrow")
+        table = dataframe_to_table(df)
+        tmp_path = path + '.tmp'
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    def table(self, columns: Optional[Iterable[str]] = None) -> pa.Table:
+        """Attach to the snapshot; the returned table references the mapped file, nothing is read yet."""
+        table = pa.ipc.open_file(pa.memory_map(self.path, 'r')).read_all()
+        return table.select(list(columns)) if columns is not None else table
+
+    def to_pandas(self, sports: Optional[Iterable[str]] = None, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """
+        Materialise the rows of some sports as a DataFrame.
+
+        Args:
+            sports (Iterable[str]): Values of the 'sport' column to keep, all by default
+            columns (Iterable[str]): Columns to keep, all by default
+
+        Returns:
+            pd.DataFrame: The selected rows, the only part of the snapshot copied into this process
+        """
+        table = self.table(columns)
+        if sports is not None and 'sport' in table.column_names:
+            table = table.filter(pc.is_in(table['sport'], value_set=pa.array(list(sports), pa.string())))
+        return table.to_pandas(split_blocks=True)
+
+    def unlink(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> 'SharedSnapshot':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.unlink()
+
+
+def run_detector(sport: str, toto: SharedSnapshot, kambi: SharedSnapshot):
+    """
+    Run a sport's detector in a worker process on its rows of the shared snapshots.
+
+    Args:
+        sport (str): 'football' or 'tennis'
+        toto (SharedSnapshot): Toto snapshot
+        kambi (SharedSnapshot): Kambi snapshot
+
+    Returns:
+        tuple: (detector result, private memory of the worker in MB after detection)
+    """
+    module_name, function_name = DETECTORS[sport]
+    detector = getattr(importlib.import_module(module_name), function_name)
+    labels = [label for label, label_sport in SPORTS.items() if label_sport == sport]
+    result = detector(toto.to_pandas(sports=labels), kambi.to_pandas(sports=labels))
+    # The worker's aliases and outcome pairs are not seen by the parent, so it saves them itself
+    from alias_registry import save_alias_registry
+    from pair_cache import save_pair_caches
+    save_alias_registry()
+    save_pair_caches()
+    memory = private_memory_mb()
+    logging.info(f"Shared snapshot: {sport} detector private memory {memory:.0f}MB")
+    return result, round(memory, 1)
@@ -0,0 +1,121 @@
+import os
+import hashlib
+import tempfile
+import threading
+import logging
+from typing import Optional
+
+# Default location and size limit, overridable with SNAPSHOT_CACHE_DIR / SNAPSHOT_CACHE_MAX_MB
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "arbitragebets_snapshots")
+DEFAULT_CACHE_MAX_MB = 512
+
+
+class SnapshotCache:
+    """
+    On-disk LRU cache of downloaded snapshot blobs, keyed by blob path and generation.
+
+    A blob is immutable for a given generation, so a cached copy never needs
+    revalidation: a new upload or overwrite has a new generation and simply
+    misses. Recency is the file's mtime, which is refreshed on every hit, so
+    several processes (e.g. the football and tennis detectors) can share one
+    cache directory. Files are written through a rename, so a reader never
+    sees a partial file.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_MB * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0, 'bytes_downloaded': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, blob_path: str, generation) -> str:
+        digest = hashlib.sha1(blob_path.encode('utf-8')).hexdigest()[:16]
+        extension = os.path.splitext(blob_path)[1]
+        return os.path.join(self.directory, f"{digest}-{generation}{extension}")
+
+    def get(self, blob_path: str, generation) -> Optional[str]:
+        """
+        Look up a cached blob.
+
+        Args:
+            blob_path (str): Object name in the bucket
+            generation: Object generation; None never hits
+
+        Returns:
+            str: Local file path on a hit, None on a miss
+        """
+        if generation is None:
+            return None
+        path = self.path_for(blob_path, generation)
+        try:
+            os.utime(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+        with self._lock:
+            self.stats['hits'] += 1
+            self.stats['bytes_saved'] += size
+        return path
+
+    def put(self, blob_path: str, generation, content: bytes) -> Optional[str]:
+        """
+        Store a downloaded blob and evict least recently used files above max_bytes.
+
+        Returns:
+            str: Local file path, None when the blob cannot be cached
+        """
+        with self._lock:
+            self.stats['bytes_downloaded'] += len(content)
+        if generation is None or len(content) > self.max_bytes:
+            return None
+        path = self.path_for(blob_path, generation)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Snapshot cache: could not store {blob_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        self.evict()
+        return path
+
+    def evict(self):
+        """Remove the least recently used files until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.startswith('.tmp-'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                self.stats['evictions'] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+def cache_from_env() -> Optional[SnapshotCache]:
+    """Build the cache from SNAPSHOT_CACHE_DIR and SNAPSHOT_CACHE_MAX_MB; SNAPSHOT_CACHE_MAX_MB=0 disables it."""
+    max_mb = float(os.getenv('SNAPSHOT_CACHE_MAX_MB', DEFAULT_CACHE_MAX_MB))
+    if max_mb <= 0:
+        return None
+    return SnapshotCache(os.getenv('SNAPSHOT_CACHE_DIR') or DEFAULT_CACHE_DIR, int(max_mb * 2**20))
@@ -0,0 +1,95 @@
+import logging
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+# Stable identity of a snapshot row per source
+DELTA_KEYS: Dict[str, List[str]] = {
+    'toto': ['event_id', 'Market Name', 'Outcome Name'],
+    'unibet': ['outcome_id'],
+}
+
+# Column of a delta telling whether a row is inserted or updated ('upsert') or removed ('remove')
+CHANGE_COLUMN = '_change'
+
+
+def key_hashes(df: pd.DataFrame, keys: List[str]) -> np.ndarray:
+    """
+    One 64-bit hash per row of the key columns, used as the join key.
+
+    The keys are hashed as strings, as hashes depend on the dtype and a CSV
+    snapshot and its delta are read back with separately inferred dtypes, e.g.
+    an Outcome Name column holding only '1' and '2' becomes int64. Whole floats
+    are written without their '.0', as integer columns with gaps read back as float.
+    """
+    columns = {}
+    for key in keys:
+        values = df[key]
+        if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+            values = values.astype('Int64')
+        columns[key] = values.astype(str).where(values.notna().to_numpy(), '')
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).values
+
+
+def diff_snapshots(previous: pd.DataFrame, current: pd.DataFrame, keys: List[str]) -> Optional[pd.DataFrame]:
+    """
+    Compute the rows that turn previous into current.
+
+    Rows are matched on their key columns and compared through a hash of all
+    their values, both joined through a hash table, so the cost is linear in
+    the snapshot size.
+
+    Args:
+        previous (pd.DataFrame): Last uploaded snapshot
+        current (pd.DataFrame): New snapshot, with the same columns
+        keys (List[str]): Columns identifying a row
+
+    Returns:
+        pd.DataFrame: Inserted and updated rows of current plus the key columns of
+            removed rows, told apart by CHANGE_COLUMN; None when the snapshots
+            cannot be diffed (different columns or duplicate keys)
+    """
+    if list(previous.columns) != list(current.columns) or not set(keys) <= set(current.columns):
+        return None
+    previous_keys, current_keys = key_hashes(previous, keys), key_hashes(current, keys)
+    previous_index, current_index = pd.Index(previous_keys), pd.Index(current_keys)
+    if not previous_index.is_unique or not current_index.is_unique:
+        logging.warning(f"Snapshot delta: duplicate {', '.join(keys)} keys, uploading a full snapshot instead")
+        return None
+
+    # Position of every current row in previous, -1 for inserted rows
+    positions = previous_index.get_indexer(current_keys)
+    previous_rows = pd.util.hash_pandas_object(previous, index=False).values
+    current_rows = pd.util.hash_pandas_object(current, index=False).values
+    changed = (positions == -1) | (previous_rows[positions] != current_rows)
+    removed = current_index.get_indexer(previous_keys) == -1
+
+    upserts = current[changed].assign(**{CHANGE_COLUMN: 'upsert'})
+    removals = previous.loc[removed, keys].assign(**{CHANGE_COLUMN: 'remove'})
+    return pd.concat([upserts, removals], ignore_index=True)[list(current.columns) + [CHANGE_COLUMN]]
+
+
+def apply_delta(base: pd.DataFrame, delta: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """
+    Apply a delta written by diff_snapshots to a snapshot.
+
+    Args:
+        base (pd.DataFrame): Snapshot, possibly a subset of its rows and columns
+            as long as the key columns are there
+        delta (pd.DataFrame): Delta, with at least the key columns and CHANGE_COLUMN
+        keys (List[str]): Columns identifying a row
+
+    Returns:
+        pd.DataFrame: base without the updated and removed rows, followed by the inserted and updated rows
+    """
+    if delta.empty:
+        return base
+    kept = base[~np.isin(key_hashes(base, keys), key_hashes(delta, keys))]
+    upserts = delta[delta[CHANGE_COLUMN] == 'upsert'].drop(columns=[CHANGE_COLUMN])
+    return pd.concat([kept, upserts[[column for column in base.columns if column in upserts.columns]]], ignore_index=True)
+
+
+def delta_summary(delta: pd.DataFrame) -> dict:
+    """Number of upserted and removed rows of a delta, for the manifest and logs."""
+    counts = delta[CHANGE_COLUMN].value_counts()
+    return {'upserts': int(counts.get('upsert', 0)), 'removals': int(counts.get('remove', 0))}
@@ -0,0 +1,151 @@
+import io
+import logging
+from typing import Iterable, Optional, Union
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Labels repeated across many outcomes are dictionary-encoded
+LABEL = pa.dictionary(pa.int32(), pa.string())
+
+# Explicit column types of the Toto snapshot
+TOTO_SCHEMA = {
+    'event_id': pa.int64(),
+    'Event Name': LABEL,
+    'Market Name': LABEL,
+    'Outcome Name': LABEL,
+    'Odds (Decimal)': pa.float64(),
+    'Price Numerator': pa.int32(),
+    'Price Denominator': pa.int32(),
+    'Outcome Type': LABEL,
+    'Outcome SubType': LABEL,
+    'sport': LABEL,
+    'competition': LABEL,
+    'match_name': LABEL,
+    'home_team': LABEL,
+    'away_team': LABEL,
+    'start_time': LABEL,
+}
+
+# Explicit column types of the Kambi snapshot. Odds and lines stay in Kambi's
+# integer thousandths, which is what the detectors expect.
+KAMBI_SCHEMA = {
+    'bet_offer_id': pa.int64(),
+    'criterion_id': pa.int64(),
+    'criterion_label': LABEL,
+    'criterion_english_label': LABEL,
+    'occurrence_type': LABEL,
+    'lifetime': LABEL,
+    'bet_offer_type_id': pa.int32(),
+    'bet_offer_type_name': LABEL,
+    'bet_offer_type_english_name': LABEL,
+    'event_id': pa.int64(),
+    'outcome_id': pa.int64(),
+    'outcome_label': LABEL,
+    'outcome_english_label': LABEL,
+    'odds': pa.int32(),
+    'line': pa.int32(),
+    'participant': LABEL,
+    'type': LABEL,
+    'changed_date': LABEL,
+    'odds_fractional': LABEL,
+    'odds_american': LABEL,
+    'status': LABEL,
+    'cash_out_status': LABEL,
+    'delta': pa.bool_(),
+    'event_name': LABEL,
+    'sport': LABEL,
+    'group_name': LABEL,
+    'start_time': LABEL,
+}
+
+SNAPSHOT_SCHEMAS = {
+    'toto': TOTO_SCHEMA,
+    'unibet': KAMBI_SCHEMA,
+    'unibet_delta': KAMBI_SCHEMA,
+}
+
+# Bump when a declared column type changes, readers find it in the source manifest
+SNAPSHOT_SCHEMA_VERSION = 1
+
+PARQUET_CONTENT_TYPE = 'application/vnd.apache.parquet'
+PARQUET_COMPRESSION = 'zstd'
+
+
+def to_utc(value) -> Optional[pd.Timestamp]:
+    """Convert a datetime or ISO string to a UTC Timestamp; naive values are taken as UTC."""
+    if value is None:
+        return None
+    value = pd.Timestamp(value)
+    return value.tz_localize('UTC') if value.tzinfo is None else value.tz_convert('UTC')
+
+
+def snapshot_schema(df: pd.DataFrame, source: str) -> pa.Schema:
+    """
+    Arrow schema for a scraper DataFrame: the declared type for known columns, inferred otherwise.
+
+    Args:
+        df (pd.DataFrame): Scraper output
+        source (str): Source identifier ('toto', 'unibet' or 'unibet_delta')
+
+    Returns:
+        pa.Schema: One field per DataFrame column, in DataFrame order
+    """
+    declared = SNAPSHOT_SCHEMAS.get(source, {})
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    return pa.schema([
+        pa.field(field.name, declared[field.name]) if field.name in declared else field
+        for field in inferred
+    ])
+
+
+def dataframe_to_parquet(df: pd.DataFrame, source: str) -> bytes:
+    """
+    Serialise a scraper DataFrame to compressed Parquet with the source's schema.
+
+    Falls back to the inferred schema when a column does not fit its declared type.
+
+    Args:
+        df (pd.DataFrame): Scraper output
+        source (str): Source identifier ('toto', 'unibet' or 'unibet_delta')
+
+    Returns:
+        bytes: Parquet file contents
+    """
+    try:
+        table = pa.Table.from_pandas(df, schema=snapshot_schema(df, source), preserve_index=False)
+    except pa.ArrowException as e:
+        logging.warning(f"Snapshot {source}: data does not fit the declared schema, inferring types: {e}")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression=PARQUET_COMPRESSION)
+    return buffer.getvalue()
+
+
+def parquet_to_dataframe(content: Union[bytes, str], columns: Optional[Iterable[str]] = None, categorical: bool = False) -> pd.DataFrame:
+    """
+    Read a Parquet snapshot, decoding only the requested columns.
+
+    Args:
+        content (bytes | str): Parquet file contents, or the path of a local
+            Parquet file, which is memory-mapped instead of read
+        columns (Iterable[str]): Columns to read, all by default
+        categorical (bool): Keep dictionary-encoded labels as pandas categoricals
+            instead of plain strings
+
+    Returns:
+        pd.DataFrame: Snapshot data
+    """
+    source = content if isinstance(content, str) else pa.BufferReader(content)
+    table = pq.read_table(source, columns=list(columns) if columns is not None else None, memory_map=True)
+    if not categorical:
+        for index, field in enumerate(table.schema):
+            if pa.types.is_dictionary(field.type):
+                table = table.set_column(index, field.name, table.column(index).cast(field.type.value_type))
+    return table.to_pandas()
+
+
+def parquet_columns(content: Union[bytes, str]) -> list:
+    """Return the column names of a Parquet snapshot from its footer, without reading any data."""
+    source = content if isinstance(content, str) else pa.BufferReader(content)
+    return pq.read_schema(source).names
@@ -0,0 +1,288 @@
+import os
+import itertools
+import threading
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, Iterator, NamedTuple, Optional, Union
+
+
+class ObjectNotFound(Exception):
+    """The object does not exist."""
+
+
+class GenerationMismatch(Exception):
+    """A conditional write found another generation than the expected one."""
+
+
+class ObjectInfo(NamedTuple):
+    name: str
+    generation: int
+    size: int
+    updated: datetime
+
+
+class StorageBackend:
+    """
+    Object store holding snapshots, manifests and history files.
+
+    Every write of an object gives it a new, larger generation, which readers
+    use as a cache key and writers as a compare-and-swap token. Subclasses
+    implement the methods below; CloudStorageManager only talks to this API.
+    """
+
+    name = ''
+
+    def upload(self, name: str, data: Union[bytes, str], content_type: str = 'application/octet-stream',
+               if_generation_match: int = None) -> int:
+        """
+        Atomically replace an object.
+
+        Args:
+            name (str): Object name, '/' separated
+            data (bytes | str): Contents, str is stored as UTF-8
+            content_type (str): MIME type, where the backend keeps one
+            if_generation_match (int): Only write when the current generation
+                matches; 0 means the object must not exist yet
+
+        Returns:
+            int: Generation of the new object
+
+        Raises:
+            GenerationMismatch: if_generation_match did not match
+        """
+        raise NotImplementedError
+
+    def download(self, name: str, start: int = None, end: int = None) -> bytes:
+        """
+        Read an object, or the byte range [start, end) of it.
+
+        Raises:
+            ObjectNotFound: The object does not exist
+        """
+        raise NotImplementedError
+
+    def stat(self, name: str) -> Optional[ObjectInfo]:
+        """Return the generation, size and update time of an object, None when it does not exist."""
+        raise NotImplementedError
+
+    def list(self, prefix: str = '') -> Iterator[ObjectInfo]:
+        """List the objects whose name starts with prefix."""
+        raise NotImplementedError
+
+    def delete(self, name: str):
+        """
+        Remove an object.
+
+        Raises:
+            ObjectNotFound: The object does not exist
+        """
+        raise NotImplementedError
+
+    def latest(self, prefix: str = '') -> Optional[ObjectInfo]:
+        """Return the most recently written object below prefix, None when there is none."""
+        return max(self.list(prefix), key=lambda info: (info.updated, info.generation), default=None)
+
+
+class GCSBackend(StorageBackend):
+    """Google Cloud Storage bucket, configured from GCP_PROJECT_ID, GCP_BUCKET_NAME and GCP_CREDENTIALS_PATH."""
+
+    def __init__(self, bucket_name: str = None):
+        # Imported here, so the other backends work without the Google Cloud libraries
+        from google.cloud import storage
+        from google.api_core import exceptions
+        self.exceptions = exceptions
+
+        self.project_id = os.getenv('GCP_PROJECT_ID')
+        self.name = bucket_name or os.getenv('GCP_BUCKET_NAME')
+        self.credentials_path = os.getenv('GCP_CREDENTIALS_PATH')
+
+        if not all([self.project_id, self.name, self.credentials_path]):
+            raise ValueError("Missing required Google Cloud Storage configuration in environment variables")
+
+        # Set credentials
+        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = self.credentials_path
+        self.client = storage.Client()
+        self.bucket = self.client.bucket(self.name)
+
+    def info(self, blob) -> ObjectInfo:
+        return ObjectInfo(blob.name, blob.generation, blob.size, blob.updated)
+
+    def upload(self, name, data, content_type='application/octet-stream', if_generation_match=None) -> int:
+        blob = self.bucket.blob(name)
+        try:
+            blob.upload_from_string(data, content_type, if_generation_match=if_generation_match)
+        except self.exceptions.PreconditionFailed as e:
+            raise GenerationMismatch(str(e))
+        return blob.generation
+
+    def download(self, name, start=None, end=None) -> bytes:
+        try:
+            # Cloud Storage ranges include their end
+            return self.bucket.blob(name).download_as_bytes(start=start, end=end - 1 if end is not None else None)
+        except self.exceptions.NotFound as e:
+            raise ObjectNotFound(str(e))
+
+    def stat(self, name) -> Optional[ObjectInfo]:
+        blob = self.bucket.get_blob(name)
+        return self.info(blob) if blob is not None else None
+
+    def list(self, prefix='') -> Iterator[ObjectInfo]:
+        for blob in self.client.list_blobs(self.bucket, prefix=prefix):
+            yield self.info(blob)
+
+    def delete(self, name):
+        try:
+            self.bucket.blob(name).delete()
+        except self.exceptions.NotFound as e:
+            raise ObjectNotFound(str(e))
+
+
+class LocalBackend(StorageBackend):
+    """
+    Directory on the local filesystem, for offline runs and benchmarks.
+
+    Object names map onto relative paths below root. Writes go to a temporary
+    file that is renamed over the target, so readers never see a partial
+    object, and the generation is the file's mtime in nanoseconds, bumped
+    when needed so that every write gets a new, larger generation.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.name = os.path.basename(self.root)
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split('/'))
+
+    def info(self, name: str, stat: os.stat_result) -> ObjectInfo:
+        updated = datetime.fromtimestamp(stat.st_mtime_ns / 1e9, tz=timezone.utc)
+        return ObjectInfo(name, stat.st_mtime_ns, stat.st_size, updated)
+
+    def upload(self, name, data, content_type='application/octet-stream', if_generation_match=None) -> int:
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            current = self.stat(name)
+            previous = current.generation if current is not None else None
+            if if_generation_match is not None and (previous or 0) != if_generation_match:
+                raise GenerationMismatch(f"Generation of {name} is {previous}, expected {if_generation_match}")
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            generation = os.stat(path).st_mtime_ns
+            # Coarse filesystem timestamps could repeat a generation
+            if previous is not None and generation <= previous:
+                generation = previous + 1
+                os.utime(path, ns=(generation, generation))
+            return generation
+
+    def download(self, name, start=None, end=None) -> bytes:
+        try:
+            with open(self.path(name), 'rb') as f:
+                if start is None and end is None:
+                    return f.read()
+                start = start or 0
+                f.seek(start)
+                return f.read(end - start if end is not None else -1)
+        except FileNotFoundError:
+            raise ObjectNotFound(f"No such object: {self.name}/{name}")
+
+    def stat(self, name) -> Optional[ObjectInfo]:
+        try:
+            return self.info(name, os.stat(self.path(name)))
+        except FileNotFoundError:
+            return None
+
+    def list(self, prefix='') -> Iterator[ObjectInfo]:
+        for directory, _, files in os.walk(self.root):
+            for file in files:
+                if file.startswith('.tmp-'):
+                    continue
+                path = os.path.join(directory, file)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if name.startswith(prefix):
+                    try:
+                        yield self.info(name, os.stat(path))
+                    except FileNotFoundError:
+                        continue
+
+    def delete(self, name):
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            raise ObjectNotFound(f"No such object: {self.name}/{name}")
+
+
+class MemoryBackend(StorageBackend):
+    """Objects held in a dict of this process, for tests and benchmarks without any I/O."""
+
+    def __init__(self, name: str = 'memory'):
+        self.name = name
+        self.objects: Dict[str, tuple] = {}
+        self._generations = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def upload(self, name, data, content_type='application/octet-stream', if_generation_match=None) -> int:
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        with self._lock:
+            current = self.objects.get(name)
+            if if_generation_match is not None and (current[0] if current else 0) != if_generation_match:
+                raise GenerationMismatch(
+                    f"Generation of {name} is {current[0] if current else None}, expected {if_generation_match}"
+                )
+            generation = next(self._generations)
+            self.objects[name] = (generation, bytes(data), datetime.now(timezone.utc))
+            return generation
+
+    def download(self, name, start=None, end=None) -> bytes:
+        try:
+            data = self.objects[name][1]
+        except KeyError:
+            raise ObjectNotFound(f"No such object: {self.name}/{name}")
+        return data[start:end]
+
+    def stat(self, name) -> Optional[ObjectInfo]:
+        current = self.objects.get(name)
+        return ObjectInfo(name, current[0], len(current[1]), current[2]) if current else None
+
+    def list(self, prefix='') -> Iterator[ObjectInfo]:
+        for name in [name for name in list(self.objects) if name.startswith(prefix)]:
+            info = self.stat(name)
+            if info is not None:
+                yield info
+
+    def delete(self, name):
+        with self._lock:
+            if self.objects.pop(name, None) is None:
+                raise ObjectNotFound(f"No such object: {self.name}/{name}")
+
+
+# STORAGE_BACKEND values
+BACKENDS = {'gcs': GCSBackend, 'local': LocalBackend, 'memory': MemoryBackend}
+
+
+def backend_from_env() -> StorageBackend:
+    """
+    Build the backend selected by STORAGE_BACKEND: 'gcs' (default), 'local' or 'memory'.
+
+    The local backend stores below LOCAL_STORAGE_DIR; setting LOCAL_STORAGE_DIR
+    alone also selects it.
+    """
+    local_storage_dir = os.getenv('LOCAL_STORAGE_DIR')
+    backend = os.getenv('STORAGE_BACKEND', 'local' if local_storage_dir else 'gcs').strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported storage backend: {backend}")
+    if backend == 'local':
+        return LocalBackend(local_storage_dir or os.path.join(tempfile.gettempdir(), "arbitragebets_storage"))
+    return BACKENDS[backend]()
@@ -0,0 +1,188 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from typing import Optional
+import pandas as pd
+from cloud_storage import get_storage_manager
+
+# Rows of snapshots waiting for upload before submit blocks, overridable with UPLOAD_QUEUE_MAX_ROWS
+DEFAULT_MAX_PENDING_ROWS = 2000000
+# Attempts per upload before it is dropped, overridable with UPLOAD_MAX_ATTEMPTS
+DEFAULT_MAX_ATTEMPTS = 5
+# Seconds before the first retry, doubled for every next one
+RETRY_BACKOFF = 2.0
+
+
+class UploadQueue:
+    """
+    Background uploader for scraper snapshots.
+
+    Scrapers submit their DataFrame and return it to detection right away,
+    while a single worker thread uploads snapshots in submission order, so
+    manifests and delta chains advance exactly as with synchronous uploads.
+    Memory is bounded by the number of rows waiting: submit blocks while the
+    queue is full, unless it is empty. Failed uploads are retried with
+    exponential backoff, and the queue is flushed when the interpreter exits.
+
+    A submitted DataFrame must not be modified afterwards; it is uploaded as is.
+    """
+
+    def __init__(self, storage_mgr=None, max_pending_rows: int = None, max_attempts: int = None):
+        """
+        Args:
+            storage_mgr (CloudStorageManager): Manager doing the uploads, the global one by default
+            max_pending_rows (int): Rows waiting for upload before submit blocks
+            max_attempts (int): Attempts per upload before it is given up
+        """
+        self.storage_mgr = storage_mgr
+        self.max_pending_rows = max_pending_rows or int(os.getenv('UPLOAD_QUEUE_MAX_ROWS', DEFAULT_MAX_PENDING_ROWS))
+        self.max_attempts = max_attempts or int(os.getenv('UPLOAD_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS))
+        self.pending = deque()
+        self.pending_rows = 0
+        # An upload taken off the queue but not finished yet
+        self.in_progress = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.stats = {
+            'submitted': 0, 'uploaded': 0, 'failed': 0, 'retries': 0,
+            'last_lag': None, 'max_lag': 0.0, 'max_depth': 0, 'blocked': 0.0,
+        }
+        self.worker = threading.Thread(target=self.run, name='upload-queue', daemon=True)
+        self.worker.start()
+        atexit.register(self.close)
+
+    def submit(self, df: pd.DataFrame, source: str, **kwargs):
+        """
+        Queue a snapshot for upload_dataframe.
+
+        Args:
+            df (pd.DataFrame): Snapshot to upload
+            source (str): Source identifier ('toto', 'unibet' or 'unibet_delta')
+            **kwargs: Further upload_dataframe arguments, e.g. scrape_started
+        """
+        submitted = time.monotonic()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Upload queue is closed")
+            # Backpressure: wait for room, but always accept into an empty queue
+            while self.pending and self.pending_rows + len(df) > self.max_pending_rows:
+                self.condition.wait()
+            self.stats['blocked'] = round(self.stats['blocked'] + time.monotonic() - submitted, 2)
+            self.pending.append((df, source, kwargs, submitted))
+            self.pending_rows += len(df)
+            self.stats['submitted'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], len(self.pending) + self.in_progress)
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                df, source, kwargs, submitted = self.pending.popleft()
+                self.in_progress = True
+            try:
+                self.upload(df, source, kwargs, submitted)
+            finally:
+                with self.condition:
+                    self.pending_rows -= len(df)
+                    self.in_progress = False
+                    self.condition.notify_all()
+
+    def upload(self, df: pd.DataFrame, source: str, kwargs: dict, submitted: float):
+        storage_mgr = self.storage_mgr or get_storage_manager()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                blob_path = storage_mgr.upload_dataframe(df, source, **kwargs)
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    with self.condition:
+                        self.stats['failed'] += 1
+                    logging.error(f"Upload queue: giving up on {source} snapshot after {attempt} attempts: {e}")
+                    return
+                with self.condition:
+                    self.stats['retries'] += 1
+                delay = RETRY_BACKOFF * 2 ** (attempt - 1)
+                logging.warning(f"Upload queue: {source} upload failed ({e}), retrying in {delay:.0f}s")
+                time.sleep(delay)
+                continue
+            lag = round(time.monotonic() - submitted, 2)
+            with self.condition:
+                self.stats['uploaded'] += 1
+                self.stats['last_lag'] = lag
+                self.stats['max_lag'] = max(self.stats['max_lag'], lag)
+            logging.info(f"Upload queue: {source} uploaded to {blob_path}, {lag}s after submission")
+            return
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait until every submitted snapshot is uploaded or given up.
+
+        Returns:
+            bool: False when the timeout expired first
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.condition:
+            while self.pending or self.in_progress:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def close(self, timeout: float = None):
+        """Stop accepting snapshots, upload the ones still queued and stop the worker."""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        if self.pending or self.in_progress:
+            logging.info(f"Upload queue: flushing {len(self.pending) + self.in_progress} snapshots before exit")
+        self.worker.join(timeout)
+
+    def get_stats(self) -> dict:
+        """Return the upload counters, the current depth and the lag from submission to upload in seconds."""
+        with self.condition:
+            return dict(
+                self.stats, depth=len(self.pending) + self.in_progress, pending_rows=self.pending_rows
+            )
+
+
+def async_uploads_enabled() -> bool:
+    """Uploads run in the background unless ASYNC_UPLOADS=0."""
+    return os.getenv('ASYNC_UPLOADS', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+# Initialize the upload queue
+upload_queue = None
+_queue_lock = threading.Lock()
+
+def get_upload_queue() -> Optional[UploadQueue]:
+    """Return the global upload queue, None when uploads are synchronous."""
+    global upload_queue
+    if not async_uploads_enabled():
+        return upload_queue
+    with _queue_lock:
+        if upload_queue is None:
+            upload_queue = UploadQueue()
+    return upload_queue
+
+
+def upload_snapshot(df: pd.DataFrame, source: str, **kwargs) -> Optional[str]:
+    """
+    Persist a scraper snapshot, in the background unless ASYNC_UPLOADS=0.
+
+    Returns:
+        str: Cloud storage path of a synchronous upload, None when it was queued
+    """
+    queue = get_upload_queue()
+    if queue is None:
+        return get_storage_manager().upload_dataframe(df, source, **kwargs)
+    queue.submit(df, source, **kwargs)
+    return None